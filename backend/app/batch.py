@@ -0,0 +1,173 @@
+"""複数申請の一括生成（ZIPのストリーミング）
+
+生成が終わった書類から順にZIPへ追加して送り出すので、アーカイブ全体をメモリに
+持たない。送信先はシークできないため、zipfile はデータディスクリプタ付きの形式で
+書き出す（各エントリのサイズ・CRCはデータの後ろに書かれる）。
+
+1件ごとの失敗（入力の不正・生成エラー）は一括処理を止めず、最後に追加する
+manifest.json に記録する。
+
+郵便番号のあるレコードは、空の都道府県・市区町村を郵便番号の索引で埋めてから検証・生成する
+（parse_record。コマンドラインの一括生成と共通）。
+"""
+
+import asyncio
+import json
+import re
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from pydantic import ValidationError
+
+from . import layout, postal, validation
+from .schemas import FormData
+
+
+MANIFEST_NAME = 'manifest.json'
+
+# 1件の生成: (FormData, レイアウトプラン) -> (PDFのバイト列, キャッシュから返したかどうか)
+Render = Callable[[FormData, list[layout.PlannedPage]], Awaitable[tuple[bytes, bool]]]
+
+
+class ZipSink:
+    """zipfile の書き込み先（書かれたバイト列を溜めておき、drain() で取り出す）
+
+    tell()/seek() を持たないので、zipfile はシークできないストリームとして扱う。
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def entry_filename(index: int, data: FormData) -> str:
+    """ZIP内のファイル名（連番_氏名.pdf）"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', '_', data.nameKanji).strip('_') or 'record'
+    return f"{index + 1:03d}_{name}.pdf"
+
+
+def parse_record(record: dict) -> FormData:
+    """レコードを FormData にし、郵便番号から空の住所の欄を埋める
+
+    郵便番号がある住所は、都道府県・市区町村の欄を省略できる（空として読んでから埋める）。
+    番地は埋めないので、省略すると入力エラーになる（API と同じ）。
+
+    Raises:
+        ValidationError: 入力の形式が不正
+        OSError, ValueError: 住所を埋める必要があるのに郵便番号の索引を読めない
+    """
+    record = dict(record)
+    for code_field, (prefecture_field, city_field, _) in postal.POSTAL_CODE_FIELDS.items():
+        if record.get(code_field):
+            record.setdefault(prefecture_field, '')
+            record.setdefault(city_field, '')
+    return postal.fill_addresses(FormData.model_validate(record))
+
+
+def format_validation_error(e: ValidationError) -> str:
+    """入力エラーを1行にまとめる"""
+    return '; '.join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in e.errors()
+    )
+
+
+async def stream_zip(records: list[dict], render: Render, concurrency: int,
+                     on_chunk: Optional[Callable[[bytes], None]] = None) -> AsyncIterator[bytes]:
+    """レコードごとに書類を生成し、ZIPのバイト列を少しずつ返す
+
+    Args:
+        records: FormData の辞書のリスト
+        render: 1件を生成する関数（結果キャッシュ・ワーカープールを通すもの）。
+            プランはレコードごとに1回だけ作り、生成・はみ出しの確認の両方に使う
+        concurrency: 同時に生成する件数の上限（終わった書類を溜め込みすぎないため）
+        on_chunk: 送り出すバイト列ごとに呼ぶ関数（送信量の計測用）
+    """
+    entries: list[Optional[dict]] = [None] * len(records)
+    queue: list[tuple[int, FormData]] = []
+    for index, record in enumerate(records):
+        try:
+            data = parse_record(record)
+        except ValidationError as e:
+            entries[index] = {'index': index, 'status': 'error', 'error': format_validation_error(e)}
+            continue
+        except (OSError, ValueError) as e:
+            entries[index] = {'index': index, 'status': 'error',
+                              'error': f"郵便番号から住所を埋められません: {e}"}
+            continue
+        errors = validation.validate_form(data)
+        if errors:
+            entries[index] = {'index': index, 'status': 'error', 'error': validation.format_errors(errors)}
+            continue
+        queue.append((index, data))
+    queue.reverse()
+
+    sink = ZipSink()
+    archive = zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED)
+    pending: dict[asyncio.Task, tuple[int, FormData, list[layout.PlannedPage]]] = {}
+
+    def emit() -> bytes:
+        chunk = sink.drain()
+        if chunk and on_chunk is not None:
+            on_chunk(chunk)
+        return chunk
+
+    try:
+        while queue or pending:
+            while queue and len(pending) < concurrency:
+                index, data = queue.pop()
+                plan = layout.plan_bundle(data)
+                pending[asyncio.ensure_future(render(data, plan))] = (index, data, plan)
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, data, plan = pending.pop(task)
+                try:
+                    pdf_bytes, cached = task.result()
+                except Exception as e:
+                    entries[index] = {'index': index, 'status': 'error', 'error': str(e)}
+                    continue
+                filename = entry_filename(index, data)
+                # PDFは圧縮済みのストリームが大半なので、ZIPでは無圧縮で格納する
+                archive.writestr(filename, pdf_bytes)
+                entries[index] = {
+                    'index': index,
+                    'status': 'ok',
+                    'filename': filename,
+                    'bytes': len(pdf_bytes),
+                    'cached': cached,
+                    # 欄に収まらなかった項目（縮小・折り返しをしても収まらなかったもの）
+                    'overflows': layout.overflow_fields(plan),
+                }
+            chunk = emit()
+            if chunk:
+                yield chunk
+
+        manifest = {
+            'total': len(records),
+            'succeeded': sum(1 for entry in entries if entry['status'] == 'ok'),
+            'failed': sum(1 for entry in entries if entry['status'] == 'error'),
+            'records': entries,
+        }
+        archive.writestr(
+            zipfile.ZipInfo(MANIFEST_NAME),
+            json.dumps(manifest, ensure_ascii=False, indent=2),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+        archive.close()
+        yield emit()
+    finally:
+        # クライアントが切断した場合など、残りの生成は待たずに打ち切る
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,228 @@
+"""全書類PDFの一括生成（コマンドライン）
+
+使い方（backend ディレクトリで実行）:
+    python -m app.cli records.jsonl --out out/ --jobs 4
+    python -m app.cli records.csv --out out/
+
+入力は FormData のレコードを1行1件で並べた JSONL、またはヘッダ行付きの CSV。
+CSV の careerHistory / managerCareerHistory 列は JSON の配列で書く。空欄は未入力として扱う。
+郵便番号のある住所は、空の都道府県・市区町村を郵便番号の索引で埋める（batch.parse_record。番地は必須）。
+
+出力ディレクトリにはレコードごとに「連番_氏名.pdf」と、結果をまとめた manifest.json を書く。
+ワーカープロセスごとにフォントとテンプレートを一度だけ読み込み、以降は使い回す。
+組み立てたPDFはメモリ上のバイト列にせず、出力ファイルへ直接書き出す。
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from pydantic import ValidationError
+
+from . import config, layout, validation
+from .batch import MANIFEST_NAME, entry_filename, format_validation_error, parse_record
+from .pdf_generator import bake_shinsei_static_marks, build_full_application_pdf, register_font
+from .template_cache import template_cache
+
+
+TEMPLATE_PATHS = [
+    str(config.TEMPLATE_PATH),
+    str(config.SEIYAKU_KOJIN_PATH),
+    str(config.SEIYAKU_KANRISHA_PATH),
+    str(config.RYAKUREKI_PATH),
+]
+
+# JSON として解釈する CSV の列
+CSV_JSON_COLUMNS = ('careerHistory', 'managerCareerHistory')
+
+# 読み込めなかった行は (行番号, エラー内容) で表す
+Record = Union[dict, tuple[int, str]]
+
+
+# ============================================
+# 入力の読み込み
+# ============================================
+
+def read_jsonl(path: Path) -> Iterator[Record]:
+    """JSONL を1行ずつ読む（空行は飛ばす）"""
+    with path.open(encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"JSONとして読めません: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, "JSONのオブジェクトではありません"
+                continue
+            yield record
+
+
+def read_csv(path: Path) -> Iterator[Record]:
+    """ヘッダ行付きの CSV を1行ずつ読む"""
+    with path.open(encoding='utf-8-sig', newline='') as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            record = {}
+            try:
+                for key, value in row.items():
+                    if key is None or value is None or not value.strip():
+                        continue
+                    value = value.strip()
+                    record[key] = json.loads(value) if key in CSV_JSON_COLUMNS else value
+            except json.JSONDecodeError as e:
+                yield line_no, f"{key} をJSONとして読めません: {e.msg}"
+                continue
+            yield record
+
+
+def read_records(path: Path, fmt: Optional[str] = None) -> list[Record]:
+    """入力ファイルを読む（形式を省略した場合は拡張子で判断）"""
+    fmt = fmt or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+    reader = read_csv if fmt == 'csv' else read_jsonl
+    return list(reader(path))
+
+
+# ============================================
+# ワーカー
+# ============================================
+
+def init_worker():
+    """ワーカープロセスの初期化（フォントとテンプレートを一度だけ読み込む）"""
+    register_font()
+    for path in TEMPLATE_PATHS:
+        template_cache.load(path)
+    template_cache.load(TEMPLATE_PATHS[0], prepare=bake_shinsei_static_marks)
+
+
+def render_record(index: int, record: Record, out_dir: str, with_grid: bool,
+                  deterministic: bool) -> dict:
+    """1件を生成して出力ディレクトリに書き、結果を返す"""
+    if isinstance(record, tuple):
+        line_no, error = record
+        return {'index': index, 'status': 'error', 'error': f"{line_no}行目: {error}"}
+
+    try:
+        data = parse_record(record)
+    except ValidationError as e:
+        return {'index': index, 'status': 'error', 'error': format_validation_error(e)}
+    except (OSError, ValueError) as e:
+        return {'index': index, 'status': 'error', 'error': f"郵便番号から住所を埋められません: {e}"}
+    errors = validation.validate_form(data)
+    if errors:
+        return {'index': index, 'status': 'error', 'error': validation.format_errors(errors)}
+
+    plan = layout.plan_bundle(data)
+    try:
+        writer = build_full_application_pdf(
+            data, *TEMPLATE_PATHS, with_grid=with_grid, deterministic=deterministic, plan=plan,
+        )
+        # バイト列を経由せず、ファイルに直接書き出す
+        filename = entry_filename(index, data)
+        path = Path(out_dir, filename)
+        writer.write(path)
+    except Exception as e:
+        return {'index': index, 'status': 'error', 'error': str(e)}
+
+    return {'index': index, 'status': 'ok', 'filename': filename, 'bytes': path.stat().st_size,
+            'overflows': layout.overflow_fields(plan)}
+
+
+# ============================================
+# 実行
+# ============================================
+
+def run(records: list[Record], out_dir: Path, jobs: int, with_grid: bool = False,
+        deterministic: bool = False, progress=sys.stderr) -> dict:
+    """全レコードを生成して manifest の内容を返す
+
+    jobs が 1 の場合はプロセスプールを使わずにこのプロセスで生成する。
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    total = len(records)
+    results: list[Optional[dict]] = [None] * total
+    start = time.perf_counter()
+    done_count = 0
+
+    def report(result: dict):
+        nonlocal done_count
+        done_count += 1
+        results[result['index']] = result
+        if result['status'] == 'error':
+            print(f"[{done_count}/{total}] エラー（{result['index'] + 1}件目）: {result['error']}", file=progress)
+        elif done_count == total or done_count % max(1, total // 20) == 0:
+            elapsed = time.perf_counter() - start
+            print(f"[{done_count}/{total}] {done_count / elapsed:.1f}件/秒", file=progress)
+
+    args = (str(out_dir), with_grid, deterministic)
+    if jobs <= 1:
+        init_worker()
+        for index, record in enumerate(records):
+            report(render_record(index, record, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+            # 投入しすぎないよう、未完了はワーカー数の4倍までにする
+            pending: set[Future] = set()
+            for index, record in enumerate(records):
+                if len(pending) >= jobs * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report(future.result())
+                pending.add(pool.submit(render_record, index, record, *args))
+            for future in wait(pending).done:
+                report(future.result())
+
+    elapsed = time.perf_counter() - start
+    succeeded = [r for r in results if r['status'] == 'ok']
+    manifest = {
+        'total': total,
+        'succeeded': len(succeeded),
+        'failed': total - len(succeeded),
+        'elapsed_seconds': round(elapsed, 3),
+        'records': results,
+    }
+    (out_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    written = sum(r['bytes'] for r in succeeded)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(
+        f"完了: {len(succeeded)}/{total}件成功（失敗 {total - len(succeeded)}件）、"
+        f"{elapsed:.1f}秒、{rate:.1f}件/秒、{written / 1024 / 1024:.1f}MB",
+        file=progress,
+    )
+    return manifest
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.cli',
+        description="FormData のレコードから全書類PDFを一括生成",
+    )
+    parser.add_argument('input', type=Path, help="入力ファイル（JSONL または CSV）")
+    parser.add_argument('--out', type=Path, required=True, help="出力ディレクトリ")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="ワーカープロセス数（既定: CPU数、1でプロセスプールを使わない）")
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help="入力形式（省略時は拡張子で判断）")
+    parser.add_argument('--grid', action='store_true', help="ドットグリッド付きで生成（座標調整用）")
+    args = parser.parse_args(argv)
+
+    if not args.input.exists():
+        parser.error(f"入力ファイルが見つかりません: {args.input}")
+
+    records = read_records(args.input, args.format)
+    manifest = run(records, args.out, args.jobs, with_grid=args.grid,
+                   deterministic=config.DETERMINISTIC_PDF)
+    return 0 if manifest['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
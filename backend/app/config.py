@@ -0,0 +1,142 @@
+"""アプリケーション設定（環境変数から読み込み）"""
+
+import os
+from pathlib import Path
+
+
+def _env_str(name: str, default: str) -> str:
+    """文字列の環境変数を取得"""
+    value = os.environ.get(name)
+    return value.strip() if value and value.strip() else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """真偽値の環境変数を取得（'1', 'true', 'yes', 'on' を真とする）"""
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name: str, default: int) -> int:
+    """整数の環境変数を取得（不正値はデフォルト）"""
+    try:
+        return int(os.environ.get(name, ''))
+    except ValueError:
+        return default
+
+
+# ============================================
+# テンプレートPDF
+# ============================================
+
+TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
+TEMPLATE_PATH = TEMPLATE_DIR / "template.pdf"
+SEIYAKU_KOJIN_PATH = TEMPLATE_DIR / "r07_01_kobutsu_seiyakusho_kojin.pdf"
+SEIYAKU_KANRISHA_PATH = TEMPLATE_DIR / "r07_03_kobutsu_seiyakusho_kanrisha.pdf"
+RYAKUREKI_PATH = TEMPLATE_DIR / "r02_ryakurekisyo.pdf"
+
+
+# ============================================
+# PDF生成の実行バックエンド
+# ============================================
+
+# 'thread' または 'process'
+RENDER_BACKEND = _env_str('KOBUTSU_RENDER_BACKEND', 'thread')
+
+# 同時に実行するPDF生成の最大数（0以下はCPU数）
+RENDER_MAX_WORKERS = _env_int('KOBUTSU_RENDER_MAX_WORKERS', 0)
+
+
+# 起動時にフォント登録・テンプレート読み込み・捨て生成を済ませる
+# （完了するまで /api/ready は 503 を返す）
+WARMUP = _env_bool('KOBUTSU_WARMUP', True)
+
+
+# ============================================
+# サーバー（python -m app.server）
+# ============================================
+
+# ワーカープロセス数（0以下はCPU数）
+SERVER_WORKERS = _env_int('KOBUTSU_SERVER_WORKERS', 0)
+
+# ワーカーを入れ替えるまでのリクエスト数（0で入れ替えない）
+SERVER_MAX_REQUESTS = _env_int('KOBUTSU_SERVER_MAX_REQUESTS', 1000)
+
+# 入れ替えのリクエスト数に加える乱数の幅（全ワーカーが同時に入れ替わらないように）
+SERVER_MAX_REQUESTS_JITTER = _env_int('KOBUTSU_SERVER_MAX_REQUESTS_JITTER', 100)
+
+
+# ============================================
+# 生成するPDF
+# ============================================
+
+# 同じ入力から常に同じバイト列を生成する（/ID・作成日時を固定。作成日時は実際の日時にならない
+# ので、出力の比較・検証用に有効にする）
+DETERMINISTIC_PDF = _env_bool('KOBUTSU_DETERMINISTIC_PDF', False)
+
+
+# ============================================
+# オーバーレイの書き出し・結合方式
+# ============================================
+
+# 'xobject'（Form XObjectとして追加）または 'merge_page'（pypdfのmerge_page）
+MERGE_MODE = _env_str('KOBUTSU_MERGE_MODE', 'xobject')
+
+# オーバーレイの書き出し方（プロセスごとに選択）
+# 'direct'（コンテンツストリームを直接組み立てる。描いたページは PAGE_CACHE_SIZE のキャッシュで使い回す。
+# 常に Form XObject として重ねるので MERGE_MODE は使わない）または
+# 'reportlab'（全ページを1つのキャンバスで描いたPDFを重ねる。ページのキャッシュは使わない）。
+# 描く文字・線が reportlab と同じことは tests/test_direct_overlay.py で確認している
+OVERLAY_BACKEND = _env_str('KOBUTSU_OVERLAY_BACKEND', 'direct')
+
+
+# ============================================
+# 生成結果のキャッシュ
+# ============================================
+
+# メモリ上に保持する合計バイト数の上限（0で無効）
+RESULT_CACHE_MAX_BYTES = _env_int('KOBUTSU_RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+# ディスクキャッシュのディレクトリ（空なら無効）
+RESULT_CACHE_DIR = _env_str('KOBUTSU_RESULT_CACHE_DIR', '')
+
+# ディスクキャッシュの合計バイト数の上限
+RESULT_CACHE_DISK_MAX_BYTES = _env_int('KOBUTSU_RESULT_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024)
+
+# ページ単位で保持するオーバーレイの数の上限（overlay_backend が 'direct' のときに使う。0で無効）
+PAGE_CACHE_SIZE = _env_int('KOBUTSU_PAGE_CACHE_SIZE', 1024)
+
+
+# ============================================
+# 文字幅の表
+# ============================================
+
+# 描画に使うフォントの文字幅（IPAゴシック ipag.ttf から python -m app.font_widths で作成。
+# プレビュー・入力チェックで使う。なければ IPAゴシックの幅の規則で代用する）
+FONT_WIDTHS_PATH = Path(__file__).parent.parent / "data" / "font_widths.json"
+
+
+# ============================================
+# 郵便番号の索引
+# ============================================
+
+POSTAL_DATA_DIR = Path(__file__).parent.parent / "data"
+
+# 同梱の郵便番号データ（python -m app.postal で索引に変換する）
+POSTAL_CSV_PATH = POSTAL_DATA_DIR / "postal_codes.csv"
+
+# mmap して検索する索引（日本郵便の全件で作った索引に差し替えられる）
+POSTAL_INDEX_PATH = Path(_env_str('KOBUTSU_POSTAL_INDEX', str(POSTAL_DATA_DIR / "postal_codes.idx")))
+
+# 索引に期待するレコード数の下限（/api/metrics の kobutsu_postal_index_ready に使う。
+# 全件の索引を作るデプロイでは 100000 などにする（日本郵便の全件は約12万件）。0 なら確認しない）
+POSTAL_MIN_RECORDS = _env_int('KOBUTSU_POSTAL_MIN_RECORDS', 0)
+
+
+# ============================================
+# 一括生成
+# ============================================
+
+# 1回の一括生成で受け付けるレコード数の上限
+BATCH_MAX_RECORDS = _env_int('KOBUTSU_BATCH_MAX_RECORDS', 200)
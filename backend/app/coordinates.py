@@ -10,6 +10,10 @@ def convert_y(pdfplumber_y: float) -> float:
     return HEIGHT - pdfplumber_y
 
 
+# 〜_MAX_WIDTH は欄に書ける最大幅（ポイント、書き出し位置から欄の右端の罫線・次の項目の手前まで）
+# これを超える文字列は縮小・折り返しして収める（layout.fitted_text）
+
+
 # ============================================
 # ページ1: その１（基本情報）
 # ============================================
@@ -31,12 +35,15 @@ PUBLIC_SAFETY_COMMISSION_Y = convert_y(232)
 # 「住所 氏名」形式で表示（右端揃え）
 APPLICANT_INFO_X = 560  # 右端基準
 APPLICANT_INFO_Y = convert_y(265)  # 30上
+APPLICANT_INFO_MAX_WIDTH = 500  # 左端の見出し（x=42.5）まで
 
 # 氏名
 NAME_KANA_X = 202
 NAME_KANA_Y = convert_y(315)
+KANA_GRID_MAX_CELLS = 27  # フリガナのマス目の数（右端 x=563.3 まで。代表者・営業所・管理者も同じ）
 NAME_KANJI_X = 195
 NAME_KANJI_Y = convert_y(343)  # 1上
+NAME_KANJI_MAX_WIDTH = 360  # 欄の右端 x=563.3
 
 # 法人等の種別（真円で番号だけ）
 # 実際の位置: 行全体 x=71.6-559.7, y=364.0-373.4、「6.個人」は右端
@@ -63,12 +70,15 @@ BIRTH_Y = convert_y(401)
 BIRTH_CHAR_WIDTH = 11  # 文字間隔
 
 # 住所
+# 実際の位置: 欄 x=144.2-563.3（都道府県・市区町村・番地の間に罫線はない）
 ADDRESS_PREF_X = 178
 ADDRESS_PREF_Y = convert_y(425)
 ADDRESS_CITY_X = 263
 ADDRESS_CITY_Y = convert_y(425)
+ADDRESS_CITY_MAX_WIDTH = 160  # 番地の手前まで
 ADDRESS_STREET_X = 428
 ADDRESS_STREET_Y = convert_y(425)
+ADDRESS_STREET_MAX_WIDTH = 130  # 欄の右端まで
 
 # 電話番号
 PHONE_AREA_X = 202
@@ -93,6 +103,7 @@ REP_NAME_KANA_X = 201  # 1右
 REP_NAME_KANA_Y = convert_y(569)  # 1下
 REP_NAME_KANJI_X = 195  # 上の氏名漢字と同じ
 REP_NAME_KANJI_Y = convert_y(593)  # 1下
+REP_NAME_KANJI_MAX_WIDTH = 360
 
 # 代表者生年月日の元号
 REP_ERA_POSITIONS = {
@@ -115,8 +126,10 @@ REP_PREF_X = 178
 REP_PREF_Y = convert_y(662)
 REP_CITY_X = 263
 REP_CITY_Y = convert_y(662)
+REP_CITY_MAX_WIDTH = 160
 REP_STREET_X = 428
 REP_STREET_Y = convert_y(662)
+REP_STREET_MAX_WIDTH = 130
 
 # 代表者電話番号（3下）
 REP_PHONE_AREA_X = 202
@@ -136,14 +149,17 @@ OFFICE_NAME_KANA_X = 202
 OFFICE_NAME_KANA_Y = convert_y(212)  # 1上
 OFFICE_NAME_KANJI_X = 195
 OFFICE_NAME_KANJI_Y = convert_y(236)  # 1上
+OFFICE_NAME_KANJI_MAX_WIDTH = 360  # 欄の右端 x=563.3
 
 # 営業所所在地（1上、番地10右）
 OFFICE_PREF_X = 178
 OFFICE_PREF_Y = convert_y(281)  # 1上
 OFFICE_CITY_X = 278
 OFFICE_CITY_Y = convert_y(281)  # 1上
+OFFICE_CITY_MAX_WIDTH = 155  # 番地の手前まで
 OFFICE_STREET_X = 438  # 10右
 OFFICE_STREET_Y = convert_y(281)  # 市区町村と同じY
+OFFICE_STREET_MAX_WIDTH = 120  # 欄の右端 x=563.3
 
 # 営業所電話番号（2下）
 OFFICE_PHONE_AREA_X = 202
@@ -161,6 +177,7 @@ MANAGER_NAME_KANA_X = 202
 MANAGER_NAME_KANA_Y = convert_y(397)  # 2上
 MANAGER_NAME_KANJI_X = 195
 MANAGER_NAME_KANJI_Y = convert_y(417)  # 2上
+MANAGER_NAME_KANJI_MAX_WIDTH = 360
 
 # 管理者生年月日の元号（1上）
 MANAGER_ERA_POSITIONS = {
@@ -182,8 +199,10 @@ MANAGER_PREF_X = 178
 MANAGER_PREF_Y = convert_y(480)  # 2上
 MANAGER_CITY_X = 263
 MANAGER_CITY_Y = convert_y(480)  # 2上
+MANAGER_CITY_MAX_WIDTH = 160
 MANAGER_STREET_X = 428
 MANAGER_STREET_Y = convert_y(480)  # 同じY
+MANAGER_STREET_MAX_WIDTH = 130
 
 # 管理者電話番号（1下）
 MANAGER_PHONE_AREA_X = 202
@@ -233,10 +252,12 @@ SEIYAKU_DATE_Y = convert_y(720)
 # 住所
 SEIYAKU_ADDRESS_X = 220
 SEIYAKU_ADDRESS_Y = convert_y(735)
+SEIYAKU_ADDRESS_MAX_WIDTH = 340  # 右余白（x=560）まで
 
 # 氏名
 SEIYAKU_NAME_X = 220
 SEIYAKU_NAME_Y = convert_y(760)
+SEIYAKU_NAME_MAX_WIDTH = 340
 
 # 管理者用誓約書（2上）
 SEIYAKU_KANRI_PREFECTURE_Y = convert_y(675)
@@ -248,13 +269,16 @@ SEIYAKU_KANRI_NAME_Y = convert_y(758)
 # 略歴書
 # ============================================
 
+# ふりがな・氏名・住所の欄の右端は x=535.6
 # ふりがな（35上）
 RYAKUREKI_KANA_X = 175
 RYAKUREKI_KANA_Y = convert_y(115)
+RYAKUREKI_KANA_MAX_WIDTH = 355
 
 # 氏名（35上）
 RYAKUREKI_NAME_X = 175
 RYAKUREKI_NAME_Y = convert_y(145)
+RYAKUREKI_NAME_MAX_WIDTH = 355
 
 # 生年月日の元号
 RYAKUREKI_ERA_POSITIONS = {
@@ -280,6 +304,7 @@ RYAKUREKI_AGE_Y = convert_y(215)
 # 住所（70上）
 RYAKUREKI_ADDRESS_X = 175
 RYAKUREKI_ADDRESS_Y = convert_y(180)
+RYAKUREKI_ADDRESS_MAX_WIDTH = 355
 
 # 職歴等（7行分）
 # 各行のY座標（期間欄と内容欄は同じY）- 5上
@@ -291,7 +316,10 @@ RYAKUREKI_CAREER_YEAR_X = 165   # 年
 RYAKUREKI_CAREER_MONTH_X = 210  # 月
 
 # 内容の位置 - 50右
+# 実際の位置: 各行の高さ約50（y=274.6-325.9 など）、右端 x=535.6
 RYAKUREKI_CAREER_CONTENT_X = 250
+RYAKUREKI_CAREER_CONTENT_MAX_WIDTH = 280
+RYAKUREKI_CAREER_CONTENT_MAX_LINES = 2  # 収まらない場合は2行まで折り返す
 
 # 署名欄
 RYAKUREKI_SIGN_DATE_YEAR_X = 290
@@ -302,3 +330,4 @@ RYAKUREKI_SIGN_DATE_Y = convert_y(540)
 # 署名（氏名）- 145下
 RYAKUREKI_SIGN_NAME_X = 330
 RYAKUREKI_SIGN_NAME_Y = convert_y(720)
+RYAKUREKI_SIGN_NAME_MAX_WIDTH = 200
@@ -0,0 +1,380 @@
+"""レイアウトプランからオーバーレイを直接書き出す（reportlab のキャンバスを使わない）
+
+reportlab のキャンバスで描いたオーバーレイは、いったんPDFとして書き出してから pypdf で
+読み直し、テンプレートに重ねている。ここではレイアウトプランの描画命令から
+コンテンツストリームの演算子（BT/Tf/Td/Tj、曲線・直線）を直接組み立て、出力先の
+PdfWriter に Form XObject として追加する。中間のPDFの書き出し・解析が不要になる。
+
+- フォントは登録済みの IPAGothic（TTFの解析はプロセスで1回）を Type0（Identity-H）で埋め込み、
+  文字コードは Unicode のコードポイントそのものにする。文字コードが文書に依らないので、
+  ページのコンテンツストリームを別の文書でもそのまま使える
+- ページのコンテンツストリームは layout.page_key をキーにプロセス内でキャッシュし、
+  書類一式は内容が変わらないページのキャッシュと変わったページの新しい描画から組み立てる
+  （例: ホームページのURLだけを直すと、描き直すのは申請書その4だけ）
+- フォントのサブセットは書類一式で使う文字から reportlab と同じ処理（makeSubset）で作る。
+  作ったサブセットはプロセス内で使い回す
+- 文字列はページごとにフォントサイズ単位で1つのテキストオブジェクト（BT〜ET）にまとめる
+- 楕円・円は reportlab と同じベジェ曲線で近似する
+
+描画結果は reportlab のキャンバスで描いた場合と同じになる（描画順だけが異なるが、
+全て黒の不透明な描画なので見た目は変わらない）。
+"""
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from functools import lru_cache, partial
+from typing import NamedTuple
+
+from pypdf import PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+    TextStringObject,
+)
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import FF_NONSYMBOLIC, FF_SYMBOLIC
+from reportlab.pdfgen.pathobject import PDFPathObject
+
+from . import config, layout, text_shaping
+from .pdf_merge import add_object
+
+
+# フォントのリソース名
+FONT_RESOURCE = '/KobutsuF0'
+
+# ToUnicode の bfchar は1ブロック100件まで
+_BFCHAR_BLOCK = 100
+
+
+# ============================================
+# フォント
+# ============================================
+
+def _number(value: float):
+    return NumberObject(value) if float(value).is_integer() else FloatObject(value)
+
+
+def _encoded_stream(data: bytes, **entries) -> StreamObject:
+    """圧縮済みのバイト列をそのまま使うストリーム（get_data では展開した内容を返す）"""
+    stream = EncodedStreamObject()
+    # EncodedStreamObject.set_data は渡した内容を圧縮し直すので、圧縮済みのまま入れる
+    StreamObject.set_data(stream, data)
+    stream[NameObject('/Filter')] = NameObject('/FlateDecode')
+    for name, value in entries.items():
+        stream[NameObject('/' + name)] = value
+    return stream
+
+
+def text_cids(text: str, char_to_glyph: dict) -> list[int]:
+    """文字列の CID（= Unicode のコードポイント）
+
+    reportlab（TTFont.splitString）と同じく、ノーブレークスペースは空白にし、
+    フォントにない文字は .notdef（0）にする。2バイトに収まらない文字も .notdef にする。
+    """
+    cids = []
+    for code in map(ord, text):
+        if code == 0xA0:
+            code = 32
+        cids.append(code if code <= 0xFFFF and code in char_to_glyph else 0)
+    return cids
+
+
+def _to_unicode_cmap(cids: tuple[int, ...]) -> bytes:
+    """CID から Unicode への ToUnicode CMap"""
+    lines = [
+        '/CIDInit /ProcSet findresource begin',
+        '12 dict begin',
+        'begincmap',
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+        '/CMapName /Adobe-Identity-UCS def',
+        '/CMapType 2 def',
+        '1 begincodespacerange',
+        '<0000> <FFFF>',
+        'endcodespacerange',
+    ]
+    for start in range(0, len(cids), _BFCHAR_BLOCK):
+        block = cids[start:start + _BFCHAR_BLOCK]
+        lines.append(f'{len(block)} beginbfchar')
+        lines.extend(f'<{cid:04X}> <{cid:04X}>' for cid in block)
+        lines.append('endbfchar')
+    lines.extend([
+        'endcmap',
+        'CMapName currentdict /CMap defineresource pop',
+        'end',
+        'end',
+    ])
+    return '\n'.join(lines).encode('ascii')
+
+
+def _widths(face, cids: tuple[int, ...]) -> ArrayObject:
+    """CIDFont の /W（連続する CID ごとに [先頭 [幅 ...]]）"""
+    widths = ArrayObject()
+    run = None
+    previous = None
+    for cid in cids:
+        if previous is None or cid != previous + 1:
+            run = ArrayObject()
+            widths.extend([NumberObject(cid), run])
+        run.append(_number(face.getCharWidth(cid)))
+        previous = cid
+    return widths
+
+
+class FontSubset(NamedTuple):
+    """書類一式で使う文字のサブセット（プロセス内で使い回す）"""
+    tag: str                # サブセットの接頭辞（文字の組み合わせから決める）
+    length: int             # フォントプログラムの元のバイト数
+    font_file: bytes        # 圧縮したフォントプログラム
+    cid_to_gid: bytes       # 圧縮した CIDToGIDMap
+    to_unicode: bytes       # 圧縮した ToUnicode CMap
+
+
+@lru_cache(maxsize=64)
+def font_subset(font_name: str, cids: tuple[int, ...]) -> FontSubset:
+    """文字（昇順の CID）のサブセットを作る
+
+    同じ文字の組み合わせ（サンプルPDF・同じ入力の再生成など）では作り直さない。
+    makeSubset はサブセットの先頭から順に新しいグリフ番号を振る（0 は .notdef）ので、
+    同じ順で CID からグリフ番号への対応表を作る。
+    """
+    face = pdfmetrics.getFont(font_name).face
+    data = face.makeSubset(list(cids))
+
+    glyphs = {0: 0}
+    cid_to_gid = bytearray(2 * (cids[-1] + 1))
+    for cid in cids:
+        gid = glyphs.setdefault(face.charToGlyph.get(cid, 0), len(glyphs))
+        cid_to_gid[2 * cid:2 * cid + 2] = gid.to_bytes(2, 'big')
+
+    digest = hashlib.sha256(repr(cids).encode('ascii')).digest()
+    tag = ''.join(chr(ord('A') + b % 26) for b in digest[:6])
+    return FontSubset(tag, len(data), zlib.compress(data), zlib.compress(bytes(cid_to_gid)),
+                      zlib.compress(_to_unicode_cmap(cids)))
+
+
+def add_font(writer: PdfWriter, cids: tuple[int, ...], font_name: str = layout.FONT_NAME) -> IndirectObject:
+    """使う文字（昇順の CID）のサブセットの Type0 フォントを writer に追加する"""
+    face = pdfmetrics.getFont(font_name).face
+    subset = font_subset(font_name, cids)
+    add = partial(add_object, writer)
+    base_font = NameObject('/' + b''.join((subset.tag.encode('ascii'), b'+', face.name,
+                                          face.subfontNameX)).decode('pdfdoc'))
+
+    descriptor = DictionaryObject({
+        NameObject('/Type'): NameObject('/FontDescriptor'),
+        NameObject('/Ascent'): _number(face.ascent),
+        NameObject('/CapHeight'): _number(face.capHeight),
+        NameObject('/Descent'): _number(face.descent),
+        NameObject('/Flags'): NumberObject((face.flags & ~FF_NONSYMBOLIC) | FF_SYMBOLIC),
+        NameObject('/FontBBox'): ArrayObject(_number(v) for v in face.bbox),
+        NameObject('/FontName'): base_font,
+        NameObject('/ItalicAngle'): _number(face.italicAngle),
+        NameObject('/StemV'): _number(face.stemV),
+        NameObject('/FontFile2'): add(_encoded_stream(subset.font_file, Length1=NumberObject(subset.length))),
+    })
+    cid_font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/CIDFontType2'),
+        NameObject('/BaseFont'): base_font,
+        NameObject('/CIDSystemInfo'): DictionaryObject({
+            NameObject('/Registry'): TextStringObject('Adobe'),
+            NameObject('/Ordering'): TextStringObject('Identity'),
+            NameObject('/Supplement'): NumberObject(0),
+        }),
+        NameObject('/FontDescriptor'): add(descriptor),
+        NameObject('/DW'): _number(face.defaultWidth),
+        NameObject('/W'): _widths(face, cids),
+        NameObject('/CIDToGIDMap'): add(_encoded_stream(subset.cid_to_gid)),
+    })
+    return add(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type0'),
+        NameObject('/BaseFont'): base_font,
+        NameObject('/Encoding'): NameObject('/Identity-H'),
+        NameObject('/DescendantFonts'): ArrayObject([add(cid_font)]),
+        NameObject('/ToUnicode'): add(_encoded_stream(subset.to_unicode)),
+    }))
+
+
+# ============================================
+# コンテンツストリーム
+# ============================================
+
+def _fp(value: float) -> str:
+    """数値の書き出し（reportlab と同じ桁数。-0 は 0 にする）"""
+    text = fp_str(value)
+    return '0' if text == '-0' else text
+
+
+def _text_object(char_to_glyph: dict, font_size: float, ops: list) -> list[str]:
+    """同じフォントサイズの文字列を1つのテキストオブジェクトにする
+
+    Td は直前の行頭からの相対位置なので、書き出した値（丸め後）を積み上げて
+    次の移動量を求める（丸め誤差がたまらないようにする）。
+    """
+    size = fp_str(font_size)
+    code = ['BT', f'{FONT_RESOURCE} {size} Tf']
+    x = y = 0.0
+    for op in ops:
+        start_x = op.x
+        if op.kind == 'right_text':
+            start_x -= text_shaping.string_width(op.text, font_size, layout.FONT_NAME)
+        dx, dy = _fp(start_x - x), _fp(op.y - y)
+        x += float(dx)
+        y += float(dy)
+        code.append(f'{dx} {dy} Td')
+        code.append(f'<{"".join(f"{cid:04x}" for cid in text_cids(op.text, char_to_glyph))}> Tj')
+    code.append('ET')
+    return code
+
+
+def page_content(ops: layout.Page) -> bytes:
+    """レイアウトプランの1ページ分のコンテンツストリーム
+
+    図形は順に、文字列はフォントサイズごとにまとめて最後に描く。
+    """
+    char_to_glyph = pdfmetrics.getFont(layout.FONT_NAME).face.charToGlyph
+    code = []
+    texts = defaultdict(list)
+    line_width = None
+    for op in ops:
+        kind = op.kind
+        if kind == 'text' or kind == 'right_text':
+            if op.text:
+                texts[op.font_size].append(op)
+            continue
+
+        if op.line_width != line_width:
+            line_width = op.line_width
+            code.append(f'{fp_str(line_width)} w')
+        if kind == 'ellipse' or kind == 'circle':
+            # canvas.circle と同じく外接する矩形の楕円として描く
+            if kind == 'ellipse':
+                x1, y1, x2, y2 = op.x1, op.y1, op.x2, op.y2
+            else:
+                x1, y1, x2, y2 = op.x - op.r, op.y - op.r, op.x + op.r, op.y + op.r
+            path = PDFPathObject()
+            path.ellipse(x1, y1, x2 - x1, y2 - y1)
+            code.append(f'{path.getCode()} S')
+        else:
+            code.append(f'n {fp_str(op.x1, op.y1)} m {fp_str(op.x2, op.y2)} l S')
+
+    for font_size, text_ops in texts.items():
+        code.extend(_text_object(char_to_glyph, font_size, text_ops))
+    return '\n'.join(code).encode('latin-1')
+
+
+class PageOverlay(NamedTuple):
+    """1ページ分のオーバーレイ（どの文書にも重ねられる）"""
+    content: bytes          # 圧縮したコンテンツストリーム
+    cids: frozenset         # 使う文字の CID
+
+
+def render_page(ops: layout.Page) -> PageOverlay:
+    """1ページ分のオーバーレイを作る"""
+    char_to_glyph = pdfmetrics.getFont(layout.FONT_NAME).face.charToGlyph
+    cids = frozenset(cid for op in ops
+                     if op.kind == 'text' or op.kind == 'right_text'
+                     for cid in text_cids(op.text, char_to_glyph))
+    return PageOverlay(zlib.compress(page_content(ops)), cids)
+
+
+# ============================================
+# ページ単位のキャッシュ
+# ============================================
+
+class PageCache:
+    """ページごとのオーバーレイのLRUキャッシュ（キーは layout.page_key）
+
+    ページの内容はそのページのプランだけで決まるので、入力のうち一部の項目だけが
+    変わった書類一式では、変わらないページの描画を省ける。
+
+    Args:
+        max_entries: 保持するページ数の上限（0で無効）
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pages: OrderedDict[str, PageOverlay] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, planned: layout.PlannedPage) -> PageOverlay:
+        """ページのオーバーレイ（キャッシュになければ描画して保持する）"""
+        if self.max_entries <= 0:
+            return render_page(planned.ops)
+
+        key = layout.page_key(planned)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+            self.misses += 1
+
+        page = render_page(planned.ops)
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def stats(self) -> dict:
+        """ヒット数・ミス数・保持しているページ数を返す"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._pages)}
+
+    def clear(self):
+        """キャッシュとカウンタを破棄"""
+        with self._lock:
+            self._pages.clear()
+            self.hits = self.misses = 0
+
+
+# プロセス全体で共有するページのキャッシュ
+page_cache = PageCache(config.PAGE_CACHE_SIZE)
+
+
+def add_overlay_forms(writer: PdfWriter, plan: list[layout.PlannedPage]) -> list[IndirectObject]:
+    """レイアウトプランの各ページを Form XObject として writer に追加する
+
+    各ページのコンテンツストリームは page_cache から取り出し（なければ描画）、
+    フォントのサブセットは全ページで使う文字から1つ作る（全書類を1つのキャンバスに
+    描く場合と同じ）。
+
+    Returns:
+        ページ順の Form XObject（pdf_merge.stamp_form でテンプレートのページに重ねる）
+    """
+    pages = [page_cache.get(planned) for planned in plan]
+    cids = tuple(sorted(frozenset().union(*(page.cids for page in pages))))
+
+    resources = DictionaryObject()
+    if cids:
+        resources[NameObject('/Font')] = DictionaryObject({NameObject(FONT_RESOURCE): add_font(writer, cids)})
+    resources = add_object(writer, resources)
+
+    bbox = ArrayObject([NumberObject(0), NumberObject(0),
+                        FloatObject(layout.PAGE_WIDTH), FloatObject(layout.PAGE_HEIGHT)])
+    forms = []
+    for page in pages:
+        form = _encoded_stream(page.content)
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): bbox,
+            NameObject('/Resources'): resources,
+        })
+        forms.append(add_object(writer, form))
+    return forms
@@ -0,0 +1,202 @@
+"""PDF生成の実行バックエンド
+
+PDF生成はCPU負荷が高いため、イベントループ上で直接実行すると
+同じワーカーの他のリクエスト（/api/health など）まで止まってしまう。
+ここではスレッドプールまたはプロセスプールに処理を投げて await する。
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from . import config
+
+
+BACKENDS = ('thread', 'process')
+
+# ワーカープロセスの初期化を待つ秒数
+WORKER_START_TIMEOUT = 120
+
+
+# ワーカープロセスの起動を揃えるバリア（_initialize_worker で受け取る）
+_start_barrier = None
+
+
+def _initialize_worker(started: multiprocessing.Queue, barrier, initializer: Callable[..., Any],
+                       initargs: tuple):
+    """ワーカープロセスの起動時の処理（終わったら started に (pid, エラー) を送る）
+
+    初期化の例外をそのまま送出するとプール全体が使えなくなる（BrokenProcessPool）ので、
+    エラーは started で知らせるだけにする。barrier は start_workers が使う。
+    """
+    global _start_barrier
+    _start_barrier = barrier
+    try:
+        initializer(*initargs)
+    except Exception as e:
+        started.put((os.getpid(), f"{type(e).__name__}: {e}"))
+    else:
+        started.put((os.getpid(), None))
+
+
+def _wait_for_all_workers(timeout: float) -> int:
+    """全てのワーカープロセスがこの処理を受け取るまで待つ（待っている間はワーカーが空かない）"""
+    _start_barrier.wait(timeout)
+    return os.getpid()
+
+
+class RenderExecutor:
+    """ワーカープールでPDF生成を実行する
+
+    プールのワーカー数がそのまま同時実行数の上限になる。
+    上限を超えて投入された処理はプール内で順番待ちになる。
+
+    Args:
+        backend: 'thread' または 'process'
+        max_workers: 同時実行数の上限（0以下はCPU数）
+        mp_context: プロセスプールの起動方式（multiprocessing のコンテキスト。省略時は既定の方式）
+    """
+
+    def __init__(self, backend: str = 'thread', max_workers: int = 0, mp_context=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"不明な実行バックエンドです: {backend}")
+        self.backend = backend
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self._mp_context = mp_context or multiprocessing.get_context()
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # 投入済みで未完了の件数
+        self._initializer: Optional[Callable[..., Any]] = None
+        self._initargs: tuple = ()
+        self._started: Optional[multiprocessing.Queue] = None  # ワーカープロセスの初期化の完了通知
+        self._barrier = None  # ワーカープロセスの起動を揃えるバリア（start_workers で使う）
+
+    def set_initializer(self, initializer: Callable[..., Any], *initargs):
+        """各ワーカーの初期化処理（フォント・テンプレートの読み込みなど）を設定する
+
+        プロセスプールでは各ワーカープロセスが起動時に1回ずつ実行する（処理を受け取る前に
+        必ず済んでいる）。スレッドプールではワーカーがメモリを共有するので、
+        start_workers で1回だけ実行する。
+
+        Raises:
+            RuntimeError: プロセスプールを作成済み（初期化処理とバリアはプールの作成時に
+                ワーカーへ渡すので、shutdown してから設定する）
+        """
+        with self._lock:
+            if self.backend == 'process' and self._pool is not None:
+                raise RuntimeError("プロセスプールの作成後は初期化処理を設定できません（shutdown してから設定してください）")
+            self._initializer = initializer
+            self._initargs = initargs
+
+    def _get_pool(self) -> Executor:
+        """プールを取得（初回呼び出し時に作成）"""
+        with self._lock:
+            if self._pool is None:
+                if self.backend == 'process':
+                    kwargs = {'mp_context': self._mp_context}
+                    if self._initializer is not None:
+                        self._started = self._mp_context.Queue()
+                        self._barrier = self._mp_context.Barrier(self.max_workers)
+                        kwargs.update(initializer=_initialize_worker,
+                                      initargs=(self._started, self._barrier,
+                                                self._initializer, self._initargs))
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, **kwargs)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='render',
+                    )
+            return self._pool
+
+    def _on_done(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def in_flight(self) -> int:
+        """実行中の件数"""
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queue_depth(self) -> int:
+        """空きワーカー待ちの件数"""
+        return max(0, self._pending - self.max_workers)
+
+    def stats(self) -> dict:
+        """現在の状態を返す"""
+        with self._lock:
+            pending = self._pending
+        return {
+            'backend': self.backend,
+            'max_workers': self.max_workers,
+            'in_flight': min(pending, self.max_workers),
+            'queue_depth': max(0, pending - self.max_workers),
+        }
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """処理をプールに投入してFutureを返す"""
+        pool = self._get_pool()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # 呼び出し側がキャンセルされても、実際に処理が終わるまで数え続ける
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """処理をプールで実行し、結果を await で受け取る"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def start_workers(self, timeout: float = WORKER_START_TIMEOUT):
+        """全てのワーカーを起動し、初期化処理が終わるまで待つ
+
+        初期化は各ワーカープロセスの起動時の処理（initializer）で行い、その完了通知を
+        ワーカー数だけ待つ。プロセスプールは空いているワーカーがあると新しいプロセスを
+        起動しない（すぐ終わる処理をワーカー数だけ投入しても、同じワーカーが使い回されて
+        全てが起動するとは限らない）ので、全てのワーカーが揃うまで戻らない処理
+        （バリアで待つ）をワーカー数だけ投入し、ワーカーを空かせずに全てを起動させる。
+
+        Raises:
+            RuntimeError: 初期化に失敗したワーカーがある、または時間内に終わらない
+        """
+        if self._initializer is None:
+            return
+        if self.backend == 'thread':
+            await self.run(self._initializer, *self._initargs)
+            return
+
+        self._get_pool()
+        started, barrier = self._started, self._barrier
+        try:
+            await asyncio.gather(*(self.run(_wait_for_all_workers, timeout) for _ in range(self.max_workers)))
+        except threading.BrokenBarrierError:
+            barrier.reset()
+            raise RuntimeError(f"ワーカーが{timeout}秒以内に揃いませんでした") from None
+        for _ in range(self.max_workers):
+            try:
+                _pid, error = await asyncio.to_thread(started.get, timeout=timeout)
+            except queue.Empty:
+                raise RuntimeError(f"ワーカーの初期化が{timeout}秒以内に終わりませんでした") from None
+            if error is not None:
+                raise RuntimeError(error)
+
+    def shutdown(self, wait: bool = True):
+        """プールを停止（次回の投入時に再作成される）"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+# アプリ全体で共有する実行バックエンド
+render_executor = RenderExecutor(config.RENDER_BACKEND, config.RENDER_MAX_WORKERS)
@@ -0,0 +1,127 @@
+"""描画に使うフォントの文字幅の表（reportlab もフォントも読み込まずに使う）
+
+プレビュー・入力チェック（/api/preview, /api/validate）はPDFを作らないが、右揃えの位置や
+欄に収まるかを求めるのに文字幅を使う。そのたびに TTF を解析して登録すると遅いので、
+描画に使うフォントから作った文字幅の表（data/font_widths.json）を同梱して読む。
+
+表の作成（backend ディレクトリで実行。描画に使うフォントを差し替えたら作り直す）:
+    python -m app.font_widths                    # pdf_generator.FONT_PATHS で最初に見つかるフォント
+    python -m app.font_widths /path/to/ipag.ttf
+
+IPAゴシック（ipag.ttf）は等幅（半角500・全角1000）のフォント。同じパスに置かれることのある
+IPAexゴシック・IPAPゴシックは英数字がプロポーショナルで幅が違うので、等幅でないフォントからは
+表を作らない。表がない間は text_shaping が IPAゴシックの幅の規則で代用する。
+
+表の形式（JSON）:
+    {フォント名: {"default_width": 表にない文字の幅, "ranges": [[最初の文字コード, 最後の文字コード, 幅], ...],
+                  "source": {"file": 作成元のフォントのファイル名, "face": フォントの名前, "sha256": ファイルのハッシュ}}}
+    幅は1000分率（reportlab の charWidths と同じ値）。同じ幅が続く文字コードは1つの範囲にまとめる。
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+from . import config
+
+
+# フォント名 -> (文字コード -> 幅, 表にない文字の幅)
+WidthTable = tuple[dict[int, float], float]
+
+
+def compress(widths: dict[int, float]) -> list[list]:
+    """文字ごとの幅を、同じ幅が続く文字コードの範囲のリストにまとめる"""
+    ranges: list[list] = []
+    for code, width in sorted(widths.items()):
+        if ranges and ranges[-1][1] == code - 1 and ranges[-1][2] == width:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code, width])
+    return ranges
+
+
+def expand(ranges: list[list]) -> dict[int, float]:
+    """compress の逆（範囲のリストを文字ごとの幅に戻す）"""
+    return {code: width for first, last, width in ranges for code in range(first, last + 1)}
+
+
+def load(path: Optional[Path] = None) -> dict[str, WidthTable]:
+    """文字幅の表を読み込む（省略時は config.FONT_WIDTHS_PATH）
+
+    Raises:
+        OSError: 表がない
+        ValueError: 表の形式が不正
+    """
+    path = path or config.FONT_WIDTHS_PATH
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    try:
+        return {name: (expand(table['ranges']), table['default_width']) for name, table in data.items()}
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"文字幅の表の形式が不正です: {path}") from e
+
+
+def build(font_path: str) -> dict:
+    """フォントから文字幅の表を作る（reportlab の TTFont で読み、描画時と同じ幅にする）
+
+    作成元のフォントのファイル名・フォントの名前・ファイルのハッシュを source に記録する。
+    """
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    face = TTFont('FontWidths', font_path).face
+    return {
+        'default_width': face.defaultWidth,
+        'ranges': compress(face.charWidths),
+        'source': {
+            'file': Path(font_path).name,
+            'face': face.name.decode('latin-1'),
+            'sha256': hashlib.sha256(Path(font_path).read_bytes()).hexdigest(),
+        },
+    }
+
+
+def is_fixed_pitch(font_path: str) -> bool:
+    """等幅のフォントか（TrueType の post テーブルの isFixedPitch）"""
+    from reportlab.pdfbase.ttfonts import FF_FIXED, TTFont
+
+    return bool(TTFont('FontWidths', font_path).face.flags & FF_FIXED)
+
+
+# ============================================
+# コマンドライン（表の作成）
+# ============================================
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from .pdf_generator import FONT_PATHS
+    from .text_shaping import FONT_NAME
+
+    parser = argparse.ArgumentParser(
+        prog='python -m app.font_widths',
+        description="描画に使うフォントから文字幅の表を作成",
+    )
+    parser.add_argument('font', nargs='?', help="フォントのファイル（既定: pdf_generator.FONT_PATHS で最初に見つかるもの）")
+    parser.add_argument('--out', type=Path, default=config.FONT_WIDTHS_PATH,
+                        help=f"書き出す表（既定: {config.FONT_WIDTHS_PATH}）")
+    args = parser.parse_args(argv)
+
+    font_path = args.font or next((path for path in FONT_PATHS if Path(path).exists()), None)
+    if font_path is None:
+        print("日本語フォントが見つかりません。IPAゴシックをインストールしてください。", file=sys.stderr)
+        return 1
+
+    if not is_fixed_pitch(font_path):
+        print(f"{font_path} は等幅のフォントではありません。IPAゴシック（ipag.ttf）を指定してください"
+              "（IPAexゴシック・IPAPゴシックは英数字の幅が違います）。", file=sys.stderr)
+        return 1
+
+    table = build(font_path)
+    args.out.write_text(json.dumps({FONT_NAME: table}, separators=(',', ':')) + '\n', encoding='utf-8')
+    print(f"{font_path} から {len(table['ranges'])} 範囲の文字幅の表を作成しました: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
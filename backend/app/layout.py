@@ -0,0 +1,762 @@
+"""レイアウトプラン（フォームデータ → 描画命令の列）
+
+フォームデータから「どのページのどこに何を描くか」を求める処理を、キャンバスへの
+描画から切り離す。ここの関数は reportlab・pypdf を使わない純粋な関数で、
+同じ入力からは常に同じプランを返す（略歴書の年齢だけは当日の日付にもよる）。
+
+プランはページごとの描画命令のリストで、命令は NamedTuple なのでそのまま
+比較・ハッシュ・JSON化できる。描画は pdf_generator.render_layout_page() が行う。
+各命令の field には、その命令がフォームのどの項目を描いたものかを入れる。
+
+欄の幅が決まっている文字列（coordinates の 〜_MAX_WIDTH）は、フォントを縮小するか
+折り返して欄に収める（fitted_text）。それでも収まらない項目は find_overflows で求める。
+"""
+
+import hashlib
+import math
+from datetime import date
+from typing import NamedTuple, Optional, Union
+
+from . import coordinates as coord
+from . import text_shaping
+from .schemas import FormData
+from .text_shaping import (  # noqa: F401  文字の変換は text_shaping に移した（互換のため再エクスポート）
+    URL_FURIGANA_MAP,
+    get_url_furigana,
+    katakana_to_hiragana,
+    separate_dakuten,
+    to_halfwidth_kana,
+)
+
+
+# 描画に使うフォント
+FONT_NAME = text_shaping.FONT_NAME
+
+# ページの大きさ（A4、ポイント）
+PAGE_WIDTH = 595.2755905511812
+PAGE_HEIGHT = 841.8897637795277
+
+# 欄に収める際のフォントサイズの下限
+MIN_FONT_SIZE = 6
+# 折り返せる欄では、元のサイズのこの割合より小さくなるなら縮小せずに折り返す
+SHRINK_LIMIT = 0.8
+# 折り返した行の間隔（フォントサイズに対する比）
+LINE_SPACING = 1.2
+
+
+# ============================================
+# 描画命令
+# ============================================
+
+class Text(NamedTuple):
+    """文字列（左揃え）（max_width は欄の幅、幅の決まっていない文字列は None）"""
+    x: float
+    y: float
+    text: str
+    font_size: float
+    field: str
+    max_width: Optional[float] = None
+
+    kind = 'text'
+
+
+class RightText(NamedTuple):
+    """文字列（右揃え、x が右端）（max_width は欄の幅、幅の決まっていない文字列は None）"""
+    x: float
+    y: float
+    text: str
+    font_size: float
+    field: str
+    max_width: Optional[float] = None
+
+    kind = 'right_text'
+
+
+class Ellipse(NamedTuple):
+    """○で囲む（楕円、外接矩形で指定）"""
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    line_width: float
+    field: str
+
+    kind = 'ellipse'
+
+
+class Circle(NamedTuple):
+    """円（中心と半径で指定）"""
+    x: float
+    y: float
+    r: float
+    line_width: float
+    field: str
+
+    kind = 'circle'
+
+
+class Line(NamedTuple):
+    """直線"""
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    line_width: float
+    field: str
+
+    kind = 'line'
+
+
+Op = Union[Text, RightText, Ellipse, Circle, Line]
+Page = list[Op]
+
+
+class PlannedPage(NamedTuple):
+    """全書類のうちの1ページ
+
+    Attributes:
+        document: 書類の種類（DOCUMENTS のいずれか）
+        index: その書類のテンプレートでのページ番号
+        ops: 描画命令
+    """
+    document: str
+    index: int
+    ops: Page
+
+
+# 書類の種類（全書類PDFでの順序）
+DOCUMENTS = ('shinsei', 'seiyaku_kojin', 'ryakureki', 'seiyaku_kanrisha', 'ryakureki_kanrisha')
+
+
+# ============================================
+# 電話番号
+# ============================================
+
+def parse_phone(phone: str) -> tuple[str, str, str]:
+    """電話番号をパースして3分割"""
+    # ハイフンがある場合はそれで分割
+    if '-' in phone:
+        parts = phone.split('-')
+        if len(parts) >= 3:
+            return parts[0], parts[1], parts[2]
+        elif len(parts) == 2:
+            return parts[0], parts[1], ''
+
+    # ハイフンなしの場合は推測
+    phone = phone.replace(' ', '').replace('　', '')
+    if len(phone) == 10:
+        # 固定電話 (03-1234-5678)
+        return phone[:2], phone[2:6], phone[6:]
+    elif len(phone) == 11:
+        # 携帯電話 (090-1234-5678)
+        return phone[:3], phone[3:7], phone[7:]
+    else:
+        return phone, '', ''
+
+
+# ============================================
+# 年齢計算
+# ============================================
+
+ERA_TO_SEIREKI = {
+    'meiji': 1867,
+    'taisho': 1911,
+    'showa': 1925,
+    'heisei': 1988,
+    'reiwa': 2018,
+    'seireki': 0,
+}
+
+
+def calculate_age(birth_era: str, birth_year: str, birth_month: str, birth_day: str,
+                  today: Optional[date] = None) -> int:
+    """生年月日から年齢を計算（today を省略した場合は当日）"""
+    try:
+        era_key = birth_era.lower()
+        base_year = ERA_TO_SEIREKI.get(era_key, 0)
+        birth_year_int = base_year + int(birth_year)
+        birth_month_int = int(birth_month)
+        birth_day_int = int(birth_day)
+
+        today = today or date.today()
+        age = today.year - birth_year_int
+
+        # 誕生日がまだ来ていない場合は1歳引く
+        if (today.month, today.day) < (birth_month_int, birth_day_int):
+            age -= 1
+
+        return age
+    except (ValueError, TypeError):
+        return 0
+
+
+# ============================================
+# 描画命令の組み立て
+# ============================================
+
+def kana_in_grid(ops: Page, text: str, start_x: float, y: float, field: str,
+                 char_width: float = 13.5, font_size: float = 9):
+    """フリガナをマス目に1文字ずつ配置（濁点は1マスに分け、半角カナにする）"""
+    for col, char in text_shaping.shape_kana_grid(text):
+        ops.append(Text(start_x + (col * char_width), y, char, font_size, field))
+
+
+def text_spaced(ops: Page, text: str, start_x: float, y: float, font_size: float, field: str,
+                char_width: float = 10):
+    """文字間隔を指定して1文字ずつ配置"""
+    for i, char in enumerate(text):
+        ops.append(Text(start_x + (i * char_width), y, char, font_size, field))
+
+
+def fitted_text(ops: Page, x: float, y: float, text: str, font_size: float, field: str,
+                max_width: float, max_lines: int = 1, right: bool = False):
+    """欄の幅に収まるように文字列を配置
+
+    - 収まればそのまま
+    - 収まらなければ収まるサイズ（0.5pt 刻み）に縮小する
+    - 折り返せる欄（max_lines > 1）で、縮小が SHRINK_LIMIT を超える場合は
+      元のサイズから順に折り返しを試し、y を中心に行を並べる
+    - MIN_FONT_SIZE まで縮小しても収まらない場合は MIN_FONT_SIZE で描く（find_overflows で報告する）
+    """
+    op_type = RightText if right else Text
+    width = text_shaping.string_width(text, font_size)
+    if width <= max_width:
+        ops.append(op_type(x, y, text, font_size, field, max_width))
+        return
+
+    size = math.floor(font_size * max_width / width * 2) / 2
+    if max_lines > 1 and size < font_size * SHRINK_LIMIT:
+        wrap_size = font_size
+        while wrap_size >= MIN_FONT_SIZE:
+            lines = text_shaping.wrap_text(text, wrap_size, max_width, max_lines)
+            if lines is not None:
+                leading = wrap_size * LINE_SPACING
+                top = y + (len(lines) - 1) * leading / 2
+                for i, line in enumerate(lines):
+                    ops.append(op_type(x, top - i * leading, line, wrap_size, field, max_width))
+                return
+            wrap_size -= 0.5
+
+    ops.append(op_type(x, y, text, max(size, MIN_FONT_SIZE), field, max_width))
+
+
+def circle_mark(ops: Page, x1: float, y1: float, x2: float, y2: float, field: str,
+                line_width: float = 1):
+    """○で囲む（楕円）"""
+    ops.append(Ellipse(x1, y1, x2, y2, line_width, field))
+
+
+def double_line(ops: Page, x_start: float, x_end: float, y: float, field: str,
+                gap: float = 3, line_width: float = 0.8):
+    """二重線を引く"""
+    ops.append(Line(x_start, y, x_end, y, line_width, field))
+    ops.append(Line(x_start, y - gap, x_end, y - gap, line_width, field))
+
+
+def phone_parts(ops: Page, phone: str, xs: tuple[float, float, float], y: float,
+                font_size: float, field: str):
+    """電話番号を市外局番・市内局番・番号に分けて配置"""
+    for x, part, name in zip(xs, parse_phone(phone), ('area', 'local', 'number')):
+        ops.append(Text(x, y, part, font_size, f'{field}.{name}'))
+
+
+def url_with_furigana(ops: Page, url: str, start_x: float, start_y: float,
+                      char_width: float, furigana_offset_y: float,
+                      max_chars_per_line: int, line_height: float, field: str,
+                      char_font_size: float = 10, furigana_font_size: float = 6):
+    """URLを1文字ずつフリガナ付きで配置（数字は丸で囲む）"""
+    col = 0
+    row = 0
+
+    for char, furigana in text_shaping.shape_url(url):
+        # 改行チェック
+        if col >= max_chars_per_line:
+            col = 0
+            row += 1
+
+        x = start_x + (col * char_width)
+        y = start_y - (row * line_height)
+
+        if char.isdigit():
+            # 数字は丸で囲む（数字の中央に配置、1上0.5左）
+            cx = x + char_font_size * 0.3 - 0.5
+            cy = y + char_font_size * 0.3 + 1
+            ops.append(Circle(cx, cy, 6, 1, field))
+        ops.append(Text(x, y, char, char_font_size, field))
+
+        # フリガナ（URL文字の中央に揃える）
+        if furigana:
+            char_center_x = x + char_font_size * 0.3  # 文字の中央（おおよそ）
+            furigana_width = len(furigana) * furigana_font_size * 0.5  # 半角カナの幅
+            furigana_x = char_center_x - furigana_width / 2
+            ops.append(Text(furigana_x, y + furigana_offset_y, furigana, furigana_font_size,
+                            f'{field}.furigana'))
+
+        col += 1
+
+
+def era_mark(ops: Page, era: str, positions: dict, circle_y: tuple[float, float], field: str):
+    """元号を○で囲む（該当する元号がなければ何もしない）"""
+    era_key = era.lower()
+    if era_key in positions:
+        x1, x2 = positions[era_key]
+        y1, y2 = circle_y
+        circle_mark(ops, x1, y1, x2, y2, field)
+
+
+# ============================================
+# 許可申請書
+# ============================================
+
+def plan_shinsei_static_marks() -> list[Page]:
+    """許可申請書の固定マーク（入力に関係なく毎回同じ○・二重線）"""
+    page1: Page = []
+    # 許可の種類: 古物商を○で囲む
+    circle_mark(page1, *coord.PERMIT_TYPE_CIRCLE, field='static')
+    # タイトル部の「古物市場主」に二重線
+    double_line(page1, *coord.TITLE_KOBUTSU_ICHIBONUSHI_DOUBLE_LINE, field='static')
+    # 行商: しない
+    circle_mark(page1, *coord.GYOSHO_SHINAI_CIRCLE, field='static')
+    # 主として取り扱おうとする古物の区分: 11.皮革・ゴム製品類
+    circle_mark(page1, *coord.MAIN_ITEM_11_CIRCLE, field='static')
+
+    page2: Page = []
+    # 営業所あり
+    circle_mark(page2, *coord.OFFICE_ARI_CIRCLE, field='static')
+    # 取扱品目: 02衣類、11皮革・ゴム製品類
+    circle_mark(page2, *coord.ITEM_02_CIRCLE, field='static')
+    circle_mark(page2, *coord.ITEM_11_CIRCLE, field='static')
+
+    return [page1, page2]
+
+
+def plan_shinsei_page1(data: FormData) -> Page:
+    """許可申請書その１（基本情報・代表者等）"""
+    ops: Page = []
+
+    # 公安委員会（提出先）
+    ops.append(Text(coord.PUBLIC_SAFETY_COMMISSION_X, coord.PUBLIC_SAFETY_COMMISSION_Y,
+                    data.submissionPrefecture, 10, 'submissionPrefecture'))
+
+    # 申請者の氏名又は名称及び住所（セクション見出し直下、右端揃え）
+    full_address = f"{data.prefecture}{data.city}{data.street}"
+    fitted_text(ops, coord.APPLICANT_INFO_X, coord.APPLICANT_INFO_Y, f"{full_address} {data.nameKanji}", 10,
+                'applicantInfo', coord.APPLICANT_INFO_MAX_WIDTH, right=True)
+
+    # 氏名
+    kana_in_grid(ops, data.nameKana, coord.NAME_KANA_X, coord.NAME_KANA_Y, 'nameKana')
+    fitted_text(ops, coord.NAME_KANJI_X, coord.NAME_KANJI_Y, data.nameKanji, 11, 'nameKanji',
+                coord.NAME_KANJI_MAX_WIDTH)
+
+    # 法人等の種別: 個人の場合は6を○で囲む
+    if data.applicantType == 'individual':
+        circle_mark(ops, *coord.INDIVIDUAL_CIRCLE, field='applicantType')
+
+    # 生年月日（月・日は2桁0埋め）
+    era_mark(ops, data.birthEra, coord.ERA_POSITIONS, coord.ERA_CIRCLE_Y, 'birthEra')
+    text_spaced(ops, data.birthYear, coord.BIRTH_YEAR_X, coord.BIRTH_Y, 10, 'birthYear',
+                coord.BIRTH_CHAR_WIDTH)
+    text_spaced(ops, data.birthMonth.zfill(2), coord.BIRTH_MONTH_X, coord.BIRTH_Y, 10, 'birthMonth',
+                coord.BIRTH_CHAR_WIDTH)
+    text_spaced(ops, data.birthDay.zfill(2), coord.BIRTH_DAY_X, coord.BIRTH_Y, 10, 'birthDay',
+                coord.BIRTH_CHAR_WIDTH)
+
+    # 住所
+    ops.append(Text(coord.ADDRESS_PREF_X, coord.ADDRESS_PREF_Y, data.prefecture, 10, 'prefecture'))
+    fitted_text(ops, coord.ADDRESS_CITY_X, coord.ADDRESS_CITY_Y, data.city, 10, 'city',
+                coord.ADDRESS_CITY_MAX_WIDTH)
+    fitted_text(ops, coord.ADDRESS_STREET_X, coord.ADDRESS_STREET_Y, data.street, 10, 'street',
+                coord.ADDRESS_STREET_MAX_WIDTH)
+
+    # 電話番号
+    phone_parts(ops, data.phone, (coord.PHONE_AREA_X, coord.PHONE_LOCAL_X, coord.PHONE_NUMBER_X),
+                coord.PHONE_Y, 10, 'phone')
+
+    # 代表者等（入力がある場合のみ）
+    if data.representativeType and data.representativeLastNameKanji:
+        # 種別
+        if data.representativeType in coord.REP_TYPE_POSITIONS:
+            circle_mark(ops, *coord.REP_TYPE_POSITIONS[data.representativeType], field='representativeType')
+
+        # 氏名
+        kana_in_grid(ops, data.representativeNameKana or '', coord.REP_NAME_KANA_X, coord.REP_NAME_KANA_Y,
+                     'representativeNameKana')
+        fitted_text(ops, coord.REP_NAME_KANJI_X, coord.REP_NAME_KANJI_Y,
+                    data.representativeNameKanji or '', 11, 'representativeNameKanji',
+                    coord.REP_NAME_KANJI_MAX_WIDTH)
+
+        # 生年月日（月・日は2桁0埋め）
+        era_mark(ops, data.representativeBirthEra or 'heisei', coord.REP_ERA_POSITIONS,
+                 coord.REP_ERA_CIRCLE_Y, 'representativeBirthEra')
+        text_spaced(ops, data.representativeBirthYear or '', coord.REP_BIRTH_YEAR_X, coord.REP_BIRTH_Y,
+                    10, 'representativeBirthYear', coord.REP_BIRTH_CHAR_WIDTH)
+        text_spaced(ops, (data.representativeBirthMonth or '').zfill(2) if data.representativeBirthMonth else '',
+                    coord.REP_BIRTH_MONTH_X, coord.REP_BIRTH_Y, 10, 'representativeBirthMonth',
+                    coord.REP_BIRTH_CHAR_WIDTH)
+        text_spaced(ops, (data.representativeBirthDay or '').zfill(2) if data.representativeBirthDay else '',
+                    coord.REP_BIRTH_DAY_X, coord.REP_BIRTH_Y, 10, 'representativeBirthDay',
+                    coord.REP_BIRTH_CHAR_WIDTH)
+
+        # 住所
+        ops.append(Text(coord.REP_PREF_X, coord.REP_PREF_Y, data.representativePrefecture or '', 10,
+                        'representativePrefecture'))
+        fitted_text(ops, coord.REP_CITY_X, coord.REP_CITY_Y, data.representativeCity or '', 10,
+                    'representativeCity', coord.REP_CITY_MAX_WIDTH)
+        fitted_text(ops, coord.REP_STREET_X, coord.REP_STREET_Y, data.representativeStreet or '', 10,
+                    'representativeStreet', coord.REP_STREET_MAX_WIDTH)
+
+        # 電話番号
+        phone_parts(ops, data.representativePhone or '',
+                    (coord.REP_PHONE_AREA_X, coord.REP_PHONE_LOCAL_X, coord.REP_PHONE_NUMBER_X),
+                    coord.REP_PHONE_Y, 10, 'representativePhone')
+
+    return ops
+
+
+def resolve_manager(data: FormData) -> dict:
+    """管理者欄に書く内容（申請者と同一なら申請者の内容）"""
+    if data.managerSameAsApplicant:
+        return {
+            'kana': data.nameKana,
+            'kanji': data.nameKanji,
+            'era': data.birthEra,
+            'year': data.birthYear,
+            'month': data.birthMonth,
+            'day': data.birthDay,
+            'pref': data.prefecture,
+            'city': data.city,
+            'street': data.street,
+            'phone': data.phone,
+        }
+    return {
+        'kana': data.managerNameKana or '',
+        'kanji': data.managerNameKanji or '',
+        'era': data.managerBirthEra or 'heisei',
+        'year': data.managerBirthYear or '',
+        'month': data.managerBirthMonth or '',
+        'day': data.managerBirthDay or '',
+        'pref': data.managerPrefecture or '',
+        'city': data.managerCity or '',
+        'street': data.managerStreet or '',
+        'phone': data.managerPhone or '',
+    }
+
+
+def plan_shinsei_page2(data: FormData) -> Page:
+    """許可申請書その２（主たる営業所・管理者）"""
+    ops: Page = []
+
+    # 営業所名称
+    kana_in_grid(ops, data.officeNameKana, coord.OFFICE_NAME_KANA_X, coord.OFFICE_NAME_KANA_Y,
+                 'officeNameKana')
+    fitted_text(ops, coord.OFFICE_NAME_KANJI_X, coord.OFFICE_NAME_KANJI_Y, data.officeNameKanji, 11,
+                'officeNameKanji', coord.OFFICE_NAME_KANJI_MAX_WIDTH)
+
+    # 営業所所在地
+    if data.officeSameAsAddress:
+        office = (data.prefecture, data.city, data.street, data.phone)
+    else:
+        office = (data.officePrefecture or '', data.officeCity or '', data.officeStreet or '',
+                  data.officePhone or '')
+    ops.append(Text(coord.OFFICE_PREF_X, coord.OFFICE_PREF_Y, office[0], 10, 'officePrefecture'))
+    fitted_text(ops, coord.OFFICE_CITY_X, coord.OFFICE_CITY_Y, office[1], 10, 'officeCity',
+                coord.OFFICE_CITY_MAX_WIDTH)
+    fitted_text(ops, coord.OFFICE_STREET_X, coord.OFFICE_STREET_Y, office[2], 10, 'officeStreet',
+                coord.OFFICE_STREET_MAX_WIDTH)
+    phone_parts(ops, office[3],
+                (coord.OFFICE_PHONE_AREA_X, coord.OFFICE_PHONE_LOCAL_X, coord.OFFICE_PHONE_NUMBER_X),
+                coord.OFFICE_PHONE_Y, 10, 'officePhone')
+
+    # 管理者情報
+    manager = resolve_manager(data)
+    kana_in_grid(ops, manager['kana'], coord.MANAGER_NAME_KANA_X, coord.MANAGER_NAME_KANA_Y,
+                 'managerNameKana')
+    fitted_text(ops, coord.MANAGER_NAME_KANJI_X, coord.MANAGER_NAME_KANJI_Y, manager['kanji'], 11,
+                'managerNameKanji', coord.MANAGER_NAME_KANJI_MAX_WIDTH)
+
+    era_mark(ops, manager['era'], coord.MANAGER_ERA_POSITIONS, coord.MANAGER_ERA_CIRCLE_Y,
+             'managerBirthEra')
+    text_spaced(ops, manager['year'], coord.MANAGER_BIRTH_YEAR_X, coord.MANAGER_BIRTH_Y, 10,
+                'managerBirthYear', coord.MANAGER_BIRTH_CHAR_WIDTH)
+    text_spaced(ops, manager['month'].zfill(2) if manager['month'] else '', coord.MANAGER_BIRTH_MONTH_X,
+                coord.MANAGER_BIRTH_Y, 10, 'managerBirthMonth', coord.MANAGER_BIRTH_CHAR_WIDTH)
+    text_spaced(ops, manager['day'].zfill(2) if manager['day'] else '', coord.MANAGER_BIRTH_DAY_X,
+                coord.MANAGER_BIRTH_Y, 10, 'managerBirthDay', coord.MANAGER_BIRTH_CHAR_WIDTH)
+
+    ops.append(Text(coord.MANAGER_PREF_X, coord.MANAGER_PREF_Y, manager['pref'], 10, 'managerPrefecture'))
+    fitted_text(ops, coord.MANAGER_CITY_X, coord.MANAGER_CITY_Y, manager['city'], 10, 'managerCity',
+                coord.MANAGER_CITY_MAX_WIDTH)
+    fitted_text(ops, coord.MANAGER_STREET_X, coord.MANAGER_STREET_Y, manager['street'], 10, 'managerStreet',
+                coord.MANAGER_STREET_MAX_WIDTH)
+
+    phone_parts(ops, manager['phone'],
+                (coord.MANAGER_PHONE_AREA_X, coord.MANAGER_PHONE_LOCAL_X, coord.MANAGER_PHONE_NUMBER_X),
+                coord.MANAGER_PHONE_Y, 10, 'managerPhone')
+
+    return ops
+
+
+def plan_shinsei_page3(data: FormData) -> Page:
+    """許可申請書その３（その他の営業所、使用しないので空）"""
+    return []
+
+
+def plan_shinsei_page4(data: FormData) -> Page:
+    """許可申請書その４（ホームページ）"""
+    ops: Page = []
+
+    if data.hasWebsite:
+        circle_mark(ops, *coord.WEBSITE_USE_CIRCLE, field='hasWebsite')
+        # URL（1文字ずつフリガナ付き）
+        if data.websiteUrl:
+            url_with_furigana(
+                ops,
+                url=data.websiteUrl,
+                start_x=coord.URL_GRID_START_X,
+                start_y=coord.URL_GRID_START_Y,
+                char_width=coord.URL_CHAR_WIDTH,
+                furigana_offset_y=coord.URL_FURIGANA_OFFSET,
+                max_chars_per_line=coord.URL_MAX_CHARS_PER_LINE,
+                line_height=coord.URL_LINE_HEIGHT,
+                field='websiteUrl',
+                char_font_size=coord.URL_CHAR_FONT_SIZE,
+                furigana_font_size=coord.URL_FURIGANA_FONT_SIZE,
+            )
+    else:
+        circle_mark(ops, *coord.WEBSITE_NOT_USE_CIRCLE, field='hasWebsite')
+
+    return ops
+
+
+# 許可申請書の各ページのプランを作る関数（テンプレートのページ順）
+SHINSEI_PAGES = (plan_shinsei_page1, plan_shinsei_page2, plan_shinsei_page3, plan_shinsei_page4)
+
+
+def plan_shinsei_pages(data: FormData) -> list[Page]:
+    """許可申請書その1〜4（固定マークはテンプレートに焼き込むので含めない）"""
+    return [plan_page(data) for plan_page in SHINSEI_PAGES]
+
+
+def person_field(is_manager: bool):
+    """誓約書・略歴書の field 名を作る関数（管理者の欄は manager を付ける）"""
+    if not is_manager:
+        return lambda name: name
+    return lambda name: 'manager' + name[0].upper() + name[1:]
+
+
+# ============================================
+# 誓約書
+# ============================================
+
+def plan_seiyakusho_page(data: FormData, is_manager: bool = False) -> Page:
+    """誓約書
+
+    Args:
+        is_manager: True=管理者用, False=申請者用
+    """
+    ops: Page = []
+
+    # 座標を選択（管理者用は別座標）
+    if is_manager:
+        pref_y = coord.SEIYAKU_KANRI_PREFECTURE_Y
+        addr_y = coord.SEIYAKU_KANRI_ADDRESS_Y
+        name_y = coord.SEIYAKU_KANRI_NAME_Y
+    else:
+        pref_y = coord.SEIYAKU_PREFECTURE_Y
+        addr_y = coord.SEIYAKU_ADDRESS_Y
+        name_y = coord.SEIYAKU_NAME_Y
+
+    # 公安委員会名（都道府県）- 右揃え
+    ops.append(RightText(coord.SEIYAKU_PREFECTURE_X, pref_y, data.submissionPrefecture, 10,
+                         'submissionPrefecture'))
+
+    # 署名日は空欄（提出時に記入）
+
+    # 住所・氏名
+    if is_manager and not data.managerSameAsApplicant:
+        address = f"{data.managerPrefecture or ''}{data.managerCity or ''}{data.managerStreet or ''}"
+        name = f"{data.managerLastNameKanji or ''} {data.managerFirstNameKanji or ''}"
+    else:
+        address = f"{data.prefecture}{data.city}{data.street}"
+        name = data.nameKanji
+
+    field = person_field(is_manager and not data.managerSameAsApplicant)
+    fitted_text(ops, coord.SEIYAKU_ADDRESS_X, addr_y, address, 10, field('address'),
+                coord.SEIYAKU_ADDRESS_MAX_WIDTH)
+    fitted_text(ops, coord.SEIYAKU_NAME_X, name_y, name, 10, field('nameKanji'), coord.SEIYAKU_NAME_MAX_WIDTH)
+
+    return ops
+
+
+# ============================================
+# 略歴書
+# ============================================
+
+def plan_ryakurekisyo_page(data: FormData, is_manager: bool = False,
+                           today: Optional[date] = None) -> Page:
+    """略歴書
+
+    Args:
+        is_manager: True=管理者用, False=申請者用
+        today: 年齢計算の基準日（省略時は当日）
+    """
+    ops: Page = []
+
+    # 対象者のデータを選択
+    if is_manager and not data.managerSameAsApplicant:
+        kana = f"{data.managerLastNameKana or ''} {data.managerFirstNameKana or ''}"
+        name = f"{data.managerLastNameKanji or ''} {data.managerFirstNameKanji or ''}"
+        birth_era = data.managerBirthEra or 'heisei'
+        birth_year = data.managerBirthYear or ''
+        birth_month = data.managerBirthMonth or ''
+        birth_day = data.managerBirthDay or ''
+        address = f"{data.managerPrefecture or ''}{data.managerCity or ''}{data.managerStreet or ''}"
+        career_history = data.managerCareerHistory or []
+    else:
+        kana = data.nameKana
+        name = data.nameKanji
+        birth_era = data.birthEra
+        birth_year = data.birthYear
+        birth_month = data.birthMonth
+        birth_day = data.birthDay
+        address = f"{data.prefecture}{data.city}{data.street}"
+        career_history = data.careerHistory or []
+    field = person_field(is_manager and not data.managerSameAsApplicant)
+
+    # ふりがな（略歴書はひらがな表記）
+    fitted_text(ops, coord.RYAKUREKI_KANA_X, coord.RYAKUREKI_KANA_Y, katakana_to_hiragana(kana), 10,
+                field('nameKana'), coord.RYAKUREKI_KANA_MAX_WIDTH)
+
+    # 氏名
+    fitted_text(ops, coord.RYAKUREKI_NAME_X, coord.RYAKUREKI_NAME_Y, name, 11, field('nameKanji'),
+                coord.RYAKUREKI_NAME_MAX_WIDTH)
+
+    # 生年月日（西暦）- 略歴書は右揃え、0埋めなし
+    ops.append(RightText(coord.RYAKUREKI_BIRTH_YEAR_X, coord.RYAKUREKI_BIRTH_Y, birth_year or '', 10,
+                         field('birthYear')))
+    ops.append(RightText(coord.RYAKUREKI_BIRTH_MONTH_X, coord.RYAKUREKI_BIRTH_Y, birth_month or '', 10,
+                         field('birthMonth')))
+    ops.append(RightText(coord.RYAKUREKI_BIRTH_DAY_X, coord.RYAKUREKI_BIRTH_Y, birth_day or '', 10,
+                         field('birthDay')))
+
+    # 年齢
+    age = calculate_age(birth_era, birth_year, birth_month, birth_day, today)
+    ops.append(Text(coord.RYAKUREKI_AGE_X, coord.RYAKUREKI_AGE_Y, str(age), 10, field('age')))
+
+    # 住所
+    fitted_text(ops, coord.RYAKUREKI_ADDRESS_X, coord.RYAKUREKI_ADDRESS_Y, address, 10, field('address'),
+                coord.RYAKUREKI_ADDRESS_MAX_WIDTH)
+
+    # 職歴等（最大6行 + 「現在に至る」）
+    for i, entry in enumerate(career_history[:6]):
+        y = coord.RYAKUREKI_CAREER_START_Y - (i * coord.RYAKUREKI_CAREER_LINE_HEIGHT)
+        # 期間（年・月）- 右揃え
+        ops.append(RightText(coord.RYAKUREKI_CAREER_YEAR_X, y, entry.year, 10, field(f'careerHistory[{i}].year')))
+        ops.append(RightText(coord.RYAKUREKI_CAREER_MONTH_X, y, entry.month, 10, field(f'careerHistory[{i}].month')))
+        # 内容 - 左揃え（長い場合は折り返す）
+        fitted_text(ops, coord.RYAKUREKI_CAREER_CONTENT_X, y, entry.content, 10,
+                    field(f'careerHistory[{i}].content'), coord.RYAKUREKI_CAREER_CONTENT_MAX_WIDTH,
+                    max_lines=coord.RYAKUREKI_CAREER_CONTENT_MAX_LINES)
+
+    # 7行目に「現在に至る」を自動追加（5下）
+    y = coord.RYAKUREKI_CAREER_START_Y - (6 * coord.RYAKUREKI_CAREER_LINE_HEIGHT) - 5
+    ops.append(Text(coord.RYAKUREKI_CAREER_CONTENT_X, y, '現在に至る', 10, field('careerHistory.end')))
+
+    # 署名日は空欄（提出時に記入）
+
+    # 署名（氏名）
+    fitted_text(ops, coord.RYAKUREKI_SIGN_NAME_X, coord.RYAKUREKI_SIGN_NAME_Y, name, 10, field('signName'),
+                coord.RYAKUREKI_SIGN_NAME_MAX_WIDTH)
+
+    return ops
+
+
+# ============================================
+# 全書類
+# ============================================
+
+def plan_bundle(data: FormData, today: Optional[date] = None) -> list[PlannedPage]:
+    """全書類のプラン（全書類PDFのページ順）
+
+    - 1-4: 古物商許可申請書その1〜4
+    - 5: 誓約書（申請者用）
+    - 6: 略歴書（申請者用）
+    - 7: 誓約書（管理者用、常に出力）
+    - 8: 略歴書（管理者用、管理者が申請者と異なる場合のみ）
+    """
+    pages = [PlannedPage('shinsei', i, ops) for i, ops in enumerate(plan_shinsei_pages(data))]
+    pages.append(PlannedPage('seiyaku_kojin', 0, plan_seiyakusho_page(data, is_manager=False)))
+    pages.append(PlannedPage('ryakureki', 0, plan_ryakurekisyo_page(data, is_manager=False, today=today)))
+    pages.append(PlannedPage('seiyaku_kanrisha', 0, plan_seiyakusho_page(data, is_manager=True)))
+    if not data.managerSameAsApplicant:
+        pages.append(PlannedPage('ryakureki_kanrisha', 0,
+                                 plan_ryakurekisyo_page(data, is_manager=True, today=today)))
+    return pages
+
+
+def page_key(page: PlannedPage) -> str:
+    """ページの内容のハッシュ
+
+    プランはそのページが読む入力項目だけから決まるので、入力項目の依存関係を
+    別に宣言しなくても、印字されない項目の違いではキーは変わらない。
+    略歴書の年齢のように日付で変わる内容もプランに含まれるので、キーに反映される。
+    """
+    h = hashlib.sha256()
+    h.update(f'{page.document}\0{page.index}\0{page.ops!r}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def plan_fingerprint(pages: list[PlannedPage]) -> str:
+    """全書類のプランのハッシュ（各ページの page_key をページ順に連結したもの）"""
+    h = hashlib.sha256()
+    for page in pages:
+        h.update(page_key(page).encode('ascii'))
+    return h.hexdigest()
+
+
+def find_overflows(pages: list[PlannedPage]) -> list[dict]:
+    """縮小・折り返しをしても欄に収まらなかった文字列（page は1始まりの通し番号）"""
+    overflows = []
+    for number, planned in enumerate(pages, start=1):
+        for op in planned.ops:
+            max_width = getattr(op, 'max_width', None)
+            if max_width is None:
+                continue
+            width = text_shaping.string_width(op.text, op.font_size)
+            if width > max_width:
+                overflows.append({
+                    'page': number,
+                    'document': planned.document,
+                    'field': op.field,
+                    'width': round(width, 2),
+                    'max_width': max_width,
+                })
+    return overflows
+
+
+def overflow_fields(pages: list[PlannedPage]) -> list[str]:
+    """欄に収まらなかった項目の field（重複なし、ページ順）"""
+    return list(dict.fromkeys(overflow['field'] for overflow in find_overflows(pages)))
+
+
+def op_to_dict(op: Op) -> dict:
+    """描画命令を JSON 化できる辞書にする"""
+    return {'kind': op.kind, **op._asdict()}
+
+
+def plan_to_dict(pages: list[PlannedPage]) -> dict:
+    """全書類のプランを JSON 化できる辞書にする（page は1始まりの通し番号）"""
+    return {
+        'page_width': PAGE_WIDTH,
+        'page_height': PAGE_HEIGHT,
+        'font': FONT_NAME,
+        'pages': [
+            {
+                'page': number,
+                'document': planned.document,
+                'index': planned.index,
+                'items': [op_to_dict(op) for op in planned.ops],
+            }
+            for number, planned in enumerate(pages, start=1)
+        ],
+    }
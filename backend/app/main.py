@@ -1,20 +1,334 @@
 """古物商許可申請書 生成API"""
 
-from pathlib import Path
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Optional
 from urllib.parse import quote
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from .schemas import FormData, CareerEntry
-from .pdf_generator import generate_kobutsu_pdf, generate_test_pdf, generate_full_application_pdf
+from .schemas import BatchRequest, FormData, CareerEntry
+from .pdf_generator import (
+    coordinates_fingerprint,
+    generate_full_application_pdf,
+    renderer_fingerprint,
+    warm_up,
+)
+from .executor import render_executor
+from .template_cache import template_cache
+from .result_cache import result_cache, bundle_cache_key
+from .single_flight import single_flight
+from .batch import stream_zip
+from .config import TEMPLATE_PATH, SEIYAKU_KOJIN_PATH, SEIYAKU_KANRISHA_PATH, RYAKUREKI_PATH
+from . import config
+from . import layout
+from . import metrics
+from . import postal
+from . import validation
+
+
+# 実行バックエンド・結果キャッシュの状態を /api/metrics に出す
+metrics.register_gauge(
+    'kobutsu_render_in_flight', '実行中のPDF生成の件数',
+    lambda: {(): render_executor.in_flight})
+metrics.register_gauge(
+    'kobutsu_render_queue_depth', '空きワーカー待ちのPDF生成の件数',
+    lambda: {(): render_executor.queue_depth})
+metrics.register_gauge(
+    'kobutsu_render_max_workers', 'PDF生成の同時実行数の上限',
+    lambda: {(): render_executor.max_workers})
+metrics.register_counter_from(
+    'kobutsu_result_cache_requests_total', '生成結果キャッシュの参照件数',
+    lambda: {
+        ('hit',): result_cache.hits - result_cache.disk_hits,
+        ('disk_hit',): result_cache.disk_hits,
+        ('miss',): result_cache.misses,
+    },
+    ('result',))
+metrics.register_counter_from(
+    'kobutsu_coalesced_requests_total', '実行中の同じ内容のPDF生成の結果を待って返した件数',
+    lambda: {(): single_flight.coalesced})
+metrics.register_gauge(
+    'kobutsu_result_cache_memory_bytes', '生成結果キャッシュ（メモリ）の使用バイト数',
+    lambda: {(): result_cache.stats()['memory_bytes']})
+metrics.register_gauge(
+    'kobutsu_postal_index_records', '郵便番号の索引のレコード数（読めない場合は0）',
+    lambda: {(): postal_index_status()['records']})
+metrics.register_gauge(
+    'kobutsu_postal_index_ready', '郵便番号の索引が読めて KOBUTSU_POSTAL_MIN_RECORDS 件以上あれば1',
+    lambda: {(): int(postal_index_status()['ready'])})
+
+
+def template_specs() -> list:
+    """テンプレートのパスと名称の一覧"""
+    return [
+        (TEMPLATE_PATH, "許可申請書テンプレート"),
+        (SEIYAKU_KOJIN_PATH, "誓約書（個人用）テンプレート"),
+        (SEIYAKU_KANRISHA_PATH, "誓約書（管理者用）テンプレート"),
+        (RYAKUREKI_PATH, "略歴書テンプレート"),
+    ]
+
+
+def check_templates():
+    """テンプレートが読み込めるか確認（初回のみ読み込み・検証し、以降はキャッシュを参照）"""
+    for path, name in template_specs():
+        try:
+            template_cache.load(path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=500,
+                detail=f"{name}が見つかりません: {path}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"{name}を読み込めません: {str(e)}"
+            )
+
+
+def postal_index_status() -> dict:
+    """郵便番号の索引の状態（レコード数と、KOBUTSU_POSTAL_MIN_RECORDS 件以上あるか）
+
+    PDF生成には索引を使わないので /api/ready には含めず、/api/metrics に出す。
+    """
+    try:
+        records = len(postal.postal_index)
+    except (OSError, ValueError):
+        return {'records': 0, 'ready': False}
+    return {'records': records, 'ready': records >= config.POSTAL_MIN_RECORDS}
+
+
+def template_paths() -> list[str]:
+    """全書類PDFの生成に渡すテンプレートのパス（許可申請書・誓約書2種・略歴書の順）"""
+    return [str(TEMPLATE_PATH), str(SEIYAKU_KOJIN_PATH), str(SEIYAKU_KANRISHA_PATH), str(RYAKUREKI_PATH)]
+
+
+def sample_form_data() -> FormData:
+    """テストPDF・ウォームアップ用のサンプルデータ"""
+    return FormData(
+        applicantType='individual',
+        lastNameKanji='山田',
+        firstNameKanji='太郎',
+        lastNameKana='ヤマダ',
+        firstNameKana='タロウ',
+        birthEra='heisei',
+        birthYear='5',
+        birthMonth='3',
+        birthDay='15',
+        prefecture='大阪府',
+        city='大阪市北区',
+        street='梅田1-2-3',
+        phone='06-1234-5678',
+        officeSameAsAddress=True,
+        officeNameKana='ヤマダショウテン',
+        officeNameKanji='山田商店',
+        managerSameAsApplicant=True,
+        hasWebsite=False,
+        submissionPrefecture='大阪府',
+        careerHistory=[
+            CareerEntry(year='2015', month='4', content='○○大学 入学'),
+            CareerEntry(year='2019', month='3', content='同大学 卒業'),
+            CareerEntry(year='2019', month='4', content='株式会社○○商事 入社'),
+            CareerEntry(year='2021', month='9', content='同社 退職'),
+            CareerEntry(year='2021', month='10', content='△△株式会社 入社'),
+            CareerEntry(year='2023', month='3', content='同社 退職'),
+        ],
+    )
+
+
+async def render_bundle(data: FormData,
+                        plan: Optional[list[layout.PlannedPage]] = None) -> tuple[bytes, bool]:
+    """全書類PDFを生成（結果キャッシュにあればそれを返す）
+
+    同じ内容の生成が実行中なら、新たに生成せずその結果を待つ。
+
+    Args:
+        plan: 作成済みのレイアウトプラン（キャッシュキー・生成に使う。省略時は data から作る）
+
+    Returns:
+        (PDFのバイト列, キャッシュから返したかどうか)
+    """
+    paths = template_paths()
+    if plan is None:
+        plan = layout.plan_bundle(data)
+    options = {'deterministic': config.DETERMINISTIC_PDF, 'overlay_backend': config.OVERLAY_BACKEND}
+    key = bundle_cache_key(data, [template_cache.fingerprint(path) for path in paths], plan=plan,
+                           renderer=renderer_fingerprint(), **options)
+    pdf_bytes = await result_cache.get_async(key)
+    if pdf_bytes is not None:
+        return pdf_bytes, True
+
+    async def render() -> bytes:
+        # PDF生成はCPU負荷が高いのでワーカープールで実行
+        pdf_bytes, stages = await render_executor.run(
+            metrics.collect_stages, generate_full_application_pdf, data, *paths, plan=plan, **options,
+        )
+        metrics.observe_stages(stages)
+        await result_cache.put_async(key, pdf_bytes)
+        return pdf_bytes
+
+    return await single_flight.run(key, render), False
+
+
+# ============================================
+# テストPDF（サンプルデータの生成結果）
+# ============================================
+
+# テストPDFの Cache-Control（?v= に現在の ETag を付けたURLは内容が変わらないので immutable）
+SAMPLE_PDF_CACHE_CONTROL = "no-cache"
+SAMPLE_PDF_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# grid -> (生成元のバージョン, ETag, PDFのバイト列)
+sample_pdfs: dict[bool, tuple[str, str, bytes]] = {}
+_sample_pdf_lock = asyncio.Lock()
+
+
+def sample_pdf_version(grid: bool) -> str:
+    """テストPDFの生成元のバージョン（テンプレート・座標定義が変わると変わる）"""
+    h = hashlib.sha256()
+    for part in (
+        coordinates_fingerprint(),
+        *(template_cache.fingerprint(path) for path in template_paths()),
+        f"grid={grid}",
+        f"deterministic={config.DETERMINISTIC_PDF}",
+    ):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+async def get_sample_pdf(grid: bool) -> tuple[str, bytes]:
+    """テストPDFを返す（初回とテンプレート・座標定義の変更時だけ生成）
+
+    Returns:
+        (ETag, PDFのバイト列)
+    """
+    version = sample_pdf_version(grid)
+    cached = sample_pdfs.get(grid)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    async with _sample_pdf_lock:
+        cached = sample_pdfs.get(grid)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        pdf_bytes, stages = await render_executor.run(
+            metrics.collect_stages,
+            generate_full_application_pdf,
+            sample_form_data(),
+            *template_paths(),
+            with_grid=grid,
+            deterministic=config.DETERMINISTIC_PDF,
+        )
+        metrics.observe_stages(stages)
+        return store_sample_pdf(grid, version, pdf_bytes)
+
+
+def store_sample_pdf(grid: bool, version: str, pdf_bytes: bytes) -> tuple[str, bytes]:
+    """生成したテストPDFを保持して (ETag, PDFのバイト列) を返す"""
+    etag = f'"{hashlib.sha256(pdf_bytes).hexdigest()[:32]}"'
+    sample_pdfs[grid] = (version, etag, pdf_bytes)
+    return etag, pdf_bytes
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダが ETag に一致するか"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+# ============================================
+# 起動時のウォームアップ
+# ============================================
+
+# /api/ready が返す状態（'starting' → 'ready' または 'failed'）
+readiness = {'status': 'starting', 'detail': None}
+
+# fork 前に preload() 済みかどうか（済みならワーカーの起動時にウォームアップしない）
+preloaded = False
+
+
+def warm_up_worker():
+    """ワーカー（プロセスプールでは各ワーカープロセス）の初期化"""
+    warm_up(sample_form_data(), *template_paths(), deterministic=config.DETERMINISTIC_PDF)
+
+
+async def run_warm_up():
+    """フォント登録・テンプレート読み込み・捨て生成をワーカーで実行"""
+    try:
+        check_templates()
+        # プロセスプールでは全てのワーカープロセスの初期化が終わるまで待つ
+        render_executor.set_initializer(warm_up_worker)
+        await render_executor.start_workers()
+        # テストPDFも先に生成しておく
+        for grid in (False, True):
+            await get_sample_pdf(grid)
+    except HTTPException as e:
+        readiness.update(status='failed', detail=e.detail)
+    except Exception as e:
+        readiness.update(status='failed', detail=f"ウォームアップに失敗しました: {str(e)}")
+    else:
+        readiness.update(status='ready', detail=None)
+
+
+def preload():
+    """ウォームアップをこのプロセスで同期的に済ませる（app.server がワーカーの fork 前に呼ぶ）
+
+    フォント・テンプレート（固定マークの焼き込みを含む）・ドットグリッド・テストPDFを
+    読み込み・生成しておく。fork したワーカーはこれらをコピーオンライトで共有し、
+    起動時のウォームアップを省略する。ワーカープールは使わない（fork 前にスレッドや
+    子プロセスを作らないため）。
+    """
+    global preloaded
+    paths = template_paths()
+    check_templates()
+    warm_up(sample_form_data(), *paths, deterministic=config.DETERMINISTIC_PDF)
+    for grid in (False, True):
+        pdf_bytes = generate_full_application_pdf(
+            sample_form_data(), *paths, with_grid=grid, deterministic=config.DETERMINISTIC_PDF,
+        )
+        store_sample_pdf(grid, sample_pdf_version(grid), pdf_bytes)
+    # 郵便番号の索引も開いておく（mmap はワーカーがそのまま共有する）
+    try:
+        postal.postal_index.open()
+    except (OSError, ValueError):
+        pass  # 索引がなければ郵便番号の検索時にエラーを返す
+    readiness.update(status='ready', detail=None)
+    preloaded = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動・終了処理"""
+    warm_up_task = None
+    if config.WARMUP and not preloaded:
+        # 起動（/api/health の応答）は待たせず、裏でウォームアップする
+        readiness.update(status='starting', detail=None)
+        warm_up_task = asyncio.create_task(run_warm_up())
+    else:
+        # テンプレートを起動時に読み込んでおく（失敗時はリクエスト時にエラーを返す）
+        try:
+            check_templates()
+        except HTTPException:
+            pass
+        readiness.update(status='ready', detail=None)
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    render_executor.shutdown(wait=False)
 
 
 app = FastAPI(
     title="古物商許可申請書 生成API",
     description="フォームデータからPDFを生成するAPI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS設定
@@ -24,14 +338,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Overflow-Fields"],
 )
 
-# テンプレートPDFのパス
-TEMPLATE_PATH = Path(__file__).parent.parent / "templates" / "template.pdf"
-SEIYAKU_KOJIN_PATH = Path(__file__).parent.parent / "templates" / "r07_01_kobutsu_seiyakusho_kojin.pdf"
-SEIYAKU_KANRISHA_PATH = Path(__file__).parent.parent / "templates" / "r07_03_kobutsu_seiyakusho_kanrisha.pdf"
-RYAKUREKI_PATH = Path(__file__).parent.parent / "templates" / "r02_ryakurekisyo.pdf"
-
 
 @app.get("/api/health")
 async def health_check():
@@ -39,122 +348,187 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """レディネスチェック（ウォームアップが終わるまでは503）"""
+    if readiness['status'] == 'ready':
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content=dict(readiness))
+
+
 @app.post("/api/generate-pdf")
 async def generate_pdf(data: FormData):
-    """PDF生成エンドポイント（全書類を含む）"""
-    # テンプレートの存在確認
-    templates = [
-        (TEMPLATE_PATH, "許可申請書テンプレート"),
-        (SEIYAKU_KOJIN_PATH, "誓約書（個人用）テンプレート"),
-        (SEIYAKU_KANRISHA_PATH, "誓約書（管理者用）テンプレート"),
-        (RYAKUREKI_PATH, "略歴書テンプレート"),
-    ]
-    for path, name in templates:
-        if not path.exists():
+    """PDF生成エンドポイント（全書類を含む）
+
+    縮小・折り返しをしても欄に収まらなかった項目があれば X-Overflow-Fields に
+    field をカンマ区切りで入れる。
+    """
+    with metrics.track_request('generate-pdf'):
+        # 不正な入力は生成の前に弾く
+        errors = validation.validate_form(data)
+        if errors:
+            raise HTTPException(status_code=422, detail=errors)
+        check_templates()
+
+        try:
+            plan = layout.plan_bundle(data)
+            pdf_bytes, cached = await render_bundle(data, plan)
+
+            # ファイル名生成（RFC 5987に従ってURLエンコード）
+            filename = f"古物商許可申請書一式_{data.nameKanji}.pdf"
+            encoded_filename = quote(filename, safe='')
+
+            headers = {
+                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+                "X-Cache": "HIT" if cached else "MISS",
+            }
+            overflows = layout.overflow_fields(plan)
+            if overflows:
+                headers["X-Overflow-Fields"] = ",".join(overflows)
+
+            metrics.BYTES_OUT.inc(len(pdf_bytes), endpoint='generate-pdf')
+            return Response(
+                content=pdf_bytes,
+                media_type="application/pdf",
+                headers=headers,
+            )
+        except Exception as e:
             raise HTTPException(
                 status_code=500,
-                detail=f"{name}が見つかりません: {path}"
+                detail=f"PDF生成に失敗しました: {str(e)}"
             )
 
+
+@app.post("/api/preview")
+async def preview(data: FormData):
+    """プレビュー用の配置データ（全書類の各項目のページ・位置・フォントサイズ・文字列）
+
+    PDFは生成せず、レイアウトプランをそのまま JSON で返す。
+    座標はPDFのポイント（左下原点）で、フリガナの半角化・電話番号の分割などは適用済み。
+    overflows には、縮小・折り返しをしても欄に収まらなかった文字列を入れる。
+    """
+    with metrics.track_request('preview'):
+        plan = layout.plan_bundle(data)
+        return {**layout.plan_to_dict(plan), 'overflows': layout.find_overflows(plan)}
+
+
+@app.post("/api/validate")
+async def validate(data: FormData):
+    """入力内容の検証（PDFは生成しない）
+
+    描画が前提とする内容（元号・日付・電話番号・フリガナなど）のエラーを全て返す。
+    errors があれば /api/generate-pdf は422を返す。overflows は縮小・折り返しを
+    しても欄に収まらない文字列（生成はできる）。
+    """
+    with metrics.track_request('validate'):
+        errors = validation.validate_form(data)
+        return {
+            'valid': not errors,
+            'errors': errors,
+            'overflows': layout.find_overflows(layout.plan_bundle(data)),
+        }
+
+
+@app.get("/api/postal-code/{code}")
+async def postal_code(code: str):
+    """郵便番号から都道府県・市区町村・町域を引く（同梱の索引を使い、外部には問い合わせない）"""
+    with metrics.track_request('postal-code'):
+        normalized = postal.normalize_postal_code(code)
+        if normalized is None:
+            raise HTTPException(status_code=422, detail="郵便番号は7桁の数字で入力してください")
+        try:
+            addresses = postal.lookup_address(normalized)
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=503, detail=f"郵便番号の索引を読み込めません: {str(e)}")
+        if not addresses:
+            raise HTTPException(status_code=404, detail=f"郵便番号が見つかりません: {normalized}")
+        return {"postalCode": normalized, "addresses": addresses}
+
+
+@app.post("/api/generate-batch")
+async def generate_batch(request: BatchRequest):
+    """複数申請の一括生成（書類ごとのPDFと manifest.json を含むZIPをストリーミングで返す）
+
+    1件ごとの失敗は manifest.json に記録し、残りの生成は続ける。
+    """
     try:
-        pdf_bytes = generate_full_application_pdf(
-            data,
-            str(TEMPLATE_PATH),
-            str(SEIYAKU_KOJIN_PATH),
-            str(SEIYAKU_KANRISHA_PATH),
-            str(RYAKUREKI_PATH),
-        )
+        if not request.records:
+            raise HTTPException(status_code=422, detail="レコードがありません")
+        if len(request.records) > config.BATCH_MAX_RECORDS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"一度に生成できるのは{config.BATCH_MAX_RECORDS}件までです"
+            )
+        check_templates()
+    except HTTPException:
+        # 生成を始める前に弾いたリクエストも件数・失敗件数に数える
+        with metrics.track_request('generate-batch'):
+            raise
 
-        # ファイル名生成（RFC 5987に従ってURLエンコード）
-        filename = f"古物商許可申請書一式_{data.nameKanji}.pdf"
-        encoded_filename = quote(filename, safe='')
+    def count_bytes(chunk: bytes):
+        metrics.BYTES_OUT.inc(len(chunk), endpoint='generate-batch')
 
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"PDF生成に失敗しました: {str(e)}"
-        )
+    # 生成済みの書類を溜め込みすぎないよう、同時生成数はワーカー数の2倍まで
+    # 件数・処理時間は ZIP を最後まで送り終えるまでを計測する
+    stream = metrics.track_stream('generate-batch', stream_zip(
+        request.records, render_bundle,
+        concurrency=render_executor.max_workers * 2,
+        on_chunk=count_bytes,
+    ))
+    filename = quote("古物商許可申請書一式.zip", safe='')
+    return StreamingResponse(
+        stream,
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}"},
+    )
 
 
 @app.get("/api/test-pdf")
-async def test_pdf(grid: bool = False):
+async def test_pdf(request: Request, grid: bool = False, v: Optional[str] = None):
     """テストPDF生成
 
+    サンプルデータの生成結果はメモリに保持し、テンプレート・座標定義が変わるまで使い回す。
+    If-None-Match が ETag に一致すれば 304 を返す。
+
     Args:
         grid: True=ドットグリッド付き（座標調整用）
+        v: 現在の ETag（引用符なし）。一致する場合は immutable としてキャッシュさせる
     """
-    templates = [
-        (TEMPLATE_PATH, "許可申請書テンプレート"),
-        (SEIYAKU_KOJIN_PATH, "誓約書（個人用）テンプレート"),
-        (SEIYAKU_KANRISHA_PATH, "誓約書（管理者用）テンプレート"),
-        (RYAKUREKI_PATH, "略歴書テンプレート"),
-    ]
-    for path, name in templates:
-        if not path.exists():
+    with metrics.track_request('test-pdf'):
+        check_templates()
+
+        try:
+            etag, pdf_bytes = await get_sample_pdf(grid)
+        except Exception as e:
             raise HTTPException(
                 status_code=500,
-                detail=f"{name}が見つかりません: {path}"
+                detail=f"PDF生成に失敗しました: {str(e)}"
             )
 
-    try:
-        # サンプルデータで全書類を生成
-        sample_data = FormData(
-            applicantType='individual',
-            lastNameKanji='山田',
-            firstNameKanji='太郎',
-            lastNameKana='ヤマダ',
-            firstNameKana='タロウ',
-            birthEra='heisei',
-            birthYear='5',
-            birthMonth='3',
-            birthDay='15',
-            prefecture='大阪府',
-            city='大阪市北区',
-            street='梅田1-2-3',
-            phone='06-1234-5678',
-            officeSameAsAddress=True,
-            officeNameKana='ヤマダショウテン',
-            officeNameKanji='山田商店',
-            managerSameAsApplicant=True,
-            hasWebsite=False,
-            submissionPrefecture='大阪府',
-            careerHistory=[
-                CareerEntry(year='2015', month='4', content='○○大学 入学'),
-                CareerEntry(year='2019', month='3', content='同大学 卒業'),
-                CareerEntry(year='2019', month='4', content='株式会社○○商事 入社'),
-                CareerEntry(year='2021', month='9', content='同社 退職'),
-                CareerEntry(year='2021', month='10', content='△△株式会社 入社'),
-                CareerEntry(year='2023', month='3', content='同社 退職'),
-            ],
-        )
-        pdf_bytes = generate_full_application_pdf(
-            sample_data,
-            str(TEMPLATE_PATH),
-            str(SEIYAKU_KOJIN_PATH),
-            str(SEIYAKU_KANRISHA_PATH),
-            str(RYAKUREKI_PATH),
-            with_grid=grid,
-        )
+        immutable = v is not None and f'"{v}"' == etag
+        headers = {
+            "ETag": etag,
+            "Cache-Control": SAMPLE_PDF_IMMUTABLE_CACHE_CONTROL if immutable else SAMPLE_PDF_CACHE_CONTROL,
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
         filename = "test_full_application_grid.pdf" if grid else "test_full_application.pdf"
+        metrics.BYTES_OUT.inc(len(pdf_bytes), endpoint='test-pdf')
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{filename}"
+                **headers,
+                "Content-Disposition": f"attachment; filename*=UTF-8''{filename}",
             }
         )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"PDF生成に失敗しました: {str(e)}"
-        )
+
+
+@app.get("/api/metrics")
+async def metrics_endpoint():
+    """処理時間・件数のメトリクス（Prometheusのテキスト形式）"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
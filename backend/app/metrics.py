@@ -0,0 +1,339 @@
+"""処理時間・件数のメトリクス
+
+/api/metrics で Prometheus のテキスト形式で公開する。常時有効にしておけるよう、
+記録は time.perf_counter() 2回とロック付きの加算だけにしている。
+
+PDF生成の各段階（オーバーレイ描画・テンプレート読み込み・マージ・書き出し）は
+stage() で計測する。ワーカー（スレッド・プロセス）内では collect_stages() で
+計測値をまとめて呼び出し元に返し、呼び出し元のプロセスで observe_stages() する。
+プロセスプールでもメトリクスが親プロセスに集まるようにするため。
+
+プリフォーク型のサーバー（app.server）では、計測値・結果キャッシュ・実行中の生成の
+まとめ（single_flight）はワーカープロセスごとに持ち、/api/metrics はリクエストを
+受けたワーカーの値だけを返す。取り違えないよう、全ての系列に worker ラベル
+（ワーカーの番号。入れ替え後も同じ番号を引き継ぐ）を付ける（set_worker）。
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+
+# 処理時間のヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# 全ての系列に付けるラベル（set_worker で設定）
+_const_labels = ''
+
+
+def set_worker(worker: Optional[str]):
+    """このプロセスの全ての系列に worker ラベルを付ける（None で外す）"""
+    global _const_labels
+    _const_labels = f'worker="{_escape(worker)}"' if worker is not None else ''
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if _const_labels:
+        pairs.append(_const_labels)
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ============================================
+# メトリクスの種類
+# ============================================
+
+class _Metric:
+    """ラベル付きメトリクスの共通部分"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} のラベルは {self.labelnames} です: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> list[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """単調増加するカウンタ"""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(_Metric):
+    """現在値を表すメトリクス（取得時に関数を呼んで値を求める）
+
+    Args:
+        collect: ラベル値のタプル -> 値 の辞書を返す関数
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], dict],
+                 labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, value in sorted(self._collect().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+    def clear(self):
+        pass
+
+
+class CallbackCounter(Gauge):
+    """他のオブジェクトが数えている累計値をカウンタとして出力する"""
+
+    type_name = 'counter'
+
+
+class Histogram(_Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 -> [バケットごとの件数..., +Inf の件数, 合計]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._label_values(labels))
+        return int(sum(entry[:-1])) if entry else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(entry)) for key, entry in self._values.items())
+        lines = self._header()
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), entry):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(entry[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """メトリクスの一覧"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式で出力"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """計測値を破棄（テスト用）"""
+        for metric in self._metrics:
+            metric.clear()
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+
+# ============================================
+# アプリのメトリクス
+# ============================================
+
+REQUESTS = registry.register(Counter(
+    'kobutsu_requests_total', 'APIリクエストの件数', ('endpoint',)))
+# kind は 'error'（生成の失敗など）または 'invalid'（入力の誤りなどで弾いた 4xx）
+ERRORS = registry.register(Counter(
+    'kobutsu_request_errors_total', '失敗したAPIリクエストの件数', ('endpoint', 'kind')))
+CANCELLED = registry.register(Counter(
+    'kobutsu_requests_cancelled_total', '途中で打ち切られたAPIリクエスト（クライアントの切断など）の件数',
+    ('endpoint',)))
+BYTES_OUT = registry.register(Counter(
+    'kobutsu_response_bytes_total', '返したPDFの合計バイト数', ('endpoint',)))
+REQUEST_SECONDS = registry.register(Histogram(
+    'kobutsu_request_duration_seconds', 'APIリクエストの処理時間', ('endpoint',)))
+STAGE_SECONDS = registry.register(Histogram(
+    'kobutsu_pdf_stage_duration_seconds', 'PDF生成の段階ごとの処理時間', ('stage',)))
+
+
+def register_gauge(name: str, documentation: str, collect: Callable[[], dict],
+                   labelnames: tuple[str, ...] = ()) -> Gauge:
+    """取得時に値を求めるゲージを登録"""
+    return registry.register(Gauge(name, documentation, collect, labelnames))
+
+
+def register_counter_from(name: str, documentation: str, collect: Callable[[], dict],
+                          labelnames: tuple[str, ...] = ()) -> Gauge:
+    """他のオブジェクトが数えている累計値をカウンタとして登録"""
+    return registry.register(CallbackCounter(name, documentation, collect, labelnames))
+
+
+def error_kind(error: BaseException) -> str:
+    """失敗の種類（status_code が 4xx の例外は 'invalid'、それ以外は 'error'）
+
+    入力の誤りで弾いたリクエスト（HTTPException の 422 など）を、生成の失敗と
+    分けて数えるため（エラー率の監視は kind="error" だけを見る）。
+    """
+    status = getattr(error, 'status_code', None)
+    return 'invalid' if isinstance(status, int) and 400 <= status < 500 else 'error'
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[None]:
+    """リクエストの件数・処理時間・失敗件数（種類別、error_kind）を記録
+
+    クライアントの切断などで打ち切られたもの（CancelledError・ストリームの GeneratorExit）は
+    失敗ではなく打ち切りの件数（CANCELLED）に数える。
+    """
+    REQUESTS.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        CANCELLED.inc(endpoint=endpoint)
+        raise
+    except Exception as e:
+        ERRORS.inc(endpoint=endpoint, kind=error_kind(e))
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+async def track_stream(endpoint: str, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """ストリーミングで返すレスポンスの件数・処理時間・失敗件数を記録
+
+    処理時間は最後のチャンクを送り出すまで。途中の例外は失敗に、クライアントの切断は打ち切りに数える。
+    """
+    with track_request(endpoint):
+        async for chunk in stream:
+            yield chunk
+
+
+# ============================================
+# 段階ごとの計測
+# ============================================
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """with ブロックの処理時間を段階 name として記録
+
+    collect_stages() の中ではそこに集め、それ以外では直接ヒストグラムに記録する。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        collected: Optional[list] = getattr(_local, 'stages', None)
+        if collected is not None:
+            collected.append((name, elapsed))
+        else:
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+
+def collect_stages(fn: Callable[..., Any], *args, **kwargs) -> tuple[Any, list[tuple[str, float]]]:
+    """fn を実行し、(結果, [(段階, 秒), ...]) を返す（ワーカー内で呼ぶ）"""
+    previous = getattr(_local, 'stages', None)
+    _local.stages = []
+    try:
+        result = fn(*args, **kwargs)
+        return result, _local.stages
+    finally:
+        _local.stages = previous
+
+
+def observe_stages(stages: list[tuple[str, float]]):
+    """collect_stages() で集めた計測値をヒストグラムに記録"""
+    for name, elapsed in stages:
+        STAGE_SECONDS.observe(elapsed, stage=name)
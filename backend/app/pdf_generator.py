@@ -1,18 +1,36 @@
 """古物商許可申請書 PDF生成モジュール"""
 
+import hashlib
 import io
-import unicodedata
-from datetime import date
+import threading
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
+import pypdf
+import reportlab
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from pypdf import PdfReader, PdfWriter
 
+from . import config
 from . import coordinates as coord
+from . import direct_overlay, layout, metrics, text_shaping
+from .layout import (  # noqa: F401  純粋な変換処理は layout に移した（互換のため再エクスポート）
+    ERA_TO_SEIREKI,
+    URL_FURIGANA_MAP,
+    calculate_age,
+    get_url_furigana,
+    katakana_to_hiragana,
+    parse_phone,
+    separate_dakuten,
+    to_halfwidth_kana,
+)
 from .schemas import FormData
+from .template_cache import template_cache
+from .pdf_merge import merge_overlay, set_file_identifier, stamp_form
 
 
 # ============================================
@@ -42,6 +60,7 @@ def register_font():
             try:
                 pdfmetrics.registerFont(TTFont('IPAGothic', font_path))
                 FONT_REGISTERED = True
+                text_shaping.clear_width_cache()
                 return
             except Exception:
                 continue
@@ -53,51 +72,13 @@ def register_font():
 # ユーティリティ関数
 # ============================================
 
-def separate_dakuten(text: str) -> list[str]:
-    """濁点・半濁点を分離して1マスずつにする"""
-    result = []
-    for char in text:
-        decomposed = unicodedata.normalize('NFD', char)
-        for c in decomposed:
-            result.append(c)
-    return result
-
-
-def katakana_to_hiragana(text: str) -> str:
-    """カタカナをひらがなに変換"""
-    return ''.join(
-        chr(ord(c) - 0x60) if 'ァ' <= c <= 'ン' else c
-        for c in text
-    )
-
-
-def to_halfwidth_kana(char: str) -> str:
-    """全角カナ・濁点を半角に変換"""
-    trans_table = str.maketrans(
-        'アイウエオカキクケコサシスセソタチツテトナニヌネノ'
-        'ハヒフヘホマミムメモヤユヨラリルレロワヲン'
-        'ァィゥェォッャュョー・゛゜\u3099\u309A',
-        'ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉ'
-        'ﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜｦﾝ'
-        'ｧｨｩｪｫｯｬｭｮｰ･ﾞﾟﾞﾟ'
-    )
-    return char.translate(trans_table)
-
-
 def draw_kana_in_grid(c: canvas.Canvas, text: str, start_x: float, y: float,
                       char_width: float = 13.5, font_size: float = 9):
     """フリガナをマス目に1文字ずつ配置"""
     c.setFont('IPAGothic', font_size)
-    separated = separate_dakuten(text)
-    col = 0
-    for char in separated:
-        if char in (' ', '　'):
-            col += 1
-            continue
-        hw = to_halfwidth_kana(char)
+    for col, char in text_shaping.shape_kana_grid(text):
         x = start_x + (col * char_width)
-        c.drawString(x, y, hw)
-        col += 1
+        c.drawString(x, y, char)
 
 
 def draw_text_spaced(c: canvas.Canvas, text: str, start_x: float, y: float,
@@ -127,23 +108,6 @@ def draw_double_line(c: canvas.Canvas, x_start: float, x_end: float, y: float,
 # URL描画用定数・関数
 # ============================================
 
-# フリガナマッピングテーブル
-URL_FURIGANA_MAP = {
-    # 英小文字
-    'a': 'ｴｰ', 'b': 'ﾋﾞｰ', 'c': 'ｼｰ', 'd': 'ﾃﾞｨｰ', 'e': 'ｲｰ',
-    'f': 'ｴﾌ', 'g': 'ｼﾞｰ', 'h': 'ｴｲﾁ', 'i': 'ｱｲ', 'j': 'ｼﾞｪｲ',
-    'k': 'ｹｲ', 'l': 'ｴﾙ', 'm': 'ｴﾑ', 'n': 'ｴﾇ', 'o': 'ｵｰ',
-    'p': 'ﾋﾟｰ', 'q': 'ｷｭｰ', 'r': 'ｱｰﾙ', 's': 'ｴｽ', 't': 'ﾃｨｰ',
-    'u': 'ﾕｰ', 'v': 'ﾌﾞｲ', 'w': 'ﾀﾞﾌﾞﾘｭｰ', 'x': 'ｴｯｸｽ', 'y': 'ﾜｲ', 'z': 'ｾﾞｯﾄ',
-    # 記号
-    ':': 'ｺﾛﾝ', '/': 'ｽﾗｯｼｭ', '.': 'ﾄﾞｯﾄ', '-': 'ﾊｲﾌﾝ',
-    '_': 'ｱﾝﾀﾞｰﾊﾞｰ', '~': 'ﾁﾙﾀﾞ', '@': 'ｱｯﾄ', '#': 'ｼｬｰﾌﾟ',
-    '?': 'ﾊﾃﾅ', '=': 'ｲｺｰﾙ', '&': 'ｱﾝﾄﾞ', '%': 'ﾊﾟｰｾﾝﾄ',
-    # 数字
-    '0': 'ｾﾞﾛ', '1': 'ｲﾁ', '2': 'ﾆ', '3': 'ｻﾝ', '4': 'ﾖﾝ',
-    '5': 'ｺﾞ', '6': 'ﾛｸ', '7': 'ﾅﾅ', '8': 'ﾊﾁ', '9': 'ｷｭｳ',
-}
-
 def draw_circled_number(c: canvas.Canvas, char: str, x: float, y: float,
                         font_size: float = 10, circle_radius: float = 6):
     """数字を丸で囲んで描画
@@ -166,13 +130,6 @@ def draw_circled_number(c: canvas.Canvas, char: str, x: float, y: float,
     c.drawString(x, y, char)
 
 
-def get_url_furigana(char: str) -> str:
-    """文字に対応するフリガナを取得"""
-    # 小文字に変換して検索
-    lower_char = char.lower()
-    return URL_FURIGANA_MAP.get(lower_char, '')
-
-
 def draw_url_with_furigana(c: canvas.Canvas, url: str, start_x: float, start_y: float,
                            char_width: float, furigana_offset_y: float,
                            max_chars_per_line: int, line_height: float,
@@ -194,7 +151,7 @@ def draw_url_with_furigana(c: canvas.Canvas, url: str, start_x: float, start_y:
     col = 0
     row = 0
 
-    for char in url:
+    for char, furigana in text_shaping.shape_url(url):
         # 改行チェック
         if col >= max_chars_per_line:
             col = 0
@@ -212,7 +169,6 @@ def draw_url_with_furigana(c: canvas.Canvas, url: str, start_x: float, start_y:
             c.drawString(x, y, char)
 
         # フリガナを描画（URL文字の中央に揃える）
-        furigana = get_url_furigana(char)
         if furigana:
             c.setFont('IPAGothic', furigana_font_size)
             # URL文字の中央を基準に、フリガナ幅の半分だけ左にオフセット
@@ -225,276 +181,107 @@ def draw_url_with_furigana(c: canvas.Canvas, url: str, start_x: float, start_y:
 
 
 def draw_dot_grid(c: canvas.Canvas, interval: float = 10):
-    """全面ドットグリッドを描画（テスト用）"""
+    """全面ドットグリッドを描画（テスト用）
+
+    約5,000個の点を1つのパスにまとめ、塗りつぶしは1回だけにする。
+    """
     width, height = A4  # 595.276 x 841.890
     c.setFillColorRGB(0.7, 0.7, 0.7)  # 薄いグレー
 
+    path = c.beginPath()
     x = 0
     while x <= width:
         y = 0
         while y <= height:
-            c.circle(x, y, 0.5, stroke=0, fill=1)
+            path.circle(x, y, 0.5)
             y += interval
         x += interval
-
-
-def parse_phone(phone: str) -> tuple[str, str, str]:
-    """電話番号をパースして3分割"""
-    # ハイフンがある場合はそれで分割
-    if '-' in phone:
-        parts = phone.split('-')
-        if len(parts) >= 3:
-            return parts[0], parts[1], parts[2]
-        elif len(parts) == 2:
-            return parts[0], parts[1], ''
-
-    # ハイフンなしの場合は推測
-    phone = phone.replace(' ', '').replace('　', '')
-    if len(phone) == 10:
-        # 固定電話 (03-1234-5678)
-        return phone[:2], phone[2:6], phone[6:]
-    elif len(phone) == 11:
-        # 携帯電話 (090-1234-5678)
-        return phone[:3], phone[3:7], phone[7:]
-    else:
-        return phone, '', ''
+    c.drawPath(path, stroke=0, fill=1)
 
 
 # ============================================
-# PDF生成メイン関数
+# レイアウトプランの描画
 # ============================================
 
-def generate_kobutsu_pdf(data: FormData, template_path: str) -> bytes:
-    """古物商許可申請書PDFを生成してバイト列を返す"""
-
-    register_font()
-
-    # オーバーレイPDFをメモリ上に作成
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-
-    # ========================================
-    # ページ1: その１（基本情報）
-    # ========================================
-
-    c.setFont('IPAGothic', 10)
-
-    # 公安委員会（提出先）
-    c.drawString(coord.PUBLIC_SAFETY_COMMISSION_X, coord.PUBLIC_SAFETY_COMMISSION_Y, data.submissionPrefecture)
-
-    # 申請者の氏名又は名称及び住所（セクション見出し直下、右端揃え）
-    full_address = f"{data.prefecture}{data.city}{data.street}"
-    applicant_info = f"{full_address} {data.nameKanji}"
-    c.drawRightString(coord.APPLICANT_INFO_X, coord.APPLICANT_INFO_Y, applicant_info)
-
-    # 許可の種類: 古物商を○で囲む
-    draw_circle(c, *coord.PERMIT_TYPE_CIRCLE)
-
-    # タイトル部の「古物市場主」に二重線
-    draw_double_line(c, *coord.TITLE_KOBUTSU_ICHIBONUSHI_DOUBLE_LINE)
-
-    # 氏名フリガナ
-    draw_kana_in_grid(c, data.nameKana, coord.NAME_KANA_X, coord.NAME_KANA_Y)
-
-    # 氏名漢字
-    c.setFont('IPAGothic', 11)
-    c.drawString(coord.NAME_KANJI_X, coord.NAME_KANJI_Y, data.nameKanji)
-
-    # 法人等の種別: 個人の場合は6を○で囲む
-    if data.applicantType == 'individual':
-        draw_circle(c, *coord.INDIVIDUAL_CIRCLE)
-
-    # 生年月日の元号
-    era_key = data.birthEra.lower()
-    if era_key in coord.ERA_POSITIONS:
-        x1, x2 = coord.ERA_POSITIONS[era_key]
-        y1, y2 = coord.ERA_CIRCLE_Y
-        draw_circle(c, x1, y1, x2, y2)
-
-    # 生年月日（月・日は2桁0埋め）
-    c.setFont('IPAGothic', 10)
-    draw_text_spaced(c, data.birthYear, coord.BIRTH_YEAR_X, coord.BIRTH_Y, coord.BIRTH_CHAR_WIDTH)
-    draw_text_spaced(c, data.birthMonth.zfill(2), coord.BIRTH_MONTH_X, coord.BIRTH_Y, coord.BIRTH_CHAR_WIDTH)
-    draw_text_spaced(c, data.birthDay.zfill(2), coord.BIRTH_DAY_X, coord.BIRTH_Y, coord.BIRTH_CHAR_WIDTH)
-
-    # 住所
-    c.drawString(coord.ADDRESS_PREF_X, coord.ADDRESS_PREF_Y, data.prefecture)
-    c.drawString(coord.ADDRESS_CITY_X, coord.ADDRESS_CITY_Y, data.city)
-    c.drawString(coord.ADDRESS_STREET_X, coord.ADDRESS_STREET_Y, data.street)
-
-    # 電話番号
-    area, local, number = parse_phone(data.phone)
-    c.drawString(coord.PHONE_AREA_X, coord.PHONE_Y, area)
-    c.drawString(coord.PHONE_LOCAL_X, coord.PHONE_Y, local)
-    c.drawString(coord.PHONE_NUMBER_X, coord.PHONE_Y, number)
-
-    # 行商: しない
-    draw_circle(c, *coord.GYOSHO_SHINAI_CIRCLE)
-
-    # 主として取り扱おうとする古物の区分: 11.皮革・ゴム製品類
-    draw_circle(c, *coord.MAIN_ITEM_11_CIRCLE)
+def render_layout_page(c: canvas.Canvas, ops: layout.Page):
+    """レイアウトプランの1ページ分をキャンバスに描画して改ページする
 
-    # 代表者等（入力がある場合のみ）
-    if data.representativeType and data.representativeLastNameKanji:
-        # 種別
-        if data.representativeType in coord.REP_TYPE_POSITIONS:
-            draw_circle(c, *coord.REP_TYPE_POSITIONS[data.representativeType])
-
-        # 氏名フリガナ
-        rep_kana = data.representativeNameKana or ''
-        draw_kana_in_grid(c, rep_kana, coord.REP_NAME_KANA_X, coord.REP_NAME_KANA_Y)
-
-        # 氏名漢字
-        c.setFont('IPAGothic', 11)
-        rep_kanji = data.representativeNameKanji or ''
-        c.drawString(coord.REP_NAME_KANJI_X, coord.REP_NAME_KANJI_Y, rep_kanji)
-
-        # 生年月日の元号
-        c.setFont('IPAGothic', 10)
-        rep_era = (data.representativeBirthEra or 'heisei').lower()
-        if rep_era in coord.REP_ERA_POSITIONS:
-            x1, x2 = coord.REP_ERA_POSITIONS[rep_era]
-            y1, y2 = coord.REP_ERA_CIRCLE_Y
-            draw_circle(c, x1, y1, x2, y2)
-
-        # 生年月日（月・日は2桁0埋め）
-        draw_text_spaced(c, data.representativeBirthYear or '', coord.REP_BIRTH_YEAR_X, coord.REP_BIRTH_Y, coord.REP_BIRTH_CHAR_WIDTH)
-        draw_text_spaced(c, (data.representativeBirthMonth or '').zfill(2) if data.representativeBirthMonth else '', coord.REP_BIRTH_MONTH_X, coord.REP_BIRTH_Y, coord.REP_BIRTH_CHAR_WIDTH)
-        draw_text_spaced(c, (data.representativeBirthDay or '').zfill(2) if data.representativeBirthDay else '', coord.REP_BIRTH_DAY_X, coord.REP_BIRTH_Y, coord.REP_BIRTH_CHAR_WIDTH)
-
-        # 住所
-        c.drawString(coord.REP_PREF_X, coord.REP_PREF_Y, data.representativePrefecture or '')
-        c.drawString(coord.REP_CITY_X, coord.REP_CITY_Y, data.representativeCity or '')
-        c.drawString(coord.REP_STREET_X, coord.REP_STREET_Y, data.representativeStreet or '')
-
-        # 電話番号
-        rep_area, rep_local, rep_number = parse_phone(data.representativePhone or '')
-        c.drawString(coord.REP_PHONE_AREA_X, coord.REP_PHONE_Y, rep_area)
-        c.drawString(coord.REP_PHONE_LOCAL_X, coord.REP_PHONE_Y, rep_local)
-        c.drawString(coord.REP_PHONE_NUMBER_X, coord.REP_PHONE_Y, rep_number)
+    フォントサイズ・線幅は変わるときだけ設定し直す（改ページで設定はリセットされる）。
+    """
+    font_size = None
+    line_width = None
+    for op in ops:
+        kind = op.kind
+        if kind == 'text' or kind == 'right_text':
+            if op.font_size != font_size:
+                font_size = op.font_size
+                c.setFont(layout.FONT_NAME, font_size)
+            if kind == 'text':
+                c.drawString(op.x, op.y, op.text)
+            else:
+                # drawRightString と同じ位置（文字幅はメモ化したものを使う）
+                c.drawString(op.x - text_shaping.string_width(op.text, font_size), op.y, op.text)
+            continue
 
+        if op.line_width != line_width:
+            line_width = op.line_width
+            c.setLineWidth(line_width)
+        if kind == 'ellipse':
+            c.ellipse(op.x1, op.y1, op.x2, op.y2, stroke=1, fill=0)
+        elif kind == 'circle':
+            c.circle(op.x, op.y, op.r, stroke=1, fill=0)
+        else:
+            c.line(op.x1, op.y1, op.x2, op.y2)
     c.showPage()
 
-    # ========================================
-    # ページ2: その２（主たる営業所）
-    # ========================================
-
-    c.setFont('IPAGothic', 10)
-
-    # 営業所あり
-    draw_circle(c, *coord.OFFICE_ARI_CIRCLE)
-
-    # 営業所名称
-    draw_kana_in_grid(c, data.officeNameKana, coord.OFFICE_NAME_KANA_X, coord.OFFICE_NAME_KANA_Y)
-    c.setFont('IPAGothic', 11)
-    c.drawString(coord.OFFICE_NAME_KANJI_X, coord.OFFICE_NAME_KANJI_Y, data.officeNameKanji)
-
-    # 営業所所在地
-    c.setFont('IPAGothic', 10)
-    if data.officeSameAsAddress:
-        c.drawString(coord.OFFICE_PREF_X, coord.OFFICE_PREF_Y, data.prefecture)
-        c.drawString(coord.OFFICE_CITY_X, coord.OFFICE_CITY_Y, data.city)
-        c.drawString(coord.OFFICE_STREET_X, coord.OFFICE_STREET_Y, data.street)
-        area, local, number = parse_phone(data.phone)
-    else:
-        c.drawString(coord.OFFICE_PREF_X, coord.OFFICE_PREF_Y, data.officePrefecture or '')
-        c.drawString(coord.OFFICE_CITY_X, coord.OFFICE_CITY_Y, data.officeCity or '')
-        c.drawString(coord.OFFICE_STREET_X, coord.OFFICE_STREET_Y, data.officeStreet or '')
-        area, local, number = parse_phone(data.officePhone or '')
-
-    c.drawString(coord.OFFICE_PHONE_AREA_X, coord.OFFICE_PHONE_Y, area)
-    c.drawString(coord.OFFICE_PHONE_LOCAL_X, coord.OFFICE_PHONE_Y, local)
-    c.drawString(coord.OFFICE_PHONE_NUMBER_X, coord.OFFICE_PHONE_Y, number)
 
-    # 取扱品目: 02衣類、11皮革・ゴム製品類
-    draw_circle(c, *coord.ITEM_02_CIRCLE)
-    draw_circle(c, *coord.ITEM_11_CIRCLE)
-
-    # 管理者情報
-    if data.managerSameAsApplicant:
-        manager_kana = data.nameKana
-        manager_kanji = data.nameKanji
-        manager_era = data.birthEra
-        manager_year = data.birthYear
-        manager_month = data.birthMonth
-        manager_day = data.birthDay
-        manager_pref = data.prefecture
-        manager_city = data.city
-        manager_street = data.street
-        manager_phone = data.phone
-    else:
-        manager_kana = data.managerNameKana or ''
-        manager_kanji = data.managerNameKanji or ''
-        manager_era = data.managerBirthEra or 'heisei'
-        manager_year = data.managerBirthYear or ''
-        manager_month = data.managerBirthMonth or ''
-        manager_day = data.managerBirthDay or ''
-        manager_pref = data.managerPrefecture or ''
-        manager_city = data.managerCity or ''
-        manager_street = data.managerStreet or ''
-        manager_phone = data.managerPhone or ''
-
-    draw_kana_in_grid(c, manager_kana, coord.MANAGER_NAME_KANA_X, coord.MANAGER_NAME_KANA_Y)
-    c.setFont('IPAGothic', 11)
-    c.drawString(coord.MANAGER_NAME_KANJI_X, coord.MANAGER_NAME_KANJI_Y, manager_kanji)
+# ============================================
+# PDF生成メイン関数
+# ============================================
 
-    # 管理者生年月日の元号
-    era_key = manager_era.lower()
-    if era_key in coord.MANAGER_ERA_POSITIONS:
-        x1, x2 = coord.MANAGER_ERA_POSITIONS[era_key]
-        y1, y2 = coord.MANAGER_ERA_CIRCLE_Y
-        draw_circle(c, x1, y1, x2, y2)
+def draw_shinsei_static_marks(c: canvas.Canvas):
+    """許可申請書の固定マーク（入力に関係なく毎回同じ○・二重線）を描画"""
+    for ops in layout.plan_shinsei_static_marks():
+        render_layout_page(c, ops)
 
-    c.setFont('IPAGothic', 10)
-    draw_text_spaced(c, manager_year, coord.MANAGER_BIRTH_YEAR_X, coord.MANAGER_BIRTH_Y, coord.MANAGER_BIRTH_CHAR_WIDTH)
-    draw_text_spaced(c, manager_month.zfill(2) if manager_month else '', coord.MANAGER_BIRTH_MONTH_X, coord.MANAGER_BIRTH_Y, coord.MANAGER_BIRTH_CHAR_WIDTH)
-    draw_text_spaced(c, manager_day.zfill(2) if manager_day else '', coord.MANAGER_BIRTH_DAY_X, coord.MANAGER_BIRTH_Y, coord.MANAGER_BIRTH_CHAR_WIDTH)
 
-    c.drawString(coord.MANAGER_PREF_X, coord.MANAGER_PREF_Y, manager_pref)
-    c.drawString(coord.MANAGER_CITY_X, coord.MANAGER_CITY_Y, manager_city)
-    c.drawString(coord.MANAGER_STREET_X, coord.MANAGER_STREET_Y, manager_street)
+def bake_shinsei_static_marks(template: PdfWriter):
+    """許可申請書テンプレートに固定マークを焼き込む
 
-    area, local, number = parse_phone(manager_phone)
-    c.drawString(coord.MANAGER_PHONE_AREA_X, coord.MANAGER_PHONE_Y, area)
-    c.drawString(coord.MANAGER_PHONE_LOCAL_X, coord.MANAGER_PHONE_Y, local)
-    c.drawString(coord.MANAGER_PHONE_NUMBER_X, coord.MANAGER_PHONE_Y, number)
+    テンプレートの読み込み時に一度だけ実行する（template_cache の prepare）。
+    リクエストごとのオーバーレイには入力によって変わる項目だけを描画すればよい。
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw_shinsei_static_marks(c)
+    c.save()
 
-    c.showPage()
+    # merge_page はページのコンテンツを解析済みの ContentStream に置き換え、
+    # それを複製したページ間で演算子の配列が共有されてしまうため使わない
+    buffer.seek(0)
+    overlay_pdf = PdfReader(buffer)
+    for page, overlay_page in zip(template.pages, overlay_pdf.pages):
+        merge_overlay(template, page, overlay_page, mode='xobject')
 
-    # ========================================
-    # ページ3: その３（その他の営業所）
-    # ========================================
 
-    # 使用しないので空ページ
-    c.showPage()
+def draw_shinsei_pages(c: canvas.Canvas, data: FormData):
+    """許可申請書その1〜4のオーバーレイを描画（4ページ分）
 
-    # ========================================
-    # ページ4: その４（ホームページ）
-    # ========================================
+    固定マークはテンプレートに焼き込み済み（bake_shinsei_static_marks）なので描画しない。
+    """
+    for ops in layout.plan_shinsei_pages(data):
+        render_layout_page(c, ops)
 
-    c.setFont('IPAGothic', 10)
 
-    if data.hasWebsite:
-        draw_circle(c, *coord.WEBSITE_USE_CIRCLE)
-        # URL描画（1文字ずつフリガナ付き）
-        if data.websiteUrl:
-            draw_url_with_furigana(
-                c,
-                url=data.websiteUrl,
-                start_x=coord.URL_GRID_START_X,
-                start_y=coord.URL_GRID_START_Y,
-                char_width=coord.URL_CHAR_WIDTH,
-                furigana_offset_y=coord.URL_FURIGANA_OFFSET,
-                max_chars_per_line=coord.URL_MAX_CHARS_PER_LINE,
-                line_height=coord.URL_LINE_HEIGHT,
-                char_font_size=coord.URL_CHAR_FONT_SIZE,
-                furigana_font_size=coord.URL_FURIGANA_FONT_SIZE
-            )
-    else:
-        draw_circle(c, *coord.WEBSITE_NOT_USE_CIRCLE)
+def generate_kobutsu_pdf(data: FormData, template_path: str) -> bytes:
+    """古物商許可申請書PDFを生成してバイト列を返す"""
 
-    c.showPage()
+    register_font()
 
+    # オーバーレイPDFをメモリ上に作成
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw_shinsei_pages(c, data)
     c.save()
 
     # ========================================
@@ -503,261 +290,243 @@ def generate_kobutsu_pdf(data: FormData, template_path: str) -> bytes:
 
     buffer.seek(0)
     overlay_pdf = PdfReader(buffer)
-    original_pdf = PdfReader(template_path)
 
     writer = PdfWriter()
 
-    for i, page in enumerate(original_pdf.pages):
+    for i in range(template_cache.page_count(template_path)):
+        page = template_cache.add_page(writer, template_path, i, prepare=bake_shinsei_static_marks)
         if i < len(overlay_pdf.pages):
-            page.merge_page(overlay_pdf.pages[i])
-        writer.add_page(page)
+            merge_overlay(writer, page, overlay_pdf.pages[i])
 
     # 結果をバイト列として返す
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    output_buffer.seek(0)
-
-    return output_buffer.read()
+    return writer_to_bytes(writer)
 
 
 # ============================================
-# 年齢計算
+# 誓約書PDF生成
 # ============================================
 
-ERA_TO_SEIREKI = {
-    'meiji': 1867,
-    'taisho': 1911,
-    'showa': 1925,
-    'heisei': 1988,
-    'reiwa': 2018,
-    'seireki': 0,
-}
-
-
-def calculate_age(birth_era: str, birth_year: str, birth_month: str, birth_day: str) -> int:
-    """生年月日から年齢を計算"""
-    try:
-        era_key = birth_era.lower()
-        base_year = ERA_TO_SEIREKI.get(era_key, 0)
-        birth_year_int = base_year + int(birth_year)
-        birth_month_int = int(birth_month)
-        birth_day_int = int(birth_day)
-
-        today = date.today()
-        age = today.year - birth_year_int
-
-        # 誕生日がまだ来ていない場合は1歳引く
-        if (today.month, today.day) < (birth_month_int, birth_day_int):
-            age -= 1
-
-        return age
-    except (ValueError, TypeError):
-        return 0
-
-
-def era_to_wareki_year(birth_era: str, birth_year: str) -> str:
-    """元号と年から和暦の年を返す（西暦の場合は和暦に変換）"""
-    try:
-        era_key = birth_era.lower()
-        if era_key == 'seireki':
-            # 西暦から和暦に変換
-            seireki_year = int(birth_year)
-            if seireki_year >= 2019:
-                return str(seireki_year - 2018)  # 令和
-            elif seireki_year >= 1989:
-                return str(seireki_year - 1988)  # 平成
-            elif seireki_year >= 1926:
-                return str(seireki_year - 1925)  # 昭和
-            elif seireki_year >= 1912:
-                return str(seireki_year - 1911)  # 大正
-            else:
-                return str(seireki_year - 1867)  # 明治
-        else:
-            return birth_year
-    except (ValueError, TypeError):
-        return birth_year
-
-
-def seireki_to_wareki_era(birth_era: str, birth_year: str) -> str:
-    """西暦から和暦の元号を返す"""
-    try:
-        era_key = birth_era.lower()
-        if era_key == 'seireki':
-            seireki_year = int(birth_year)
-            if seireki_year >= 2019:
-                return 'reiwa'
-            elif seireki_year >= 1989:
-                return 'heisei'
-            elif seireki_year >= 1926:
-                return 'showa'
-            elif seireki_year >= 1912:
-                return 'taisho'
-            else:
-                return 'meiji'
-        else:
-            return era_key
-    except (ValueError, TypeError):
-        return era_key
+def draw_seiyakusho_page(c: canvas.Canvas, data: FormData, is_manager: bool = False):
+    """誓約書のオーバーレイを1ページ描画
+
+    Args:
+        data: フォームデータ
+        is_manager: True=管理者用, False=申請者用
+    """
+    render_layout_page(c, layout.plan_seiyakusho_page(data, is_manager))
 
 
 # ============================================
-# 誓約書PDF生成
+# 略歴書PDF生成
 # ============================================
 
-def generate_seiyakusho_overlay(data: FormData, is_manager: bool = False) -> io.BytesIO:
-    """誓約書のオーバーレイPDFを生成
+def draw_ryakurekisyo_page(c: canvas.Canvas, data: FormData, is_manager: bool = False):
+    """略歴書のオーバーレイを1ページ描画
 
     Args:
         data: フォームデータ
         is_manager: True=管理者用, False=申請者用
     """
-    register_font()
+    render_layout_page(c, layout.plan_ryakurekisyo_page(data, is_manager))
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.setFont('IPAGothic', 10)
 
-    # 座標を選択（管理者用は別座標）
-    if is_manager:
-        pref_y = coord.SEIYAKU_KANRI_PREFECTURE_Y
-        addr_y = coord.SEIYAKU_KANRI_ADDRESS_Y
-        name_y = coord.SEIYAKU_KANRI_NAME_Y
-    else:
-        pref_y = coord.SEIYAKU_PREFECTURE_Y
-        addr_y = coord.SEIYAKU_ADDRESS_Y
-        name_y = coord.SEIYAKU_NAME_Y
+# ============================================
+# 全書類結合PDF生成
+# ============================================
 
-    # 公安委員会名（都道府県）- 右揃え
-    c.drawRightString(coord.SEIYAKU_PREFECTURE_X, pref_y, data.submissionPrefecture)
+def coordinates_fingerprint() -> str:
+    """座標定義（coordinates モジュールの定数）のハッシュ
 
-    # 署名日は空欄（提出時に記入）
+    読み込み済みの値から求めるので、実際に描画に使っている座標と必ず一致する。
+    """
+    h = hashlib.sha256()
+    for name in sorted(vars(coord)):
+        if name.isupper():
+            h.update(f'{name}={getattr(coord, name)!r}\n'.encode('utf-8'))
+    return h.hexdigest()
 
-    # 住所・氏名
-    if is_manager and not data.managerSameAsApplicant:
-        address = f"{data.managerPrefecture or ''}{data.managerCity or ''}{data.managerStreet or ''}"
-        name = f"{data.managerLastNameKanji or ''} {data.managerFirstNameKanji or ''}"
-    else:
-        address = f"{data.prefecture}{data.city}{data.street}"
-        name = data.nameKanji
 
-    c.drawString(coord.SEIYAKU_ADDRESS_X, addr_y, address)
-    c.drawString(coord.SEIYAKU_NAME_X, name_y, name)
+# 出力を決める生成処理のモジュール（renderer_fingerprint でソースのハッシュを取る）
+RENDERER_MODULES = ('pdf_generator', 'layout', 'coordinates', 'text_shaping', 'direct_overlay', 'pdf_merge')
 
-    c.showPage()
-    c.save()
 
-    buffer.seek(0)
-    return buffer
+@lru_cache(maxsize=None)
+def renderer_fingerprint() -> str:
+    """生成処理のバージョン（生成処理のソース・文字幅の表・pypdf と reportlab のバージョンのハッシュ）
 
+    デプロイで生成処理が変わると変わるので、ディスクに残った結果キャッシュを使わなくなる。
+    """
+    h = hashlib.sha256()
+    app_dir = Path(__file__).parent
+    for name in RENDERER_MODULES:
+        h.update((app_dir / f'{name}.py').read_bytes())
+        h.update(b'\0')
+    if config.FONT_WIDTHS_PATH.exists():
+        h.update(config.FONT_WIDTHS_PATH.read_bytes())
+    h.update(f'\0pypdf={pypdf.__version__}\0reportlab={reportlab.Version}'.encode('ascii'))
+    return h.hexdigest()
 
-# ============================================
-# 略歴書PDF生成
-# ============================================
 
-def generate_ryakurekisyo_overlay(data: FormData, is_manager: bool = False) -> io.BytesIO:
-    """略歴書のオーバーレイPDFを生成
+# 再現モードで使う固定の作成・更新日時
+DETERMINISTIC_DATE = "D:20000101000000+00'00'"
 
-    Args:
-        data: フォームデータ
-        is_manager: True=管理者用, False=申請者用
+
+def apply_deterministic_metadata(writer: PdfWriter, *seeds: str):
+    """/ID と作成・更新日時を入力から決まる固定値にする
+
+    /ID は生成元の入力（seeds）のハッシュから作るので、同じ入力なら常に同じになる。
+    オブジェクトの順序は生成処理の順序で決まるため、入力が同じなら変わらない。
     """
-    register_font()
+    set_file_identifier(writer, hashlib.sha256('\0'.join(seeds).encode('utf-8')).digest()[:16])
+    writer.add_metadata({
+        '/CreationDate': DETERMINISTIC_DATE,
+        '/ModDate': DETERMINISTIC_DATE,
+    })
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.setFont('IPAGothic', 10)
 
-    # 対象者のデータを選択
-    if is_manager and not data.managerSameAsApplicant:
-        kana = f"{data.managerLastNameKana or ''} {data.managerFirstNameKana or ''}"
-        name = f"{data.managerLastNameKanji or ''} {data.managerFirstNameKanji or ''}"
-        birth_era = data.managerBirthEra or 'heisei'
-        birth_year = data.managerBirthYear or ''
-        birth_month = data.managerBirthMonth or ''
-        birth_day = data.managerBirthDay or ''
-        address = f"{data.managerPrefecture or ''}{data.managerCity or ''}{data.managerStreet or ''}"
-        career_history = data.managerCareerHistory or []
-    else:
-        kana = data.nameKana
-        name = data.nameKanji
-        birth_era = data.birthEra
-        birth_year = data.birthYear
-        birth_month = data.birthMonth
-        birth_day = data.birthDay
-        address = f"{data.prefecture}{data.city}{data.street}"
-        career_history = data.careerHistory or []
-
-    # ふりがな（略歴書はひらがな表記）
-    kana_hiragana = katakana_to_hiragana(kana)
-    c.drawString(coord.RYAKUREKI_KANA_X, coord.RYAKUREKI_KANA_Y, kana_hiragana)
-
-    # 氏名
-    c.setFont('IPAGothic', 11)
-    c.drawString(coord.RYAKUREKI_NAME_X, coord.RYAKUREKI_NAME_Y, name)
-    c.setFont('IPAGothic', 10)
+def writer_to_bytes(writer: PdfWriter) -> bytes:
+    """writer の内容をPDFのバイト列にする
 
-    # 生年月日（西暦）- 略歴書は右揃え、0埋めなし
-    c.drawRightString(coord.RYAKUREKI_BIRTH_YEAR_X, coord.RYAKUREKI_BIRTH_Y, birth_year or '')
-    c.drawRightString(coord.RYAKUREKI_BIRTH_MONTH_X, coord.RYAKUREKI_BIRTH_Y, birth_month or '')
-    c.drawRightString(coord.RYAKUREKI_BIRTH_DAY_X, coord.RYAKUREKI_BIRTH_Y, birth_day or '')
+    getvalue() は書き終えた BytesIO の内部バッファをコピーせずに返すので、
+    seek(0) + read() のように出力全体を複製しない。
+    """
+    output_buffer = io.BytesIO()
+    writer.write(output_buffer)
+    return output_buffer.getvalue()
 
-    # 年齢
-    age = calculate_age(birth_era, birth_year, birth_month, birth_day)
-    c.drawString(coord.RYAKUREKI_AGE_X, coord.RYAKUREKI_AGE_Y, str(age))
 
-    # 住所
-    c.drawString(coord.RYAKUREKI_ADDRESS_X, coord.RYAKUREKI_ADDRESS_Y, address)
+def create_grid_page():
+    """ドットグリッドのページを生成
 
-    # 職歴等（最大6行 + 「現在に至る」）
-    for i, entry in enumerate(career_history[:6]):
-        y = coord.RYAKUREKI_CAREER_START_Y - (i * coord.RYAKUREKI_CAREER_LINE_HEIGHT)
-        # 期間（年・月）- 右揃え
-        c.drawRightString(coord.RYAKUREKI_CAREER_YEAR_X, y, entry.year)
-        c.drawRightString(coord.RYAKUREKI_CAREER_MONTH_X, y, entry.month)
-        # 内容 - 左揃え
-        c.drawString(coord.RYAKUREKI_CAREER_CONTENT_X, y, entry.content)
+    PdfReader のページはオブジェクトを参照されたときに元のストリームを seek・read して
+    読むので、スレッド間で共有できない。template_cache と同じく PdfWriter に複製して、
+    全てのオブジェクトを読み込み済みにしたページを返す。
+    """
+    grid_buffer = io.BytesIO()
+    grid_canvas = canvas.Canvas(grid_buffer, pagesize=A4, invariant=1)
+    draw_dot_grid(grid_canvas)
+    grid_canvas.showPage()
+    grid_canvas.save()
+    grid_buffer.seek(0)
+    return PdfWriter(clone_from=PdfReader(grid_buffer)).pages[0]
 
-    # 7行目に「現在に至る」を自動追加（5下）
-    y = coord.RYAKUREKI_CAREER_START_Y - (6 * coord.RYAKUREKI_CAREER_LINE_HEIGHT) - 5
-    c.drawString(coord.RYAKUREKI_CAREER_CONTENT_X, y, '現在に至る')
 
-    # 署名日は空欄（提出時に記入）
+GRID_PAGE = None
+_grid_lock = threading.Lock()
 
-    # 署名（氏名）
-    c.drawString(coord.RYAKUREKI_SIGN_NAME_X, coord.RYAKUREKI_SIGN_NAME_Y, name)
 
-    c.showPage()
-    c.save()
+def get_grid_page():
+    """ドットグリッドのページ（プロセスごとに一度だけ生成して使い回す）
 
-    buffer.seek(0)
-    return buffer
+    同じページを同じ writer に重ねると Form XObject は1つだけ作られ、
+    各ページからはそれを参照するだけになる。
+    """
+    global GRID_PAGE
+    if GRID_PAGE is None:
+        with _grid_lock:
+            if GRID_PAGE is None:
+                GRID_PAGE = create_grid_page()
+    return GRID_PAGE
 
 
-# ============================================
-# 全書類結合PDF生成
-# ============================================
+def bundle_pages(
+    plan: list[layout.PlannedPage],
+    shinsei_template_path: str,
+    seiyaku_kojin_template_path: str,
+    seiyaku_kanrisha_template_path: str,
+    ryakureki_template_path: str,
+) -> list[tuple]:
+    """プランの各ページを重ねるテンプレート
 
-def merge_overlay_single_page(template_path: str, overlay_buffer: io.BytesIO) -> any:
-    """テンプレートPDFにオーバーレイをマージして1ページを返す"""
-    overlay_pdf = PdfReader(overlay_buffer)
-    template_pdf = PdfReader(template_path)
+    Returns:
+        プランのページ順に (テンプレートのパス, テンプレートのページ番号, テンプレートの加工)
+    """
+    templates = {
+        'shinsei': (shinsei_template_path, bake_shinsei_static_marks),
+        'seiyaku_kojin': (seiyaku_kojin_template_path, None),
+        'ryakureki': (ryakureki_template_path, None),
+        'seiyaku_kanrisha': (seiyaku_kanrisha_template_path, None),
+        'ryakureki_kanrisha': (ryakureki_template_path, None),
+    }
+    pages = []
+    for planned in plan:
+        template_path, prepare = templates[planned.document]
+        pages.append((template_path, planned.index, prepare))
+    return pages
+
+
+def draw_bundle_overlay(
+    c: canvas.Canvas,
+    data: FormData,
+    shinsei_template_path: str,
+    seiyaku_kojin_template_path: str,
+    seiyaku_kanrisha_template_path: str,
+    ryakureki_template_path: str,
+    plan: Optional[list[layout.PlannedPage]] = None,
+) -> list[tuple]:
+    """全書類のオーバーレイをキャンバスに描画
 
-    page = template_pdf.pages[0]
-    if len(overlay_pdf.pages) > 0:
-        page.merge_page(overlay_pdf.pages[0])
+    Args:
+        plan: 作成済みのレイアウトプラン（省略時は data から作る）
 
-    return page
+    Returns:
+        描画したページ順に (テンプレートのパス, テンプレートのページ番号, テンプレートの加工)
+    """
+    if plan is None:
+        plan = layout.plan_bundle(data)
+    for planned in plan:
+        render_layout_page(c, planned.ops)
+
+    return bundle_pages(
+        plan,
+        shinsei_template_path,
+        seiyaku_kojin_template_path,
+        seiyaku_kanrisha_template_path,
+        ryakureki_template_path,
+    )
 
 
-def generate_full_application_pdf(
+def merge_bundle_overlay(writer: PdfWriter, overlay_pdf: PdfReader, pages: list[tuple],
+                         with_grid: bool = False):
+    """オーバーレイの各ページを対応するテンプレートのページに重ねて writer に追加
+
+    Args:
+        pages: draw_bundle_overlay が返したページ構成
+        with_grid: True=ドットグリッド付き（座標調整用）
+    """
+    for overlay_page, (template_path, index, prepare) in zip(overlay_pdf.pages, pages):
+        page = template_cache.add_page(writer, template_path, index, prepare=prepare)
+        merge_overlay(writer, page, overlay_page)
+        if with_grid:
+            merge_overlay(writer, page, get_grid_page())
+
+
+def stamp_bundle_forms(writer: PdfWriter, forms: list, pages: list[tuple], with_grid: bool = False):
+    """direct_overlay で作った Form XObject を対応するテンプレートのページに重ねて writer に追加
+
+    Args:
+        pages: bundle_pages が返したページ構成
+        with_grid: True=ドットグリッド付き（座標調整用）
+    """
+    for form, (template_path, index, prepare) in zip(forms, pages):
+        page = template_cache.add_page(writer, template_path, index, prepare=prepare)
+        stamp_form(writer, page, form)
+        if with_grid:
+            merge_overlay(writer, page, get_grid_page())
+
+
+def build_full_application_pdf(
     data: FormData,
     shinsei_template_path: str,
     seiyaku_kojin_template_path: str,
     seiyaku_kanrisha_template_path: str,
     ryakureki_template_path: str,
-    with_grid: bool = False
-) -> bytes:
-    """全書類を結合した完全版PDFを生成
+    with_grid: bool = False,
+    deterministic: bool = False,
+    overlay_backend: Optional[str] = None,
+    plan: Optional[list[layout.PlannedPage]] = None,
+) -> PdfWriter:
+    """全書類を結合した完全版PDFを組み立てる（書き出しは呼び出し側で行う）
 
     構成:
     - 申請者と管理者が同一の場合（7ページ）:
@@ -775,60 +544,98 @@ def generate_full_application_pdf(
 
     Args:
         with_grid: True=ドットグリッド付き（座標調整用）
+        deterministic: True=同じ入力から常に同じバイト列を生成（/ID・日時を固定）
+        overlay_backend: 'reportlab' または 'direct'（省略時は config.OVERLAY_BACKEND）
+        plan: 作成済みのレイアウトプラン（キャッシュキー・はみ出しの確認に使ったもの。省略時は data から作る）
     """
     register_font()
     writer = PdfWriter()
+    if plan is None:
+        plan = layout.plan_bundle(data)
+    template_paths = [shinsei_template_path, seiyaku_kojin_template_path,
+                      seiyaku_kanrisha_template_path, ryakureki_template_path]
+
+    backend = overlay_backend or config.OVERLAY_BACKEND
+    if backend == 'direct':
+        # コンテンツストリームを直接組み立てて writer に追加（中間のPDFを作らない）
+        with metrics.stage('overlay'):
+            forms = direct_overlay.add_overlay_forms(writer, plan)
+        with metrics.stage('merge'):
+            stamp_bundle_forms(writer, forms, bundle_pages(plan, *template_paths), with_grid=with_grid)
+    elif backend == 'reportlab':
+        # 全書類のオーバーレイを1つのキャンバスに描画（フォントのサブセットも1つで済む）
+        with metrics.stage('overlay'):
+            buffer = io.BytesIO()
+            c = canvas.Canvas(buffer, pagesize=A4, invariant=1 if deterministic else None)
+            pages = draw_bundle_overlay(c, data, *template_paths, plan=plan)
+            c.save()
+
+        # テンプレートとページ単位でマージ
+        with metrics.stage('merge'):
+            buffer.seek(0)
+            merge_bundle_overlay(writer, PdfReader(buffer), pages, with_grid=with_grid)
+    else:
+        raise ValueError(f"不明なオーバーレイの書き出し方です: {backend}")
 
-    def create_grid_page():
-        """ドットグリッドのページを生成"""
-        grid_buffer = io.BytesIO()
-        grid_canvas = canvas.Canvas(grid_buffer, pagesize=A4)
-        draw_dot_grid(grid_canvas)
-        grid_canvas.showPage()
-        grid_canvas.save()
-        grid_buffer.seek(0)
-        grid_pdf = PdfReader(grid_buffer)
-        return grid_pdf.pages[0]
-
-    def add_page_with_optional_grid(page):
-        """ページを追加（with_grid=Trueの場合はグリッドもマージ）"""
-        if with_grid:
-            page.merge_page(create_grid_page())
-        writer.add_page(page)
-
-    # 1. 許可申請書（4ページ）
-    shinsei_pdf = generate_kobutsu_pdf(data, shinsei_template_path)
-    shinsei_reader = PdfReader(io.BytesIO(shinsei_pdf))
-    for page in shinsei_reader.pages:
-        add_page_with_optional_grid(page)
-
-    # 2. 申請者用誓約書
-    seiyaku_applicant_overlay = generate_seiyakusho_overlay(data, is_manager=False)
-    seiyaku_applicant_page = merge_overlay_single_page(seiyaku_kojin_template_path, seiyaku_applicant_overlay)
-    add_page_with_optional_grid(seiyaku_applicant_page)
-
-    # 3. 申請者用略歴書
-    ryakureki_applicant_overlay = generate_ryakurekisyo_overlay(data, is_manager=False)
-    ryakureki_applicant_page = merge_overlay_single_page(ryakureki_template_path, ryakureki_applicant_overlay)
-    add_page_with_optional_grid(ryakureki_applicant_page)
-
-    # 4. 管理者用誓約書（常に出力）
-    seiyaku_manager_overlay = generate_seiyakusho_overlay(data, is_manager=True)
-    seiyaku_manager_page = merge_overlay_single_page(seiyaku_kanrisha_template_path, seiyaku_manager_overlay)
-    add_page_with_optional_grid(seiyaku_manager_page)
-
-    # 5. 管理者用略歴書（管理者が申請者と異なる場合のみ）
-    if not data.managerSameAsApplicant:
-        ryakureki_manager_overlay = generate_ryakurekisyo_overlay(data, is_manager=True)
-        ryakureki_manager_page = merge_overlay_single_page(ryakureki_template_path, ryakureki_manager_overlay)
-        add_page_with_optional_grid(ryakureki_manager_page)
+    if deterministic:
+        # 内容はプランだけで決まるので、/ID もプランから作る（結果キャッシュのキーと揃える）
+        apply_deterministic_metadata(
+            writer,
+            layout.plan_fingerprint(plan),
+            *(template_cache.fingerprint(path) for path in template_paths),
+            f"with_grid={with_grid}",
+        )
 
-    # 結果をバイト列として返す
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    output_buffer.seek(0)
+    return writer
+
+
+def generate_full_application_pdf(
+    data: FormData,
+    shinsei_template_path: str,
+    seiyaku_kojin_template_path: str,
+    seiyaku_kanrisha_template_path: str,
+    ryakureki_template_path: str,
+    with_grid: bool = False,
+    deterministic: bool = False,
+    overlay_backend: Optional[str] = None,
+    plan: Optional[list[layout.PlannedPage]] = None,
+) -> bytes:
+    """全書類を結合した完全版PDFを生成してバイト列を返す（構成・引数は build_full_application_pdf と同じ）"""
+    writer = build_full_application_pdf(
+        data,
+        shinsei_template_path,
+        seiyaku_kojin_template_path,
+        seiyaku_kanrisha_template_path,
+        ryakureki_template_path,
+        with_grid=with_grid,
+        deterministic=deterministic,
+        overlay_backend=overlay_backend,
+        plan=plan,
+    )
+    with metrics.stage('write'):
+        return writer_to_bytes(writer)
+
+
+def warm_up(
+    data: FormData,
+    shinsei_template_path: str,
+    seiyaku_kojin_template_path: str,
+    seiyaku_kanrisha_template_path: str,
+    ryakureki_template_path: str,
+    deterministic: bool = False,
+):
+    """初回リクエストの前に重い初期化を済ませておく
 
-    return output_buffer.read()
+    フォントの登録（TTFの解析）、テンプレートの読み込み（固定マークの焼き込みを含む）を行い、
+    捨てのPDFを1部生成して、以降の生成で使う処理を一通り動かしておく。
+    """
+    register_font()
+    template_paths = [shinsei_template_path, seiyaku_kojin_template_path,
+                      seiyaku_kanrisha_template_path, ryakureki_template_path]
+    for path in template_paths:
+        template_cache.load(path)
+    template_cache.load(shinsei_template_path, prepare=bake_shinsei_static_marks)
+    generate_full_application_pdf(data, *template_paths, deterministic=deterministic)
 
 
 def generate_test_pdf(template_path: str) -> bytes:
@@ -1022,17 +829,12 @@ def generate_test_pdf(template_path: str) -> bytes:
     # テンプレートとマージ
     buffer.seek(0)
     overlay_pdf = PdfReader(buffer)
-    original_pdf = PdfReader(template_path)
 
     writer = PdfWriter()
 
-    for i, page in enumerate(original_pdf.pages):
+    for i in range(template_cache.page_count(template_path)):
+        page = template_cache.add_page(writer, template_path, i)
         if i < len(overlay_pdf.pages):
-            page.merge_page(overlay_pdf.pages[i])
-        writer.add_page(page)
-
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    output_buffer.seek(0)
+            merge_overlay(writer, page, overlay_pdf.pages[i])
 
-    return output_buffer.read()
+    return writer_to_bytes(writer)
@@ -0,0 +1,134 @@
+"""オーバーレイPDFのテンプレートへの結合
+
+pypdf の page.merge_page() はテンプレート側のコンテンツストリームを解析・再構築し、
+リソース辞書もマージするため重い。ここではテンプレートのコンテンツには手を付けず、
+オーバーレイのページを Form XObject として追加し、それを描画する短いコンテンツ
+ストリームを末尾に足すだけにする。Form XObject は独自の /Resources を持つので、
+オーバーレイのフォント名（/F1 など）がテンプレート側と衝突することもない。
+
+新しいオブジェクトの追加・ファイル識別子（/ID）の指定には pypdf の公開APIがないため、
+add_object・set_file_identifier で非公開の属性を使う（requirements.txt で pypdf のメジャーバージョンを固定し、
+tests/test_pdf_merge.py の TestPypdfPrivateApi で属性が残っていることを確認する）。
+"""
+
+from typing import Optional
+
+from pypdf import PageObject, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    ByteStringObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+)
+
+from . import config
+
+
+MERGE_MODES = ('xobject', 'merge_page')
+
+# オーバーレイの Form XObject に付ける名前の接頭辞（テンプレート側の名前と区別する）
+OVERLAY_NAME_PREFIX = '/KobutsuOverlay'
+
+
+def add_object(writer: PdfWriter, obj) -> IndirectObject:
+    """オブジェクトを writer に間接オブジェクトとして追加する
+
+    pypdf の非公開メソッドを使うのはここだけにする（pypdf を更新するときはここを確認する）。
+    """
+    return writer._add_object(obj)
+
+
+def set_file_identifier(writer: PdfWriter, identifier: bytes):
+    """書き出すPDFのトレーラの /ID を指定する（2つの識別子は同じ値にする）
+
+    pypdf の generate_file_identifiers は出力全体を一度書き出して識別子を求めるので使わない。
+    """
+    digest = ByteStringObject(identifier)
+    writer._ID = ArrayObject([digest, digest])
+
+
+def overlay_to_form(writer: PdfWriter, overlay_page: PageObject) -> IndirectObject:
+    """オーバーレイのページを Form XObject として writer に追加する
+
+    同じページを同じ writer に複数回渡した場合は、最初に作った XObject を返す。
+    """
+    contents = overlay_page.get('/Contents')
+    if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), StreamObject):
+        # 圧縮済みのストリームをそのまま複製して使う（再圧縮しない）
+        form = contents.get_object().clone(writer)
+    else:
+        content_stream = overlay_page.get_contents()
+        form = DecodedStreamObject()
+        form.set_data(content_stream.get_data() if content_stream is not None else b'')
+        form = form.flate_encode()
+
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject(overlay_page.mediabox),
+        NameObject('/Resources'): overlay_page.get('/Resources', DictionaryObject()).clone(writer),
+    })
+    if form.indirect_reference is not None:
+        return form.indirect_reference
+    return add_object(writer, form)
+
+
+def _stream(writer: PdfWriter, data: bytes) -> IndirectObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return add_object(writer, stream)
+
+
+def stamp_form(writer: PdfWriter, page: PageObject, form: IndirectObject):
+    """writer 内のページに Form XObject を重ねて描画する
+
+    テンプレートのコンテンツは q/Q で囲むだけで中身は書き換えない。
+    """
+    resources = DictionaryObject(page.get('/Resources', DictionaryObject()).get_object())
+    xobjects = DictionaryObject(resources.get('/XObject', DictionaryObject()).get_object())
+
+    index = 0
+    while NameObject(f'{OVERLAY_NAME_PREFIX}{index}') in xobjects:
+        index += 1
+    name = NameObject(f'{OVERLAY_NAME_PREFIX}{index}')
+    xobjects[name] = form
+    resources[NameObject('/XObject')] = xobjects
+    page[NameObject('/Resources')] = resources
+
+    contents = page.get('/Contents')
+    if contents is None:
+        original = []
+    elif isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+        original = list(contents.get_object())
+    elif isinstance(contents, ArrayObject):
+        original = list(contents)
+    else:
+        original = [contents]
+
+    page[NameObject('/Contents')] = ArrayObject([
+        _stream(writer, b'q\n'),
+        *original,
+        _stream(writer, f'\nQ\nq {name} Do Q\n'.encode('ascii')),
+    ])
+
+
+def merge_overlay(writer: PdfWriter, page: PageObject, overlay_page: PageObject,
+                  mode: Optional[str] = None):
+    """writer 内のページにオーバーレイのページを重ねる
+
+    Args:
+        writer: page を含む PdfWriter
+        page: テンプレートから writer に追加したページ
+        overlay_page: 重ねるオーバーレイのページ
+        mode: 'xobject'（既定）または 'merge_page'（pypdf の merge_page）
+    """
+    mode = mode or config.MERGE_MODE
+    if mode == 'merge_page':
+        page.merge_page(overlay_page)
+    elif mode == 'xobject':
+        stamp_form(writer, page, overlay_to_form(writer, overlay_page))
+    else:
+        raise ValueError(f"不明なマージ方式です: {mode}")
@@ -0,0 +1,376 @@
+"""郵便番号から住所（都道府県・市区町村・町域）を引く（ネットワークを使わない）
+
+同梱の郵便番号データ（CSV）を、郵便番号順に並べた固定長レコードの索引（バイナリ）に
+変換しておき、実行時はその索引を mmap して二分探索する。
+
+- 索引はファイルをそのまま mmap するので、プロセスのメモリにはほぼ載らない
+  （ページキャッシュを全ワーカーで共有する）。読み込み時の解析も不要
+- 1回の検索はレコード数の log2 回の読み出し（日本郵便の全件 約12万件でも17回）
+
+索引の作成（backend ディレクトリで実行）:
+    python -m app.postal data/postal_codes.csv --out data/postal_codes.idx
+    python -m app.postal --download     # 日本郵便の全件（ビルドで実行する。ネットワークを使うのはこのときだけ）
+
+CSV はヘッダ行付きの「postal_code,prefecture,city,town」、または日本郵便の
+住所の郵便番号（UTF-8版 utf_ken_all.csv、ヘッダ行なし。配布されている ZIP のままでも可）の形式。
+同梱の CSV は動作確認用の数十件だけ。全件の索引があるかどうかは /api/metrics の
+kobutsu_postal_index_ready で確認する（PDF生成には使わないので /api/ready には含めない）。
+
+索引の形式（リトルエンディアン）:
+    ヘッダ: マジック b'KPCI', バージョン(u16), 予約(u16), レコード数(u32), 文字列領域の位置(u32)
+    レコード: 郵便番号(u32), 都道府県・市区町村・町域の文字列の位置(u32 x 3)（郵便番号順）
+    文字列領域: バイト数(u16) + UTF-8 の文字列（同じ文字列は1つにまとめる）
+"""
+
+import argparse
+import bisect
+import csv
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import unicodedata
+import urllib.request
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from . import config
+from .schemas import FormData
+
+
+PathLike = Union[str, Path]
+
+INDEX_MAGIC = b'KPCI'
+INDEX_VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+RECORD = struct.Struct('<IIII')
+STRING_LENGTH = struct.Struct('<H')
+
+# 日本郵便の住所の郵便番号（UTF-8版、1レコード1行）の全件
+KEN_ALL_URL = 'https://www.post.japanpost.jp/zipcode/dl/utf/zip/utf_ken_all.zip'
+
+# 日本郵便のデータで町域が「以下に掲載がない場合」などの行は町域なしとして扱う
+KEN_ALL_NO_TOWN = ('以下に掲載がない場合',)
+
+# 郵便番号の区切りとして取り除く文字（NFKC で全角は半角になる）
+POSTAL_CODE_SEPARATORS = re.compile(r'[-‐−ー\s〒]')
+
+# 郵便番号と、それで埋める住所の項目（FormData の項目名: 都道府県, 市区町村, 番地）
+POSTAL_CODE_FIELDS = {
+    'postalCode': ('prefecture', 'city', 'street'),
+    'officePostalCode': ('officePrefecture', 'officeCity', 'officeStreet'),
+    'managerPostalCode': ('managerPrefecture', 'managerCity', 'managerStreet'),
+    'representativePostalCode': ('representativePrefecture', 'representativeCity', 'representativeStreet'),
+}
+
+
+def normalize_postal_code(code: str) -> Optional[str]:
+    """郵便番号を7桁の数字にする（「〒150-0002」「１５００００２」なども受け付ける。不正なら None）"""
+    digits = POSTAL_CODE_SEPARATORS.sub('', unicodedata.normalize('NFKC', code or ''))
+    if len(digits) == 7 and digits.isascii() and digits.isdigit():
+        return digits
+    return None
+
+
+# ============================================
+# 索引の作成
+# ============================================
+
+def _ken_all_town(town: str) -> str:
+    """日本郵便のデータの町域から注記（括弧書き）を除く"""
+    if town in KEN_ALL_NO_TOWN:
+        return ''
+    return town.split('（', 1)[0]
+
+
+def read_csv(path: PathLike, encoding: str = 'utf-8') -> Iterator[tuple[str, str, str, str]]:
+    """郵便番号データの CSV を (郵便番号, 都道府県, 市区町村, 町域) で読む
+
+    ZIP（日本郵便の配布形式）の場合は、中の最初の CSV を読む。
+
+    Raises:
+        ValueError: ZIP の中に CSV がない
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+            if not names:
+                raise ValueError(f"ZIP の中に CSV がありません: {path}")
+            with archive.open(names[0]) as raw:
+                yield from _read_rows(io.TextIOWrapper(raw, encoding=encoding, newline=''))
+        return
+    with open(path, encoding=encoding, newline='') as f:
+        yield from _read_rows(f)
+
+
+def _read_rows(f) -> Iterator[tuple[str, str, str, str]]:
+    """CSV の各行を (郵便番号, 都道府県, 市区町村, 町域) にする"""
+    # 日本郵便の形式では長い町域の括弧書きが複数行に分かれるので、続きの行は読み飛ばす
+    in_note = False
+    for row in csv.reader(f):
+        if not row or row[0] == 'postal_code':
+            continue
+        if len(row) >= 9:
+            # 日本郵便の形式（3列目が郵便番号、7〜9列目が都道府県・市区町村・町域）
+            town = row[8]
+            if in_note:
+                in_note = '）' not in town
+                continue
+            in_note = '（' in town and '）' not in town
+            yield row[2], row[6], row[7], _ken_all_town(town)
+        else:
+            yield row[0], row[1], row[2], row[3] if len(row) > 3 else ''
+
+
+def build_index(rows: Iterable[tuple[str, str, str, str]]) -> bytes:
+    """郵便番号順の索引を作る（同じ郵便番号の行は入力順、全く同じ行は1つにまとめる）
+
+    Raises:
+        ValueError: 郵便番号が7桁の数字でない行がある
+    """
+    records = {}
+    for code, prefecture, city, town in rows:
+        normalized = normalize_postal_code(code)
+        if normalized is None:
+            raise ValueError(f"郵便番号が不正です: {code}")
+        records.setdefault((normalized, prefecture, city, town), None)
+
+    pool = bytearray()
+    offsets: dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        offset = offsets.get(text)
+        if offset is None:
+            data = text.encode('utf-8')
+            offset = offsets[text] = len(pool)
+            pool.extend(STRING_LENGTH.pack(len(data)))
+            pool.extend(data)
+        return offset
+
+    # sorted は安定なので、同じ郵便番号の行は入力順のまま
+    ordered = sorted(records, key=lambda record: record[0])
+    body = b''.join(
+        RECORD.pack(int(code), intern(prefecture), intern(city), intern(town))
+        for code, prefecture, city, town in ordered
+    )
+    header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(ordered), HEADER.size + len(body))
+    return header + body + bytes(pool)
+
+
+def write_index(csv_path: PathLike, index_path: PathLike, encoding: str = 'utf-8',
+                min_records: int = 0) -> int:
+    """CSV から索引を作って書き出す（書き出し中の索引を読まれないよう、一時ファイルから置き換える）
+
+    Args:
+        min_records: レコード数がこれより少なければ書き出さずにエラー（途切れたデータで置き換えない）
+
+    Returns:
+        レコード数
+
+    Raises:
+        ValueError: 郵便番号が不正な行がある、またはレコード数が min_records 未満
+    """
+    data = build_index(read_csv(csv_path, encoding))
+    count = HEADER.unpack_from(data)[3]
+    if count < min_records:
+        raise ValueError(f"レコード数が {count} 件しかありません（{min_records} 件以上が必要）")
+    index_path = Path(index_path)
+    fd, tmp = tempfile.mkstemp(dir=index_path.parent, prefix=index_path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, index_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return count
+
+
+# ============================================
+# 検索
+# ============================================
+
+class _Codes:
+    """索引のレコードの郵便番号の列（bisect で探索するための読み出し専用のビュー）"""
+
+    def __init__(self, buffer, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> int:
+        return RECORD.unpack_from(self._buffer, HEADER.size + i * RECORD.size)[0]
+
+
+class PostalIndex:
+    """mmap した郵便番号の索引
+
+    最初の検索で開き、以降はプロセス内で使い回す。fork したワーカーは
+    親で開いた mmap をそのまま共有する。
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._codes: Optional[_Codes] = None
+        self._pool = 0
+
+    def open(self):
+        """索引を開く（開いていれば何もしない）
+
+        Raises:
+            FileNotFoundError: 索引がない
+            ValueError: 索引の形式が不正
+        """
+        if self._map is not None:
+            return
+        with self._lock:
+            if self._map is not None:
+                return
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(mapped) < HEADER.size:
+                mapped.close()
+                raise ValueError(f"郵便番号の索引の形式が不正です: {self.path}")
+            magic, version, _, count, pool = HEADER.unpack_from(mapped)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                mapped.close()
+                raise ValueError(f"郵便番号の索引の形式が不正です: {self.path}")
+            self._codes = _Codes(mapped, count)
+            self._pool = pool
+            self._map = mapped
+
+    def close(self):
+        """索引を閉じる"""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+            self._map = None
+            self._codes = None
+
+    def __len__(self) -> int:
+        self.open()
+        return len(self._codes)
+
+    def _string(self, offset: int) -> str:
+        position = self._pool + offset
+        (length,) = STRING_LENGTH.unpack_from(self._map, position)
+        start = position + STRING_LENGTH.size
+        return self._map[start:start + length].decode('utf-8')
+
+    def lookup(self, code: str) -> list[dict]:
+        """郵便番号の住所（同じ郵便番号の町域が複数あれば全て、見つからなければ空）
+
+        Raises:
+            ValueError: 郵便番号が7桁の数字でない
+        """
+        normalized = normalize_postal_code(code)
+        if normalized is None:
+            raise ValueError(f"郵便番号は7桁の数字で入力してください: {code}")
+        self.open()
+        number = int(normalized)
+        codes = self._codes
+        i = bisect.bisect_left(codes, number)
+        addresses = []
+        while i < len(codes) and codes[i] == number:
+            _, prefecture, city, town = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+            addresses.append({
+                'prefecture': self._string(prefecture),
+                'city': self._string(city),
+                'town': self._string(town),
+            })
+            i += 1
+        return addresses
+
+
+# プロセス全体で共有する索引
+postal_index = PostalIndex(config.POSTAL_INDEX_PATH)
+
+
+def lookup_address(code: str) -> list[dict]:
+    """郵便番号から {'prefecture', 'city', 'town'} を引く（同梱の索引を使う）"""
+    return postal_index.lookup(code)
+
+
+def fill_addresses(data: FormData) -> FormData:
+    """郵便番号が入力されていて住所が空の欄を、郵便番号の住所で埋めたコピーを返す
+
+    埋めるのは都道府県・市区町村だけ。番地（町域・番地の数字）は入力してもらい、
+    空なら validation.validate_form のエラーにする。
+    郵便番号が不正・見つからない・市区町村が複数ある場合は、確定できる項目だけを埋める。
+    埋める欄がなければ索引は引かない。
+
+    Raises:
+        FileNotFoundError: 埋める欄があるのに索引がない
+        ValueError: 索引の形式が不正
+    """
+    update = {}
+    for code_field, (prefecture_field, city_field, _) in POSTAL_CODE_FIELDS.items():
+        code = getattr(data, code_field)
+        if not code or normalize_postal_code(code) is None:
+            continue
+        if getattr(data, prefecture_field) and getattr(data, city_field):
+            continue
+        addresses = lookup_address(code)
+        if not addresses:
+            continue
+        first = addresses[0]
+        if not getattr(data, prefecture_field):
+            update[prefecture_field] = first['prefecture']
+        if not getattr(data, city_field) and all(a['city'] == first['city'] for a in addresses):
+            update[city_field] = first['city']
+    return data.model_copy(update=update) if update else data
+
+
+# ============================================
+# コマンドライン（索引の作成）
+# ============================================
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.postal',
+        description="郵便番号データの CSV から索引を作成",
+    )
+    parser.add_argument('csv', nargs='?', type=Path, default=config.POSTAL_CSV_PATH,
+                        help=f"郵便番号データの CSV または ZIP（既定: {config.POSTAL_CSV_PATH}）")
+    parser.add_argument('--out', type=Path, default=config.POSTAL_INDEX_PATH,
+                        help=f"書き出す索引（既定: {config.POSTAL_INDEX_PATH}）")
+    parser.add_argument('--encoding', default='utf-8', help="CSV の文字コード（既定: utf-8）")
+    parser.add_argument('--download', action='store_true',
+                        help="CSV の代わりに日本郵便の全件（--url）をダウンロードして索引を作る")
+    parser.add_argument('--url', default=KEN_ALL_URL, help=f"--download の取得元（既定: {KEN_ALL_URL}）")
+    parser.add_argument('--min-records', type=int, default=0,
+                        help="レコード数がこれより少なければ索引を置き換えずに失敗する（既定: 0）")
+    args = parser.parse_args(argv)
+
+    if not args.download and not args.csv.exists():
+        parser.error(f"CSV が見つかりません: {args.csv}")
+    try:
+        if args.download:
+            fd, source = tempfile.mkstemp(dir=args.out.parent, prefix=args.out.name, suffix='.zip')
+            os.close(fd)
+            try:
+                urllib.request.urlretrieve(args.url, source)
+                count = write_index(source, args.out, args.encoding, args.min_records)
+            finally:
+                os.unlink(source)
+        else:
+            count = write_index(args.csv, args.out, args.encoding, args.min_records)
+    except (OSError, ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        print(f"索引を作成できません: {e}", file=sys.stderr)
+        return 1
+    print(f"{count}件の索引を作成しました: {args.out} ({args.out.stat().st_size:,} バイト)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
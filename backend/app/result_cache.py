@@ -0,0 +1,237 @@
+"""生成済みPDFの結果キャッシュ
+
+同じ申請内容のPDFを何度もダウンロードされる（再試行・ダブルクリック・確認画面への
+戻りなど）ので、入力内容とテンプレートのハッシュをキーに生成結果を保持する。
+メモリ上のLRU（バイト数上限あり）と、任意でディスク上のキャッシュの2段構成。
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Optional
+
+from . import config, layout
+from .schemas import FormData
+
+
+def bundle_cache_key(data: FormData, template_fingerprints: Iterable[str], *,
+                     today: Optional[date] = None, plan: Optional[list[layout.PlannedPage]] = None,
+                     **options) -> str:
+    """入力内容・テンプレート・生成オプションからキャッシュキーを作る
+
+    入力内容はレイアウトプラン（各ページに実際に描く内容）のハッシュで表す。
+    PDFに印字されない項目だけが違う入力は同じキーになり、略歴書の年齢が
+    変わる日にはキーも変わる。
+
+    ディスクキャッシュは設定の変更・デプロイをまたいで残るので、出力が変わる
+    設定（オーバーレイの書き出し方・再現モード）と生成処理のバージョン
+    （pdf_generator.renderer_fingerprint）も options に渡す。
+
+    Args:
+        plan: 作成済みのレイアウトプラン（省略時は data と today から作る）
+    """
+    if plan is None:
+        plan = layout.plan_bundle(data, today)
+    h = hashlib.sha256()
+    h.update(layout.plan_fingerprint(plan).encode('ascii'))
+    for fingerprint in template_fingerprints:
+        h.update(b'\0')
+        h.update(str(fingerprint).encode('utf-8'))
+    for name in sorted(options):
+        h.update(f'\0{name}={options[name]!r}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """生成結果のLRUキャッシュ
+
+    Args:
+        max_bytes: メモリ上に保持する合計バイト数の上限（0でメモリキャッシュ無効）
+        disk_dir: ディスクキャッシュのディレクトリ（Noneでディスクキャッシュ無効）
+        disk_max_bytes: ディスクキャッシュの合計バイト数の上限
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        # ディスクの使用量の集計・追い出し用（ファイル操作の間もメモリを引けるように _lock とは分ける）
+        self._disk_lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # 初回アクセス時に集計
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ----------------------------------------
+    # メモリ
+    # ----------------------------------------
+
+    def _memory_put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # ----------------------------------------
+    # ディスク
+    # ----------------------------------------
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.pdf"
+
+    def _disk_files(self) -> list[Path]:
+        return list(self.disk_dir.glob('*.pdf'))
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            value = path.read_bytes()
+            os.utime(path)  # 最終アクセス順で追い出すため更新日時を更新
+            return value
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, value: bytes):
+        if len(value) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(value)
+                replaced = path.stat().st_size if path.exists() else 0
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            return
+
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(p.stat().st_size for p in self._disk_files())
+            else:
+                self._disk_bytes += len(value) - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self):
+        """古い（最終アクセスが古い）ファイルから削除して上限内に収める（_disk_lock を取って呼ぶ）"""
+        entries = []
+        for path in self._disk_files():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                continue
+        self._disk_bytes = total
+
+    # ----------------------------------------
+    # 公開API
+    # ----------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _record_disk_lookup(self, key: str, value: Optional[bytes]):
+        """ディスクを引いた結果を数え、見つかればメモリにも保持する"""
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self._memory_put(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """キャッシュから取得（なければNone）"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        value = self._disk_get(key) if self.disk_dir is not None else None
+        self._record_disk_lookup(key, value)
+        return value
+
+    def put(self, key: str, value: bytes):
+        """キャッシュに保存"""
+        with self._lock:
+            self._memory_put(key, value)
+        if self.disk_dir is not None:
+            self._disk_put(key, value)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """get と同じ（ディスクの読み込みはスレッドで行い、イベントループを止めない）"""
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        value = await asyncio.to_thread(self._disk_get, key) if self.disk_dir is not None else None
+        self._record_disk_lookup(key, value)
+        return value
+
+    async def put_async(self, key: str, value: bytes):
+        """put と同じ（ディスクへの書き込み・追い出しはスレッドで行い、イベントループを止めない）"""
+        with self._lock:
+            self._memory_put(key, value)
+        if self.disk_dir is not None:
+            await asyncio.to_thread(self._disk_put, key, value)
+
+    def stats(self) -> dict:
+        """ヒット数・ミス数・使用量を返す"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes or 0,
+            }
+
+    def clear(self):
+        """メモリ上のキャッシュとカウンタを破棄（ディスク上のファイルは残す）"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+
+
+# アプリ全体で共有する結果キャッシュ
+result_cache = ResultCache(
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    disk_dir=config.RESULT_CACHE_DIR or None,
+    disk_max_bytes=config.RESULT_CACHE_DISK_MAX_BYTES,
+)
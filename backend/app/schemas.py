@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Optional
 
 
 class CareerEntry(BaseModel):
@@ -126,3 +126,12 @@ class FormData(BaseModel):
         if self.representativeLastNameKana and self.representativeFirstNameKana:
             return f"{self.representativeLastNameKana} {self.representativeFirstNameKana}"
         return None
+
+
+class BatchRequest(BaseModel):
+    """一括生成のリクエスト
+
+    1件ごとに FormData として検証し、不正なレコードはその件だけ失敗として扱うため、
+    ここでは辞書のまま受け取る。
+    """
+    records: list[dict[str, Any]]
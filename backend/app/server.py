@@ -0,0 +1,189 @@
+"""プリフォーク型のサーバー起動
+
+使い方（backend ディレクトリで実行）:
+    python -m app.server --port 8000 --workers 4
+
+uvicorn --workers ではワーカーごとに reportlab・pypdf の読み込み、フォント（TTF）の解析、
+テンプレートの解析を行うため、メモリがワーカー数に比例して増える。
+ここではマスタープロセスでそれらを一度だけ済ませてから（main.preload）ワーカーを fork し、
+ワーカー間でコピーオンライトで共有する。fork の前に gc.freeze() して、
+読み込み済みのオブジェクトをGCの対象から外す（GCの走査でページが書き換わり、
+共有が解けるのを防ぐ）。
+
+ワーカーは同じリスニングソケットで uvicorn を動かし、max_requests 件を処理すると終了する。
+マスターは終了したワーカーの代わりを同じ番号で fork し直す。
+
+メトリクス・結果キャッシュ（メモリ）・実行中の生成のまとめはワーカーごとに持つ。
+/api/metrics の各系列にはワーカーの番号を worker ラベルで付ける。
+"""
+
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Optional
+
+import uvicorn
+
+from . import config
+
+
+# 起動直後に終了したワーカーを作り直すまでの待ち時間（秒、失敗し続ける場合の連続 fork を防ぐ）
+RESPAWN_BACKOFF = 1.0
+
+# この秒数より前に終了したワーカーは起動に失敗したとみなす
+MIN_WORKER_LIFETIME = 1.0
+
+
+def create_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """ワーカーで共有するリスニングソケットを作る"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_max_requests(max_requests: int, jitter: int) -> Optional[int]:
+    """ワーカー1つが処理するリクエスト数の上限（0以下は上限なし）"""
+    if max_requests <= 0:
+        return None
+    return max_requests + (random.randint(0, jitter) if jitter > 0 else 0)
+
+
+def run_worker(sock: socket.socket, max_requests: Optional[int], log_level: str, worker: int = 0):
+    """ワーカープロセスで uvicorn を動かす（max_requests 件を処理すると戻る）
+
+    Args:
+        worker: ワーカーの番号（メトリクスの worker ラベル）
+    """
+    from . import metrics
+    from .main import app
+
+    metrics.set_worker(str(worker))
+
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        limit_max_requests=max_requests,
+        log_level=log_level,
+        lifespan='on',
+    ))
+    server.run(sockets=[sock])
+
+
+class Master:
+    """ワーカーを fork して数を保つマスタープロセス
+
+    Args:
+        sock: ワーカーで共有するリスニングソケット
+        workers: ワーカー数
+        max_requests: ワーカーを入れ替えるまでのリクエスト数（0で入れ替えない）
+        max_requests_jitter: max_requests に加える乱数の幅
+        log_level: uvicorn のログレベル
+    """
+
+    def __init__(self, sock: socket.socket, workers: int, max_requests: int = 0,
+                 max_requests_jitter: int = 0, log_level: str = 'info'):
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.log_level = log_level
+        self.children: dict[int, tuple[int, float]] = {}  # pid -> (ワーカーの番号, 起動時刻)
+        self.stopping = False
+
+    def spawn(self, worker: int):
+        """番号 worker のワーカーを1つ fork する"""
+        max_requests = worker_max_requests(self.max_requests, self.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            # ワーカー側: マスターのシグナルハンドラを外し、uvicorn に任せる
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(self.sock, max_requests, self.log_level, worker)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (worker, time.monotonic())
+
+    def stop(self, signum, frame):
+        """ワーカーを止める（2回目はすぐに強制終了）"""
+        sig = signal.SIGKILL if self.stopping else signal.SIGTERM
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """ワーカーを起動し、終了したワーカーを作り直す（停止のシグナルまで戻らない）"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for worker in range(self.workers):
+            self.spawn(worker)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            child = self.children.pop(pid, None)
+            if child is None or self.stopping:
+                continue
+            worker, started = child
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                print(f"ワーカー {pid} が起動直後に終了しました（status={status}）", file=sys.stderr)
+                time.sleep(RESPAWN_BACKOFF)
+            self.spawn(worker)
+
+
+def preload():
+    """fork 前の読み込み（フォント・テンプレート・固定マーク・テストPDF）と gc.freeze()"""
+    from . import main
+
+    main.preload()
+    gc.collect()
+    gc.freeze()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.server',
+        description="フォント・テンプレートを読み込んでからワーカーを fork するサーバー",
+    )
+    parser.add_argument('--host', default='0.0.0.0', help="待ち受けるアドレス（既定: 0.0.0.0）")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)),
+                        help="待ち受けるポート（既定: 環境変数 PORT、なければ 8000）")
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS,
+                        help="ワーカープロセス数（既定: KOBUTSU_SERVER_WORKERS、0以下はCPU数）")
+    parser.add_argument('--max-requests', type=int, default=config.SERVER_MAX_REQUESTS,
+                        help="ワーカーを入れ替えるまでのリクエスト数（0で入れ替えない）")
+    parser.add_argument('--max-requests-jitter', type=int, default=config.SERVER_MAX_REQUESTS_JITTER,
+                        help="入れ替えのリクエスト数に加える乱数の幅")
+    parser.add_argument('--log-level', default='info', help="uvicorn のログレベル")
+    args = parser.parse_args(argv)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    # ソケットは読み込みの前に作る（ポートが使えない場合にすぐ失敗させる）
+    sock = create_socket(args.host, args.port)
+    preload()
+    print(f"{args.host}:{args.port} でワーカー {workers} 個を起動します", file=sys.stderr)
+    Master(sock, workers, args.max_requests, args.max_requests_jitter, args.log_level).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""同一リクエストの同時実行のまとめ（シングルフライト）
+
+ダブルクリックやクライアントの再試行で、同じ内容の生成リクエストが数百ミリ秒の間に
+何件も届く。同じキーの処理が実行中なら新たに実行せず、実行中の処理の結果を待って
+同じ結果を返す。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """キーごとに実行中の処理を1つにまとめる
+
+    処理は呼び出し元とは別のタスクで実行するので、最初の呼び出し元が切断
+    （キャンセル）されても、待っている他の呼び出し元には結果が返る。
+    例外も待っている全員に同じものが送られる。
+    """
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.started = 0    # 実際に実行した件数
+        self.coalesced = 0  # 実行中の処理の結果を待った件数
+
+    @property
+    def in_flight(self) -> int:
+        """実行中のキーの数"""
+        return len(self._in_flight)
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """key の処理が実行中ならその結果を待ち、なければ fn() を実行して結果を返す"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # 待っている呼び出し元が全員キャンセルされていても、例外が未取得の警告を出さない
+        if not task.cancelled():
+            task.exception()
+
+
+# アプリ全体で共有するシングルフライト
+single_flight = SingleFlight()
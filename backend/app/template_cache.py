@@ -0,0 +1,112 @@
+"""テンプレートPDFのキャッシュ
+
+テンプレートはプロセスごとに一度だけ読み込み・検証し、
+リクエストごとにはページの複製だけを渡す。
+"""
+
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from pypdf import PdfReader, PdfWriter, PageObject
+
+from . import metrics
+
+
+PathLike = Union[str, Path]
+
+# 読み込み時にテンプレートへ一度だけ適用する加工（固定マークの焼き込みなど）
+Prepare = Callable[[PdfWriter], None]
+
+
+class TemplateCache:
+    """読み込み済みテンプレートPDFを保持する
+
+    読み込んだテンプレートは PdfWriter に丸ごと複製してメモリ上に置く。
+    元のファイルを参照しないので、複数スレッドから同時に複製を取り出せる。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pages: dict[tuple[str, Optional[Prepare]], list[PageObject]] = {}
+        self._fingerprints: dict[str, str] = {}
+
+    @staticmethod
+    def _key(path: PathLike, prepare: Optional[Prepare] = None) -> tuple[str, Optional[Prepare]]:
+        return os.fspath(path), prepare
+
+    def load(self, path: PathLike, prepare: Optional[Prepare] = None) -> list[PageObject]:
+        """テンプレートを読み込む（読み込み済みなら何もしない）
+
+        Args:
+            path: テンプレートPDFのパス
+            prepare: 読み込み時に一度だけ適用する加工。加工済みのテンプレートは
+                元のテンプレートとは別に保持する
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない
+            ValueError: ページが含まれていない
+        """
+        key = self._key(path, prepare)
+        pages = self._pages.get(key)
+        if pages is not None:
+            return pages
+
+        with self._lock:
+            pages = self._pages.get(key)
+            if pages is not None:
+                return pages
+
+            if prepare is None:
+                if not Path(key[0]).exists():
+                    raise FileNotFoundError(key[0])
+                with metrics.stage('template_load'):
+                    raw = Path(key[0]).read_bytes()
+                    master = PdfWriter(clone_from=PdfReader(io.BytesIO(raw)))
+                self._fingerprints[key[0]] = hashlib.sha256(raw).hexdigest()
+            else:
+                master = PdfWriter()
+                for page in self.load(path):
+                    master.add_page(page)
+                with metrics.stage('template_prepare'):
+                    prepare(master)
+
+            pages = list(master.pages)
+            if not pages:
+                raise ValueError(f"テンプレートにページがありません: {key[0]}")
+            self._pages[key] = pages
+            return pages
+
+    def is_loaded(self, path: PathLike, prepare: Optional[Prepare] = None) -> bool:
+        """読み込み済みかどうか"""
+        return self._key(path, prepare) in self._pages
+
+    def fingerprint(self, path: PathLike) -> str:
+        """テンプレートファイルの内容のハッシュ（SHA-256）"""
+        self.load(path)
+        return self._fingerprints[self._key(path)[0]]
+
+    def page_count(self, path: PathLike) -> int:
+        """テンプレートのページ数"""
+        return len(self.load(path))
+
+    def add_page(self, writer: PdfWriter, path: PathLike, index: int = 0,
+                 prepare: Optional[Prepare] = None) -> PageObject:
+        """テンプレートのページを複製して writer に追加し、追加したページを返す
+
+        返すページは writer 側の複製なので、マージしてもキャッシュは変わらない。
+        """
+        return writer.add_page(self.load(path, prepare)[index])
+
+    def clear(self):
+        """キャッシュを破棄"""
+        with self._lock:
+            self._pages.clear()
+            self._fingerprints.clear()
+
+
+# プロセス全体で共有するキャッシュ
+template_cache = TemplateCache()
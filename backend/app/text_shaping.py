@@ -0,0 +1,211 @@
+"""文字列の整形（フリガナの半角化・マス目への割り付け・URLのフリガナ・文字幅）
+
+レイアウトプランの組み立てと描画の両方から、申請ごとに何度も呼ばれる処理をまとめる。
+
+- 変換表はモジュールの読み込み時に1回だけ作り、文字列全体を1回で変換する
+- 氏名・営業所名のフリガナ、URL など同じ文字列が繰り返し来るものは整形結果をメモ化する
+- 文字幅はフォントを登録済みならその幅、未登録なら IPAゴシック（ipag.ttf）から作った文字幅の表
+  （font_widths。表がなければ IPAゴシックの幅の規則。reportlab もフォントも読み込まない）で求め、文字列ごとにメモ化する（右揃えの描画・欄に収まるかの判定で毎回測り直さない）
+"""
+
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+
+from . import font_widths
+
+
+# 描画に使うフォント
+FONT_NAME = 'IPAGothic'
+
+# メモ化する文字列の数（申請ごとに変わる氏名・住所が入れ替わっても十分な数）
+CACHE_SIZE = 4096
+
+
+# ============================================
+# 変換表
+# ============================================
+
+# 全角カナ・濁点 → 半角カナ（結合用の濁点・半濁点 U+3099/U+309A を含む）
+HALFWIDTH_KANA_TABLE = str.maketrans(
+    'アイウエオカキクケコサシスセソタチツテトナニヌネノ'
+    'ハヒフヘホマミムメモヤユヨラリルレロワヲン'
+    'ァィゥェォッャュョー・゛゜\u3099\u309A',
+    'ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉ'
+    'ﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜｦﾝ'
+    'ｧｨｩｪｫｯｬｭｮｰ･ﾞﾟﾞﾟ'
+)
+
+# カタカナ（ァ〜ン）→ ひらがな
+HIRAGANA_TABLE = {code: code - 0x60 for code in range(ord('ァ'), ord('ン') + 1)}
+
+# フリガナマッピングテーブル
+URL_FURIGANA_MAP = {
+    # 英小文字
+    'a': 'ｴｰ', 'b': 'ﾋﾞｰ', 'c': 'ｼｰ', 'd': 'ﾃﾞｨｰ', 'e': 'ｲｰ',
+    'f': 'ｴﾌ', 'g': 'ｼﾞｰ', 'h': 'ｴｲﾁ', 'i': 'ｱｲ', 'j': 'ｼﾞｪｲ',
+    'k': 'ｹｲ', 'l': 'ｴﾙ', 'm': 'ｴﾑ', 'n': 'ｴﾇ', 'o': 'ｵｰ',
+    'p': 'ﾋﾟｰ', 'q': 'ｷｭｰ', 'r': 'ｱｰﾙ', 's': 'ｴｽ', 't': 'ﾃｨｰ',
+    'u': 'ﾕｰ', 'v': 'ﾌﾞｲ', 'w': 'ﾀﾞﾌﾞﾘｭｰ', 'x': 'ｴｯｸｽ', 'y': 'ﾜｲ', 'z': 'ｾﾞｯﾄ',
+    # 記号
+    ':': 'ｺﾛﾝ', '/': 'ｽﾗｯｼｭ', '.': 'ﾄﾞｯﾄ', '-': 'ﾊｲﾌﾝ',
+    '_': 'ｱﾝﾀﾞｰﾊﾞｰ', '~': 'ﾁﾙﾀﾞ', '@': 'ｱｯﾄ', '#': 'ｼｬｰﾌﾟ',
+    '?': 'ﾊﾃﾅ', '=': 'ｲｺｰﾙ', '&': 'ｱﾝﾄﾞ', '%': 'ﾊﾟｰｾﾝﾄ',
+    # 数字
+    '0': 'ｾﾞﾛ', '1': 'ｲﾁ', '2': 'ﾆ', '3': 'ｻﾝ', '4': 'ﾖﾝ',
+    '5': 'ｺﾞ', '6': 'ﾛｸ', '7': 'ﾅﾅ', '8': 'ﾊﾁ', '9': 'ｷｭｳ',
+}
+
+# マス目を1つ空ける文字
+GRID_SPACES = (' ', '　')
+
+
+# ============================================
+# 文字の変換
+# ============================================
+
+def separate_dakuten(text: str) -> list[str]:
+    """濁点・半濁点を分離して1マスずつにする"""
+    return list(unicodedata.normalize('NFD', text))
+
+
+def katakana_to_hiragana(text: str) -> str:
+    """カタカナをひらがなに変換"""
+    return text.translate(HIRAGANA_TABLE)
+
+
+def to_halfwidth_kana(text: str) -> str:
+    """全角カナ・濁点を半角に変換（文字列全体を1回で変換する）"""
+    return text.translate(HALFWIDTH_KANA_TABLE)
+
+
+def get_url_furigana(char: str) -> str:
+    """文字に対応するフリガナを取得"""
+    # 小文字に変換して検索
+    return URL_FURIGANA_MAP.get(char.lower(), '')
+
+
+# ============================================
+# 整形（メモ化）
+# ============================================
+
+@lru_cache(maxsize=CACHE_SIZE)
+def shape_kana_grid(text: str) -> tuple[tuple[int, str], ...]:
+    """フリガナをマス目に割り付ける
+
+    濁点・半濁点を1マスに分けて半角カナにし、空白のマスを飛ばした
+    (マスの番号, 文字) の列を返す。
+    """
+    shaped = to_halfwidth_kana(unicodedata.normalize('NFD', text))
+    return tuple((col, char) for col, char in enumerate(shaped) if char not in GRID_SPACES)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def shape_url(url: str) -> tuple[tuple[str, str], ...]:
+    """URLの1文字ずつの (文字, フリガナ) の列（フリガナがない文字は空文字列）"""
+    return tuple((char, get_url_furigana(char)) for char in url)
+
+
+# ============================================
+# 文字幅
+# ============================================
+
+# 文字幅の表がない場合の幅（IPAゴシックは等幅: 半角の英数字・記号・カナは500、それ以外は1000）
+FALLBACK_WIDTHS = {
+    **{code: 500 for code in range(0x20, 0x7F)},
+    **{code: 500 for code in range(0xFF61, 0xFFA0)},
+}
+FALLBACK_DEFAULT_WIDTH = 1000
+
+
+def registered_widths(font_name: str) -> Optional[tuple[dict[int, float], float]]:
+    """reportlab に登録済みのフォントの文字幅（reportlab を読み込んでいない・未登録なら None）"""
+    pdfmetrics = sys.modules.get('reportlab.pdfbase.pdfmetrics')
+    if pdfmetrics is None or font_name not in pdfmetrics.getRegisteredFontNames():
+        return None
+    face = pdfmetrics.getFont(font_name).face
+    return face.charWidths, face.defaultWidth
+
+
+@lru_cache(maxsize=None)
+def width_table(font_name: str = FONT_NAME) -> tuple[dict[int, float], float]:
+    """フォントの文字ごとの幅（文字コード -> 1000分率の幅）と表にない文字の幅
+
+    描画のためにフォントを登録済みならその幅を使う（描画と同じ幅になる）。未登録なら
+    IPAゴシックから作った文字幅の表（config.FONT_WIDTHS_PATH）から1回だけ作る（TTF の解析・登録はしない）。
+    表がない場合や表にないフォントは IPAゴシックの幅の規則で代用する。
+    """
+    registered = registered_widths(font_name)
+    if registered is not None:
+        return registered
+    try:
+        tables = font_widths.load()
+    except (OSError, ValueError):
+        return FALLBACK_WIDTHS, FALLBACK_DEFAULT_WIDTH
+    return tables.get(font_name, (FALLBACK_WIDTHS, FALLBACK_DEFAULT_WIDTH))
+
+
+def clear_width_cache() -> None:
+    """メモ化した文字幅を捨てる（フォントを登録したときに呼び、以後は登録したフォントの幅にする）"""
+    width_table.cache_clear()
+    text_width.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def text_width(text: str, font_name: str = FONT_NAME) -> float:
+    """文字列の幅（フォントサイズ1000あたり）"""
+    widths, default = width_table(font_name)
+    get = widths.get
+    return sum(get(ord(char), default) for char in text)
+
+
+def string_width(text: str, font_size: float, font_name: str = FONT_NAME) -> float:
+    """文字列の幅（ポイント、reportlab の stringWidth と同じ値）"""
+    return 0.001 * font_size * text_width(text, font_name)
+
+
+def wrap_text(text: str, font_size: float, max_width: float, max_lines: int,
+              font_name: str = FONT_NAME) -> Optional[list[str]]:
+    """max_width に収まるように折り返す（max_lines 行に収まらなければ None）
+
+    空白があれば最後の空白で、なければ文字単位で折り返す。
+    1文字で max_width を超える場合はその文字だけの行にする。
+    """
+    widths, default = width_table(font_name)
+    get = widths.get
+    limit = max_width * 1000 / font_size
+
+    lines = []
+    start = 0
+    width = 0.0
+    last_space = -1
+    i = 0
+    while i < len(text):
+        char = text[i]
+        char_width = get(ord(char), default)
+        if width + char_width > limit and i > start:
+            if char in GRID_SPACES:
+                end = i
+            elif last_space > start:
+                end = last_space
+            else:
+                end = i
+            lines.append(text[start:end].rstrip())
+            if len(lines) == max_lines:
+                return None
+            # 次の行の先頭の空白は詰める
+            start = end
+            while start < len(text) and text[start] in GRID_SPACES:
+                start += 1
+            i = start
+            width = 0.0
+            last_space = -1
+            continue
+        if char in GRID_SPACES:
+            last_space = i
+        width += char_width
+        i += 1
+
+    lines.append(text[start:])
+    return lines
@@ -0,0 +1,241 @@
+"""入力内容の検証（PDFを生成する前に、描画が前提とする内容をまとめて確認する）
+
+FormData は文字列なら何でも受け付けるので、不正な元号・数字でない年・分けられない
+電話番号などは、PDFの空欄や描画中のエラーとしてしか分からない。ここで描画に使う
+項目を1回でまとめて検証し、全てのエラーを返す（生成の前に弾く）。
+
+- 元号: 各書類の元号の○の位置（coordinates の 〜ERA_POSITIONS）にあるもの
+- 日付: 数字・月日の範囲・元号の年の範囲・未来の日付でないこと
+- 電話番号: 市外局番・市内局番・番号の3つに分けられること
+- フリガナ: カタカナで、マス目の数に収まること
+- 申請者と異なる管理者・営業所所在地、代表者等は、描画に使う項目が揃っていること
+
+縮小・折り返しで欄に収める項目（layout.fitted_text）は生成を止めず、
+収まらなかったものを layout.find_overflows で報告する。
+"""
+
+import re
+from datetime import date
+from typing import Optional
+
+from . import coordinates as coord
+from . import layout, text_shaping
+from .schemas import FormData
+
+
+# 申請者種別
+APPLICANT_TYPES = ('individual', 'corporation')
+
+# 元号ごとの最後の年（令和は当日まで）
+ERA_LAST_YEAR = {
+    'meiji': 45,
+    'taisho': 15,
+    'showa': 64,
+    'heisei': 31,
+    'reiwa': None,
+}
+
+# エラーメッセージに使う元号の表記
+ERA_LABELS = {
+    'seireki': '西暦',
+    'meiji': '明治',
+    'taisho': '大正',
+    'showa': '昭和',
+    'heisei': '平成',
+    'reiwa': '令和',
+}
+
+# 西暦で受け付ける最初の年
+SEIREKI_FIRST_YEAR = 1868
+
+# フリガナに使える文字（全角カタカナ・長音・中黒・空白）
+KANA_PATTERN = re.compile(r'[ァ-ヶー・ 　]+')
+
+# 電話番号の桁数（ハイフン・空白を除く）
+PHONE_DIGITS = (10, 11)
+
+# 略歴書に書ける職歴の件数
+MAX_CAREER_ENTRIES = 6
+
+
+# ============================================
+# 項目ごとの検証
+# ============================================
+
+def _error(errors: list, field: str, message: str):
+    errors.append({'field': field, 'message': message})
+
+
+def _required(errors: list, data: FormData, fields: tuple[str, ...], reason: str):
+    """描画に使う項目が空でないこと"""
+    for name in fields:
+        if not (getattr(data, name) or '').strip():
+            _error(errors, name, f'{reason}は必須です')
+
+
+def check_birth_date(errors: list, prefix: str, era: Optional[str], year: Optional[str],
+                     month: Optional[str], day: Optional[str], era_positions: dict,
+                     today: date):
+    """生年月日（prefix は field 名の接頭辞: birth / managerBirth / representativeBirth）"""
+    era_key = (era or '').lower()
+    if era_key not in era_positions:
+        _error(errors, f'{prefix}Era', f"元号が不正です（{' / '.join(era_positions)} のいずれか）: {era or ''}")
+        era_key = None
+
+    numbers = {}
+    for name, value in (('Year', year), ('Month', month), ('Day', day)):
+        if not (value or '').isdigit():
+            _error(errors, f'{prefix}{name}', f'数字で入力してください: {value or ""}')
+        else:
+            numbers[name] = int(value)
+    if len(numbers) < 3 or era_key is None:
+        return
+
+    year_number = numbers['Year']
+    if era_key == 'seireki':
+        if not SEIREKI_FIRST_YEAR <= year_number <= today.year:
+            _error(errors, f'{prefix}Year', f'西暦は{SEIREKI_FIRST_YEAR}〜{today.year}年で入力してください')
+            return
+    else:
+        last_year = ERA_LAST_YEAR.get(era_key)
+        if last_year is None:
+            last_year = today.year - layout.ERA_TO_SEIREKI[era_key]
+        if not 1 <= year_number <= last_year:
+            _error(errors, f'{prefix}Year', f'{ERA_LABELS[era_key]}は1〜{last_year}年で入力してください')
+            return
+
+    try:
+        birth = date(layout.ERA_TO_SEIREKI[era_key] + year_number, numbers['Month'], numbers['Day'])
+    except ValueError:
+        _error(errors, f'{prefix}Day', '存在しない日付です')
+        return
+    if birth > today:
+        _error(errors, f'{prefix}Day', '未来の日付です')
+
+
+def check_phone(errors: list, field: str, phone: Optional[str]):
+    """電話番号（市外局番・市内局番・番号の3つに分けて描くので、3つに分けられること）"""
+    digits = re.sub(r'[-\s　]', '', phone or '')
+    if not digits.isdigit() or len(digits) not in PHONE_DIGITS:
+        _error(errors, field, f'電話番号は{PHONE_DIGITS[0]}桁または{PHONE_DIGITS[1]}桁の数字で入力してください')
+        return
+    if not all(layout.parse_phone(phone)):
+        _error(errors, field, '市外局番・市内局番・番号に分けられません（例: 03-1234-5678）')
+
+
+def check_kana(errors: list, fields: tuple[str, ...], data: FormData, grid_field: str):
+    """フリガナ（各項目が全角カタカナで、姓名を並べてマス目に収まること）
+
+    Args:
+        fields: フリガナの項目（姓・名など）
+        grid_field: マス目に並べる文字列のプロパティ（姓名を結合したもの）
+    """
+    valid = True
+    for name in fields:
+        text = getattr(data, name)
+        if text and not KANA_PATTERN.fullmatch(text):
+            _error(errors, name, 'フリガナは全角カタカナで入力してください')
+            valid = False
+    text = getattr(data, grid_field)
+    if not valid or not text:
+        return
+    shaped = text_shaping.shape_kana_grid(text)
+    cells = shaped[-1][0] + 1 if shaped else 0
+    if cells > coord.KANA_GRID_MAX_CELLS:
+        _error(errors, grid_field,
+               f'フリガナは濁点・半濁点・空白を含めて{coord.KANA_GRID_MAX_CELLS}マスまでです（{cells}マス）')
+
+
+def check_career(errors: list, field: str, entries: Optional[list]):
+    """職歴（年・月の数字、略歴書に書ける件数）"""
+    entries = entries or []
+    if len(entries) > MAX_CAREER_ENTRIES:
+        _error(errors, field, f'職歴は{MAX_CAREER_ENTRIES}件までです（{len(entries)}件）')
+    for i, entry in enumerate(entries[:MAX_CAREER_ENTRIES]):
+        if not entry.year.isdigit():
+            _error(errors, f'{field}[{i}].year', f'数字で入力してください: {entry.year}')
+        if not (entry.month.isdigit() and 1 <= int(entry.month) <= 12):
+            _error(errors, f'{field}[{i}].month', f'月は1〜12で入力してください: {entry.month}')
+
+
+def check_website(errors: list, data: FormData):
+    """ホームページ（URLの全ての文字にフリガナを振れること）"""
+    if not data.hasWebsite:
+        return
+    if not data.websiteUrl:
+        _error(errors, 'websiteUrl', 'ホームページを用いる場合、URLは必須です')
+        return
+    unsupported = sorted({char for char, furigana in text_shaping.shape_url(data.websiteUrl) if not furigana})
+    if unsupported:
+        _error(errors, 'websiteUrl', f"フリガナを振れない文字が含まれています: {' '.join(unsupported)}")
+
+
+# ============================================
+# 全体の検証
+# ============================================
+
+def validate_form(data: FormData, today: Optional[date] = None) -> list[dict]:
+    """描画が前提とする内容を検証し、全てのエラーを返す
+
+    Returns:
+        {'field': 項目名, 'message': 内容} のリスト（エラーがなければ空）
+    """
+    today = today or date.today()
+    errors: list[dict] = []
+
+    if data.applicantType not in APPLICANT_TYPES:
+        _error(errors, 'applicantType', f"申請者種別が不正です（{' / '.join(APPLICANT_TYPES)} のいずれか）")
+
+    # 申請者
+    _required(errors, data, ('prefecture', 'city', 'street'), '住所')
+    check_kana(errors, ('lastNameKana', 'firstNameKana'), data, 'nameKana')
+    check_birth_date(errors, 'birth', data.birthEra, data.birthYear, data.birthMonth, data.birthDay,
+                     coord.ERA_POSITIONS, today)
+    check_phone(errors, 'phone', data.phone)
+    check_career(errors, 'careerHistory', data.careerHistory)
+
+    # 代表者等（種別・氏名があれば申請書に書く）
+    if data.representativeType and data.representativeType not in coord.REP_TYPE_POSITIONS:
+        _error(errors, 'representativeType',
+               f"代表者等の種別が不正です（{' / '.join(coord.REP_TYPE_POSITIONS)} のいずれか）")
+    if data.representativeType and data.representativeLastNameKanji:
+        _required(errors, data, ('representativeFirstNameKanji', 'representativeLastNameKana',
+                                 'representativeFirstNameKana', 'representativePrefecture',
+                                 'representativeCity', 'representativeStreet'), '代表者等の記入項目')
+        check_kana(errors, ('representativeLastNameKana', 'representativeFirstNameKana'), data,
+                   'representativeNameKana')
+        check_birth_date(errors, 'representativeBirth', data.representativeBirthEra,
+                         data.representativeBirthYear, data.representativeBirthMonth,
+                         data.representativeBirthDay, coord.REP_ERA_POSITIONS, today)
+        check_phone(errors, 'representativePhone', data.representativePhone)
+
+    # 営業所
+    check_kana(errors, ('officeNameKana',), data, 'officeNameKana')
+    if not data.officeSameAsAddress:
+        _required(errors, data, ('officePrefecture', 'officeCity', 'officeStreet'),
+                  '住所と異なる営業所の所在地')
+        check_phone(errors, 'officePhone', data.officePhone)
+
+    # 管理者（申請者と異なる場合）
+    if not data.managerSameAsApplicant:
+        _required(errors, data, ('managerLastNameKanji', 'managerFirstNameKanji', 'managerLastNameKana',
+                                 'managerFirstNameKana', 'managerPrefecture', 'managerCity', 'managerStreet'),
+                  '申請者と異なる管理者の記入項目')
+        check_kana(errors, ('managerLastNameKana', 'managerFirstNameKana'), data, 'managerNameKana')
+        check_birth_date(errors, 'managerBirth', data.managerBirthEra, data.managerBirthYear,
+                         data.managerBirthMonth, data.managerBirthDay, coord.MANAGER_ERA_POSITIONS, today)
+        check_phone(errors, 'managerPhone', data.managerPhone)
+        check_career(errors, 'managerCareerHistory', data.managerCareerHistory)
+    elif data.birthEra.lower() in coord.ERA_POSITIONS and data.birthEra.lower() not in coord.MANAGER_ERA_POSITIONS:
+        # 管理者欄には申請者の生年月日を書く（管理者欄に明治・大正の○はない）
+        _error(errors, 'birthEra', f"管理者欄に書けない元号です（{' / '.join(coord.MANAGER_ERA_POSITIONS)} のいずれか）")
+
+    check_website(errors, data)
+    _required(errors, data, ('submissionPrefecture',), '提出先')
+
+    return errors
+
+
+def format_errors(errors: list[dict]) -> str:
+    """エラーを1行にまとめる（一括生成の manifest.json 用）"""
+    return '; '.join(f"{error['field']}: {error['message']}" for error in errors)
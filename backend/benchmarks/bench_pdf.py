@@ -0,0 +1,333 @@
+"""PDF生成パイプラインのベンチマーク
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.bench_pdf --iterations 30 --output bench.json
+
+全書類PDFの生成（generate_full_application_pdf）を代表的な入力パターンごとに計測し、
+あわせて各段階（フォント読み込み・テンプレート解析・レイアウトプラン・オーバーレイ描画・
+マージ・書き出し）を個別に計測する。オーバーレイの書き出し方は --backend で指定し、全体と
+段階の両方をその書き出し方の処理で計測する。結果は平均・p50・p95（ミリ秒）とメモリ割り当て量を
+JSONで出力する。
+
+    python -m benchmarks.bench_pdf --backend reportlab   # reportlab の書き出し方（既定は direct）
+"""
+
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+import pypdf
+import reportlab
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from app import direct_overlay, layout
+from app.config import TEMPLATE_PATH, SEIYAKU_KOJIN_PATH, SEIYAKU_KANRISHA_PATH, RYAKUREKI_PATH
+from app.pdf_generator import (
+    FONT_PATHS,
+    bundle_pages,
+    draw_bundle_overlay,
+    generate_full_application_pdf,
+    merge_bundle_overlay,
+    register_font,
+    stamp_bundle_forms,
+)
+from app.schemas import CareerEntry, FormData
+from app.template_cache import TemplateCache
+
+
+TEMPLATE_PATHS = [str(TEMPLATE_PATH), str(SEIYAKU_KOJIN_PATH), str(SEIYAKU_KANRISHA_PATH), str(RYAKUREKI_PATH)]
+
+
+# ============================================
+# 入力パターン
+# ============================================
+
+def sample_form_data(**overrides) -> FormData:
+    """ベンチマーク用のフォームデータ（/api/test-pdf と同じサンプル）"""
+    values = dict(
+        applicantType='individual',
+        lastNameKanji='山田',
+        firstNameKanji='太郎',
+        lastNameKana='ヤマダ',
+        firstNameKana='タロウ',
+        birthEra='heisei',
+        birthYear='5',
+        birthMonth='3',
+        birthDay='15',
+        prefecture='大阪府',
+        city='大阪市北区',
+        street='梅田1-2-3',
+        phone='06-1234-5678',
+        officeSameAsAddress=True,
+        officeNameKana='ヤマダショウテン',
+        officeNameKanji='山田商店',
+        managerSameAsApplicant=True,
+        hasWebsite=False,
+        submissionPrefecture='大阪府',
+        careerHistory=[
+            CareerEntry(year='2015', month='4', content='○○大学 入学'),
+            CareerEntry(year='2019', month='3', content='同大学 卒業'),
+            CareerEntry(year='2019', month='4', content='株式会社○○商事 入社'),
+            CareerEntry(year='2021', month='9', content='同社 退職'),
+            CareerEntry(year='2021', month='10', content='△△株式会社 入社'),
+            CareerEntry(year='2023', month='3', content='同社 退職'),
+        ],
+    )
+    values.update(overrides)
+    return FormData(**values)
+
+
+DIFFERENT_MANAGER = dict(
+    managerSameAsApplicant=False,
+    managerLastNameKanji='鈴木',
+    managerFirstNameKanji='花子',
+    managerLastNameKana='スズキ',
+    managerFirstNameKana='ハナコ',
+    managerBirthEra='showa',
+    managerBirthYear='55',
+    managerBirthMonth='7',
+    managerBirthDay='20',
+    managerPrefecture='大阪府',
+    managerCity='大阪市西区',
+    managerStreet='江戸堀4-5-6',
+    managerPhone='080-9876-5432',
+    managerCareerHistory=[
+        CareerEntry(year='2018', month='4', content='株式会社□□ 入社'),
+    ],
+)
+
+WEBSITE = dict(hasWebsite=True, websiteUrl='https://www.yamada-shoten.example.jp/shop')
+
+
+# ============================================
+# 計測
+# ============================================
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(fn: Callable, iterations: int, warmup: int,
+            setup: Optional[Callable[[], tuple]] = None) -> dict:
+    """fn を繰り返し実行して所要時間とメモリ割り当て量を集計
+
+    setup を指定した場合は毎回 setup() の戻り値を引数に渡す（setup の時間は含めない）。
+    メモリ割り当て量は計測とは別に1回だけ tracemalloc 下で実行して求める。
+    """
+    def args() -> tuple:
+        return setup() if setup else ()
+
+    for _ in range(warmup):
+        fn(*args())
+
+    times = []
+    for _ in range(iterations):
+        a = args()
+        start = time.perf_counter()
+        fn(*a)
+        times.append((time.perf_counter() - start) * 1000)
+
+    a = args()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn(*a)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, 'filename')
+
+    times.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(times), 3),
+        'p50_ms': round(percentile(times, 50), 3),
+        'p95_ms': round(percentile(times, 95), 3),
+        'min_ms': round(times[0], 3),
+        'max_ms': round(times[-1], 3),
+        'peak_alloc_bytes': peak,
+        'alloc_blocks': sum(max(0, stat.count_diff) for stat in diff),
+    }
+
+
+# ============================================
+# 計測対象
+# ============================================
+
+# オーバーレイの書き出し方（--backend で1つを選んで計測する）
+BACKENDS = ('reportlab', 'direct')
+
+
+def bundle_inputs() -> dict[str, tuple[FormData, dict]]:
+    """全書類PDF生成の入力パターン"""
+    return {
+        'bundle_same_manager': (sample_form_data(), {}),
+        'bundle_different_manager': (sample_form_data(**DIFFERENT_MANAGER), {}),
+        'bundle_with_website': (sample_form_data(**WEBSITE), {}),
+        'bundle_with_grid': (sample_form_data(), {'with_grid': True}),
+    }
+
+
+def cold() -> tuple:
+    """direct の書き出しがプロセス内で使い回すもの（ページ・フォントのサブセット）を捨てる
+
+    計測の前に毎回呼ぶ setup として使う（計測する関数の引数はない）。
+    """
+    direct_overlay.page_cache.clear()
+    direct_overlay.font_subset.cache_clear()
+    return ()
+
+
+def end_to_end_cases(backend: str) -> dict[str, tuple[Callable, Optional[Callable]]]:
+    """全書類PDF生成の計測対象: 名前 -> (計測する関数, 引数を準備する関数)
+
+    direct はページ・フォントのサブセットのキャッシュを使うので、毎回捨てて計測する
+    （_cold）場合と、同じ入力を繰り返してキャッシュが効く（_warm）場合を分けて計測する。
+    """
+    cases = {}
+    for name, (data, options) in bundle_inputs().items():
+        def generate(data=data, options=options):
+            return generate_full_application_pdf(data, *TEMPLATE_PATHS, overlay_backend=backend, **options)
+
+        if backend == 'direct':
+            cases[f'{name}_cold'] = (generate, cold)
+            cases[f'{name}_warm'] = (generate, None)
+        else:
+            cases[name] = (generate, None)
+    return cases
+
+
+def font_path() -> str:
+    for path in FONT_PATHS:
+        if Path(path).exists():
+            return path
+    raise RuntimeError("日本語フォントが見つかりません。IPAゴシックをインストールしてください。")
+
+
+def draw_overlay(plan: list[layout.PlannedPage]) -> tuple[io.BytesIO, list[tuple]]:
+    """reportlab: 全書類のオーバーレイを1つのキャンバスに描いたPDF"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    pages = draw_bundle_overlay(c, None, *TEMPLATE_PATHS, plan=plan)
+    c.save()
+    buffer.seek(0)
+    return buffer, pages
+
+
+def merge(buffer: io.BytesIO, pages: list[tuple]) -> PdfWriter:
+    """reportlab: オーバーレイのPDFをテンプレートに重ねる"""
+    buffer.seek(0)
+    writer = PdfWriter()
+    merge_bundle_overlay(writer, PdfReader(buffer), pages)
+    return writer
+
+
+def add_forms(plan: list[layout.PlannedPage]) -> tuple[PdfWriter, list]:
+    """direct: オーバーレイの Form XObject を追加した writer"""
+    writer = PdfWriter()
+    return writer, direct_overlay.add_overlay_forms(writer, plan)
+
+
+def stamp(writer: PdfWriter, forms: list, plan: list[layout.PlannedPage]) -> PdfWriter:
+    """direct: Form XObject をテンプレートに重ねる"""
+    stamp_bundle_forms(writer, forms, bundle_pages(plan, *TEMPLATE_PATHS))
+    return writer
+
+
+def stage_cases(data: FormData, backend: str) -> dict[str, tuple[Callable, Optional[Callable]]]:
+    """段階ごとの計測対象: 名前 -> (計測する関数, 引数を準備する関数)
+
+    build_full_application_pdf と同じ段階（プラン・オーバーレイ・マージ・書き出し）を、
+    計測する書き出し方の処理で計測する。direct のオーバーレイは、キャッシュを毎回捨てる
+    場合（stage_overlay_render）と効く場合（stage_overlay_render_warm）を分けて計測する。
+    """
+    path = font_path()
+    plan = layout.plan_bundle(data)
+
+    def parse_templates():
+        cache = TemplateCache()
+        for template_path in TEMPLATE_PATHS:
+            cache.load(template_path)
+
+    cases = {
+        'stage_font_registration': (lambda: TTFont('IPAGothicBench', path), None),
+        'stage_template_parse': (parse_templates, None),
+        'stage_layout_plan': (lambda: layout.plan_bundle(data), None),
+    }
+    if backend == 'direct':
+        cases.update({
+            'stage_overlay_render': (lambda: add_forms(plan), cold),
+            'stage_overlay_render_warm': (lambda: add_forms(plan), None),
+            'stage_merge': (lambda writer, forms: stamp(writer, forms, plan), lambda: add_forms(plan)),
+            'stage_write': (lambda writer: writer.write(io.BytesIO()), lambda: (stamp(*add_forms(plan), plan),)),
+        })
+    else:
+        cases.update({
+            'stage_overlay_render': (lambda: draw_overlay(plan), None),
+            'stage_merge': (merge, lambda: draw_overlay(plan)),
+            'stage_write': (lambda writer: writer.write(io.BytesIO()), lambda: (merge(*draw_overlay(plan)),)),
+        })
+    return cases
+
+
+def run(iterations: int, warmup: int, only: Optional[list[str]] = None, backend: str = 'direct') -> dict:
+    """全ベンチマークを指定した書き出し方で実行して結果を返す"""
+    register_font()
+
+    cases = end_to_end_cases(backend)
+    cases.update(stage_cases(sample_form_data(), backend))
+
+    results = {}
+    for name, (fn, setup) in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = measure(fn, iterations, warmup, setup)
+        print(f"{name}: mean {results[name]['mean_ms']:.1f} ms, p95 {results[name]['p95_ms']:.1f} ms",
+              file=sys.stderr)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'pypdf': pypdf.__version__,
+            'reportlab': reportlab.Version,
+            'overlay_backend': backend,
+        },
+        'results': results,
+    }
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="PDF生成パイプラインのベンチマーク")
+    parser.add_argument('--iterations', type=int, default=20, help="計測回数（既定: 20）")
+    parser.add_argument('--warmup', type=int, default=2, help="計測前の空実行の回数（既定: 2）")
+    parser.add_argument('--only', nargs='+', help="指定した名前のベンチマークだけ実行")
+    parser.add_argument('--backend', choices=BACKENDS, default='direct',
+                        help="計測するオーバーレイの書き出し方（既定: direct）")
+    parser.add_argument('--output', help="結果JSONの出力先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.warmup, args.only, args.backend)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
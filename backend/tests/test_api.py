@@ -1,11 +1,21 @@
 """APIエンドポイントのテスト"""
 
+import asyncio
+import io
+import json
+import re
+import time
+import zipfile
+
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-from pathlib import Path
+from unittest.mock import patch
 
-from app.main import app
+from app import metrics
+from app.main import app, render_bundle
+from app.postal import PostalIndex
+from app.schemas import FormData
+from app.result_cache import result_cache
 
 
 @pytest.fixture
@@ -14,6 +24,14 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    """テスト間で生成結果のキャッシュを共有しない"""
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
+
 # 有効なフォームデータ（個人申請者）
 VALID_INDIVIDUAL_DATA = {
     "applicantType": "individual",
@@ -99,19 +117,157 @@ class TestHealthCheck:
         assert response.json() == {"status": "ok"}
 
 
+class TestReadiness:
+    """レディネスチェックのテスト"""
+
+    def wait_for_warm_up(self, client, timeout=10):
+        deadline = time.monotonic() + timeout
+        response = client.get("/api/ready")
+        while response.status_code == 503 and response.json()["status"] == "starting":
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+            response = client.get("/api/ready")
+        return response
+
+    def test_ready_after_warm_up(self):
+        """ウォームアップが終わると200を返す"""
+        with patch("app.main.config.WARMUP", True), \
+                patch("app.main.template_cache"), \
+                patch("app.main.warm_up") as mock_warm_up:
+            with TestClient(app) as client:
+                response = self.wait_for_warm_up(client)
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+        mock_warm_up.assert_called()
+
+    def test_not_ready_when_warm_up_fails(self):
+        """ウォームアップに失敗した場合は503のまま"""
+        with patch("app.main.config.WARMUP", True), \
+                patch("app.main.template_cache"), \
+                patch("app.main.warm_up", side_effect=RuntimeError("フォントなし")):
+            with TestClient(app) as client:
+                response = self.wait_for_warm_up(client)
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "failed"
+        assert "フォントなし" in response.json()["detail"]
+
+    def test_ready_without_warm_up(self):
+        """ウォームアップ無効時は起動直後から200"""
+        with patch("app.main.config.WARMUP", False), patch("app.main.template_cache"):
+            with TestClient(app) as client:
+                response = client.get("/api/ready")
+
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize("warm_up", [True, False])
+    def test_ready_without_postal_index(self, warm_up, tmp_path):
+        """郵便番号の索引はPDF生成に使わないので、なくても ready になる"""
+        with patch("app.main.config.WARMUP", warm_up), \
+                patch("app.main.template_cache"), \
+                patch("app.main.warm_up"), \
+                patch("app.postal.postal_index", PostalIndex(tmp_path / "missing.idx")):
+            with TestClient(app) as client:
+                response = self.wait_for_warm_up(client)
+
+        assert response.status_code == 200
+
+
+class TestTestPdf:
+    """テストPDFのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def mock_generate(self):
+        """テンプレートの読み込みとPDF生成をモックし、保持しているテストPDFを破棄"""
+        from app.main import sample_pdfs
+
+        sample_pdfs.clear()
+        with patch("app.main.template_cache") as mock_cache, \
+                patch("app.main.generate_full_application_pdf") as mock_generate:
+            mock_cache.fingerprint.return_value = "template"
+            mock_generate.side_effect = lambda *args, with_grid, **kwargs: (
+                b"%PDF-1.4 grid" if with_grid else b"%PDF-1.4 plain"
+            )
+            yield mock_generate
+        sample_pdfs.clear()
+
+    def test_generated_once(self, client, mock_generate):
+        """2回目以降は保持している結果を返す"""
+        first = client.get("/api/test-pdf")
+        second = client.get("/api/test-pdf")
+
+        assert first.status_code == 200
+        assert first.content == second.content == b"%PDF-1.4 plain"
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert first.headers["Cache-Control"] == "no-cache"
+        assert mock_generate.call_count == 1
+
+        grid = client.get("/api/test-pdf?grid=true")
+        assert grid.content == b"%PDF-1.4 grid"
+        assert grid.headers["ETag"] != first.headers["ETag"]
+        assert mock_generate.call_count == 2
+
+    def test_not_modified(self, client):
+        """If-None-Match が一致すれば304"""
+        etag = client.get("/api/test-pdf").headers["ETag"]
+
+        response = client.get("/api/test-pdf", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        response = client.get("/api/test-pdf", headers={"If-None-Match": '"other"'})
+        assert response.status_code == 200
+
+    def test_immutable_with_version(self, client):
+        """?v= に現在の ETag を付けると immutable"""
+        etag = client.get("/api/test-pdf").headers["ETag"]
+
+        response = client.get(f"/api/test-pdf?v={etag.strip(chr(34))}")
+        assert "immutable" in response.headers["Cache-Control"]
+
+        response = client.get("/api/test-pdf?v=old")
+        assert response.headers["Cache-Control"] == "no-cache"
+
+    def test_regenerated_when_coordinates_change(self, client, mock_generate):
+        """座標定義が変わると生成し直す"""
+        client.get("/api/test-pdf")
+        with patch("app.main.coordinates_fingerprint", return_value="changed"):
+            client.get("/api/test-pdf")
+        assert mock_generate.call_count == 2
+
+
+class TestMetrics:
+    """メトリクスのテスト"""
+
+    def test_metrics_after_generate(self, client):
+        """PDF生成後にリクエスト件数・段階ごとの処理時間が出力される"""
+        with patch("app.main.template_cache"), \
+                patch("app.main.generate_full_application_pdf") as mock_generate:
+            mock_generate.return_value = b"%PDF-1.4 test pdf content"
+            client.post("/api/generate-pdf", json=VALID_INDIVIDUAL_DATA)
+
+        response = client.get("/api/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'kobutsu_requests_total{endpoint="generate-pdf"}' in body
+        assert 'kobutsu_response_bytes_total{endpoint="generate-pdf"}' in body
+        assert 'kobutsu_request_duration_seconds_count{endpoint="generate-pdf"}' in body
+        assert 'kobutsu_result_cache_requests_total{result="miss"}' in body
+        assert 'kobutsu_render_in_flight' in body
+
+
 class TestGeneratePdf:
     """PDF生成エンドポイントのテスト"""
 
     @pytest.fixture
     def mock_templates_exist(self):
-        """テンプレートファイルの存在をモック"""
-        mock_path = MagicMock(spec=Path)
-        mock_path.exists.return_value = True
-        with patch("app.main.TEMPLATE_PATH", mock_path), \
-             patch("app.main.SEIYAKU_KOJIN_PATH", mock_path), \
-             patch("app.main.SEIYAKU_KANRISHA_PATH", mock_path), \
-             patch("app.main.RYAKUREKI_PATH", mock_path):
-            yield mock_path
+        """テンプレートの読み込みをモック"""
+        with patch("app.main.template_cache") as mock_cache:
+            yield mock_cache
 
     def test_generate_pdf_success(self, client, mock_templates_exist):
         """POST /api/generate-pdf が正常なデータでPDFを返す"""
@@ -191,6 +347,61 @@ class TestGeneratePdf:
             assert call_args.officePrefecture == "東京都"
             assert call_args.officeCity == "渋谷区神宮前"
 
+    def test_generate_pdf_cached(self, client, mock_templates_exist):
+        """同じ内容の2回目はキャッシュから返し、再生成しない"""
+        with patch("app.main.generate_full_application_pdf") as mock_generate:
+            mock_generate.return_value = b"%PDF-1.4 test pdf content"
+            first = client.post("/api/generate-pdf", json=VALID_INDIVIDUAL_DATA)
+            second = client.post("/api/generate-pdf", json=VALID_INDIVIDUAL_DATA)
+
+            assert first.headers["X-Cache"] == "MISS"
+            assert second.headers["X-Cache"] == "HIT"
+            assert second.content == first.content
+            mock_generate.assert_called_once()
+
+            # 内容が変われば再生成する
+            client.post("/api/generate-pdf", json=VALID_DATA_WITH_WEBSITE)
+            assert mock_generate.call_count == 2
+
+    def test_generate_pdf_overflow_fields(self, client, mock_templates_exist):
+        """欄に収まらなかった項目を X-Overflow-Fields で返す"""
+        with patch("app.main.generate_full_application_pdf") as mock_generate:
+            mock_generate.return_value = b"%PDF-1.4 test pdf content"
+            fitted = client.post("/api/generate-pdf", json=VALID_INDIVIDUAL_DATA)
+            overflowed = client.post("/api/generate-pdf", json={
+                **VALID_INDIVIDUAL_DATA, "officeSameAsAddress": False, "officePrefecture": "東京都",
+                "officeCity": "渋谷区", "officeStreet": "1-2-3" * 40, "officePhone": "03-1234-5678",
+            })
+
+        assert "X-Overflow-Fields" not in fitted.headers
+        assert overflowed.status_code == 200
+        assert overflowed.headers["X-Overflow-Fields"] == "officeStreet"
+
+    def test_generate_pdf_rejects_invalid_input(self, client, mock_templates_exist):
+        """描画が前提とする内容が不正なら生成せずに422で全てのエラーを返す（失敗件数は invalid に数える）"""
+        invalid = metrics.ERRORS.value(endpoint="generate-pdf", kind="invalid")
+        errors = metrics.ERRORS.value(endpoint="generate-pdf", kind="error")
+        with patch("app.main.generate_full_application_pdf") as mock_generate:
+            response = client.post("/api/generate-pdf", json={
+                **VALID_INDIVIDUAL_DATA, "birthEra": "edo", "phone": "03-1234",
+            })
+            mock_generate.assert_not_called()
+
+        assert response.status_code == 422
+        assert [error["field"] for error in response.json()["detail"]] == ["birthEra", "phone"]
+        assert metrics.ERRORS.value(endpoint="generate-pdf", kind="invalid") == invalid + 1
+        assert metrics.ERRORS.value(endpoint="generate-pdf", kind="error") == errors
+
+    def test_generate_pdf_template_missing(self, client, tmp_path):
+        """テンプレートが見つからない場合は500エラー（失敗件数は error に数える）"""
+        errors = metrics.ERRORS.value(endpoint="generate-pdf", kind="error")
+        with patch("app.main.TEMPLATE_PATH", tmp_path / "missing.pdf"):
+            response = client.post("/api/generate-pdf", json=VALID_INDIVIDUAL_DATA)
+
+        assert response.status_code == 500
+        assert metrics.ERRORS.value(endpoint="generate-pdf", kind="error") == errors + 1
+        assert "許可申請書テンプレートが見つかりません" in response.json()["detail"]
+
     def test_generate_pdf_missing_required_field(self, client):
         """必須フィールド欠落で422エラー"""
         invalid_data = {
@@ -214,3 +425,184 @@ class TestGeneratePdf:
         response = client.post("/api/generate-pdf", json=invalid_data)
 
         assert response.status_code == 422
+
+
+class TestCoalescing:
+    """同じ内容の同時リクエストのまとめのテスト"""
+
+    def test_concurrent_same_data_rendered_once(self, client):
+        """同時に届いた同じ内容の生成は1回だけ実行し、全員に同じPDFを返す"""
+        def slow_generate(*args, **kwargs):
+            time.sleep(0.2)
+            return b"%PDF-1.4 test pdf content"
+
+        async def main():
+            data = FormData(**VALID_INDIVIDUAL_DATA)
+            return await asyncio.gather(*(render_bundle(data) for _ in range(3)))
+
+        with patch("app.main.template_cache"), \
+                patch("app.main.generate_full_application_pdf", side_effect=slow_generate) as mock_generate:
+            results = asyncio.run(main())
+
+        assert mock_generate.call_count == 1
+        assert [pdf for pdf, _ in results] == [b"%PDF-1.4 test pdf content"] * 3
+        body = client.get("/api/metrics").text
+        assert "kobutsu_coalesced_requests_total" in body
+
+
+class TestPreview:
+    """プレビュー用配置データのテスト"""
+
+    def test_preview_pages(self, client):
+        """全書類のページごとに配置データを返す（PDFは生成しない）"""
+        with patch("app.main.generate_full_application_pdf") as mock_generate:
+            response = client.post("/api/preview", json=VALID_INDIVIDUAL_DATA)
+            mock_generate.assert_not_called()
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [p["page"] for p in body["pages"]] == [1, 2, 3, 4, 5, 6, 7]
+        assert body["pages"][0]["document"] == "shinsei"
+        assert body["page_height"] > body["page_width"]
+        assert body["overflows"] == []
+
+    def test_preview_items(self, client):
+        """フリガナは半角・1マスずつ、電話番号は分割済み"""
+        response = client.post("/api/preview", json=VALID_INDIVIDUAL_DATA)
+        items = response.json()["pages"][0]["items"]
+
+        kana = [item for item in items if item["field"] == "nameKana"]
+        assert "".join(item["text"] for item in kana) == "ﾔﾏﾀﾞﾀﾛｳ"
+        assert all(item["kind"] == "text" and item["font_size"] == 9 for item in kana)
+
+        phone = {item["field"]: item["text"] for item in items if item["field"].startswith("phone.")}
+        assert phone == {"phone.area": "03", "phone.local": "1234", "phone.number": "5678"}
+
+    def test_preview_overflows(self, client):
+        """欄に収まらなかった文字列と欄の幅を返す"""
+        response = client.post("/api/preview", json={**VALID_INDIVIDUAL_DATA, "street": "1-2-3" * 40})
+        body = response.json()
+
+        street = [o for o in body["overflows"] if o["field"] == "street"]
+        assert street == [{"page": 1, "document": "shinsei", "field": "street",
+                           "width": street[0]["width"], "max_width": 130}]
+        assert street[0]["width"] > 130
+        [item] = [item for item in body["pages"][0]["items"] if item["field"] == "street"]
+        assert item["max_width"] == 130
+
+    def test_preview_different_manager(self, client):
+        """管理者が異なる場合は8ページ"""
+        response = client.post("/api/preview", json=VALID_DATA_DIFFERENT_MANAGER)
+        assert response.status_code == 200
+        assert len(response.json()["pages"]) == 8
+
+    def test_preview_validation_error(self, client):
+        """必須項目がない場合は422"""
+        response = client.post("/api/preview", json={"applicantType": "individual"})
+        assert response.status_code == 422
+
+
+class TestValidate:
+    """入力内容の検証のテスト"""
+
+    def test_valid(self, client):
+        """有効な入力（西暦の生年を含む）"""
+        with patch("app.main.generate_full_application_pdf") as mock_generate:
+            response = client.post("/api/validate", json={
+                **VALID_INDIVIDUAL_DATA, "birthEra": "seireki", "birthYear": "1980",
+            })
+            mock_generate.assert_not_called()
+
+        assert response.status_code == 200
+        assert response.json() == {"valid": True, "errors": [], "overflows": []}
+
+    def test_errors_and_overflows(self, client):
+        """エラーと欄に収まらない文字列を返す"""
+        response = client.post("/api/validate", json={
+            **VALID_INDIVIDUAL_DATA, "representativeType": "9", "street": "1-2-3" * 40,
+        })
+        body = response.json()
+
+        assert body["valid"] is False
+        assert body["errors"] == [{"field": "representativeType",
+                                   "message": "代表者等の種別が不正です（1 / 2 / 3 のいずれか）"}]
+        assert "street" in [overflow["field"] for overflow in body["overflows"]]
+
+
+class TestPostalCode:
+    """郵便番号から住所を引くエンドポイントのテスト"""
+
+    def test_found(self, client):
+        response = client.get("/api/postal-code/150-0002")
+        assert response.status_code == 200
+        assert response.json() == {
+            "postalCode": "1500002",
+            "addresses": [{"prefecture": "東京都", "city": "渋谷区", "town": "渋谷"}],
+        }
+
+    def test_not_found(self, client):
+        assert client.get("/api/postal-code/9999999").status_code == 404
+
+    def test_invalid(self, client):
+        assert client.get("/api/postal-code/150-000").status_code == 422
+
+    def test_index_missing(self, client, tmp_path):
+        """索引がなければ503"""
+        with patch("app.postal.postal_index", PostalIndex(tmp_path / "missing.idx")):
+            response = client.get("/api/postal-code/1500002")
+        assert response.status_code == 503
+
+    def test_index_status_in_metrics(self, client, tmp_path):
+        """索引のレコード数と、KOBUTSU_POSTAL_MIN_RECORDS 件以上あるかを /api/metrics に出す"""
+        body = client.get("/api/metrics").text
+        assert re.search(r"^kobutsu_postal_index_records [1-9]\d*$", body, re.MULTILINE)
+        assert re.search(r"^kobutsu_postal_index_ready 1$", body, re.MULTILINE)
+
+        with patch("app.main.config.POSTAL_MIN_RECORDS", 100000):
+            body = client.get("/api/metrics").text
+        assert re.search(r"^kobutsu_postal_index_ready 0$", body, re.MULTILINE)
+
+        with patch("app.postal.postal_index", PostalIndex(tmp_path / "missing.idx")):
+            body = client.get("/api/metrics").text
+        assert re.search(r"^kobutsu_postal_index_records 0$", body, re.MULTILINE)
+        assert re.search(r"^kobutsu_postal_index_ready 0$", body, re.MULTILINE)
+
+
+class TestGenerateBatch:
+    """一括生成エンドポイントのテスト"""
+
+    def test_generate_batch(self, client):
+        """全件のPDFと manifest.json を含むZIPを返す"""
+        records = [VALID_INDIVIDUAL_DATA, VALID_CORPORATION_DATA, {"applicantType": "individual"}]
+        observed = metrics.REQUEST_SECONDS.count(endpoint="generate-batch")
+        with patch("app.main.template_cache"), \
+                patch("app.main.generate_full_application_pdf") as mock_generate:
+            mock_generate.return_value = b"%PDF-1.4 test pdf content"
+            response = client.post("/api/generate-batch", json={"records": records})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        manifest = json.loads(archive.read("manifest.json"))
+        assert manifest["succeeded"] == 2
+        assert manifest["failed"] == 1
+        assert archive.read("001_山田_太郎.pdf") == b"%PDF-1.4 test pdf content"
+        assert mock_generate.call_count == 2
+        # 処理時間は ZIP を送り終えてから記録する
+        assert metrics.REQUEST_SECONDS.count(endpoint="generate-batch") == observed + 1
+
+    def test_generate_batch_too_many(self, client):
+        """上限を超えるレコード数は413エラー"""
+        with patch("app.main.config.BATCH_MAX_RECORDS", 1):
+            response = client.post(
+                "/api/generate-batch",
+                json={"records": [VALID_INDIVIDUAL_DATA, VALID_INDIVIDUAL_DATA]},
+            )
+        assert response.status_code == 413
+
+    def test_generate_batch_empty(self, client):
+        """レコードがない場合は422エラー"""
+        errors = metrics.ERRORS.value(endpoint="generate-batch", kind="invalid")
+        response = client.post("/api/generate-batch", json={"records": []})
+        assert response.status_code == 422
+        assert metrics.ERRORS.value(endpoint="generate-batch", kind="invalid") == errors + 1
@@ -0,0 +1,186 @@
+"""一括生成（ZIPのストリーミング）のテスト"""
+
+import asyncio
+import io
+import json
+import zipfile
+from unittest.mock import patch
+
+from app import layout
+from app.batch import MANIFEST_NAME, ZipSink, entry_filename, parse_record, stream_zip
+from app.postal import PostalIndex
+from app.schemas import FormData
+
+
+RECORD = {
+    "applicantType": "individual",
+    "lastNameKanji": "山田",
+    "firstNameKanji": "太郎",
+    "lastNameKana": "ヤマダ",
+    "firstNameKana": "タロウ",
+    "birthEra": "heisei",
+    "birthYear": "5",
+    "birthMonth": "3",
+    "birthDay": "15",
+    "prefecture": "東京都",
+    "city": "渋谷区",
+    "street": "1-2-3",
+    "phone": "03-1234-5678",
+    "officeNameKana": "ヤマダショウテン",
+    "officeNameKanji": "山田商店",
+    "submissionPrefecture": "東京都",
+}
+
+
+def collect(records, render, concurrency=2):
+    """ストリームを最後まで読み、(チャンクのリスト, ZIP) を返す"""
+    async def run():
+        return [chunk async for chunk in stream_zip(records, render, concurrency)]
+
+    chunks = asyncio.run(run())
+    return chunks, zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+
+async def fake_render(data: FormData, plan):
+    if data.city == "失敗市":
+        raise RuntimeError("生成エラー")
+    await asyncio.sleep(0)
+    return f"%PDF-1.4 {data.lastNameKanji}".encode('utf-8'), False
+
+
+class TestZipSink:
+    """ZipSinkのテスト"""
+
+    def test_unseekable(self):
+        """シークできないストリームとして扱われ、書いた内容を drain で取り出せる"""
+        sink = ZipSink()
+        with zipfile.ZipFile(sink, mode='w') as archive:
+            archive.writestr('a.txt', b'hello')
+        data = sink.drain()
+        assert sink.drain() == b''
+        assert zipfile.ZipFile(io.BytesIO(data)).read('a.txt') == b'hello'
+
+
+class TestStreamZip:
+    """stream_zipのテスト"""
+
+    def test_all_records(self):
+        """全件のPDFとマニフェストを含むZIPを返す"""
+        records = [
+            {**RECORD, "lastNameKanji": "山田"},
+            {**RECORD, "lastNameKanji": "鈴木"},
+            {**RECORD, "lastNameKanji": "佐藤"},
+        ]
+        chunks, archive = collect(records, fake_render)
+
+        assert len(chunks) > 1  # 生成が終わるたびに送り出している
+        assert archive.read('001_山田_太郎.pdf') == "%PDF-1.4 山田".encode('utf-8')
+        assert archive.read('002_鈴木_太郎.pdf') == "%PDF-1.4 鈴木".encode('utf-8')
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        assert manifest['total'] == 3
+        assert manifest['succeeded'] == 3
+        assert [entry['index'] for entry in manifest['records']] == [0, 1, 2]
+
+    def test_failures_in_manifest(self):
+        """入力の不正・生成エラーはマニフェストに記録し、残りは生成する"""
+        records = [
+            RECORD,
+            {**RECORD, "city": "失敗市"},
+            {"applicantType": "individual"},
+            {**RECORD, "birthEra": "edo"},
+        ]
+        _, archive = collect(records, fake_render)
+
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        assert manifest['succeeded'] == 1
+        assert manifest['failed'] == 3
+        ok, render_error, invalid, rejected = manifest['records']
+        assert ok['status'] == 'ok'
+        assert ok['filename'] in archive.namelist()
+        assert ok['overflows'] == []
+        assert render_error == {'index': 1, 'status': 'error', 'error': '生成エラー'}
+        assert invalid['status'] == 'error'
+        assert 'lastNameKanji' in invalid['error']
+        assert rejected['status'] == 'error' and rejected['error'].startswith('birthEra: ')
+        assert sorted(archive.namelist()) == sorted([ok['filename'], MANIFEST_NAME])
+
+    def test_concurrency_limit(self):
+        """同時に生成する件数は concurrency までに抑える"""
+        running = 0
+        peak = 0
+
+        async def render(data, plan):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return b'%PDF', False
+
+        collect([RECORD] * 6, render, concurrency=2)
+        assert peak == 2
+
+    def test_plan_once_per_record(self, monkeypatch):
+        """レイアウトプランはレコードごとに1回だけ作り、生成にも渡す"""
+        planned = []
+        plan_bundle = layout.plan_bundle
+
+        def counting_plan_bundle(data, *args, **kwargs):
+            plan = plan_bundle(data, *args, **kwargs)
+            planned.append(plan)
+            return plan
+
+        received = []
+
+        async def render(data, plan):
+            received.append(plan)
+            return b'%PDF', False
+
+        monkeypatch.setattr(layout, 'plan_bundle', counting_plan_bundle)
+        collect([RECORD] * 3, render)
+        assert len(planned) == 3
+        assert all(any(plan is p for p in planned) for plan in received)
+
+
+class TestParseRecord:
+    """parse_recordのテスト"""
+
+    def test_fill_from_postal_code(self):
+        """郵便番号があれば省略・空の都道府県・市区町村を埋める"""
+        record = {key: value for key, value in RECORD.items() if key not in ("prefecture", "city")}
+        data = parse_record({**record, "postalCode": "150-0002", "city": ""})
+        assert (data.prefecture, data.city, data.street) == ("東京都", "渋谷区", "1-2-3")
+
+    def test_street_required(self):
+        """番地は埋めないので、省略・空は API と同じく入力エラー"""
+        record = {key: value for key, value in RECORD.items() if key != "street"}
+        _, archive = collect([{**record, "postalCode": "150-0002"},
+                              {**RECORD, "postalCode": "150-0002", "street": ""}], fake_render)
+        missing, empty = json.loads(archive.read(MANIFEST_NAME))['records']
+        assert missing['status'] == 'error' and missing['error'].startswith('street: ')
+        assert empty['status'] == 'error' and empty['error'].startswith('street: ')
+
+    def test_keep_entered_address(self):
+        """入力済みの住所はそのまま（索引も引かない）"""
+        with patch("app.postal.postal_index", PostalIndex("/nonexistent/postal.idx")):
+            data = parse_record({**RECORD, "postalCode": "150-0002"})
+        assert (data.prefecture, data.city, data.street) == ("東京都", "渋谷区", "1-2-3")
+
+    def test_index_missing_in_manifest(self):
+        """住所を埋める必要があるのに索引がなければ、そのレコードを失敗として記録する"""
+        with patch("app.postal.postal_index", PostalIndex("/nonexistent/postal.idx")):
+            _, archive = collect([{**RECORD, "postalCode": "1500002", "city": ""}, RECORD], fake_render)
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        failed, ok = manifest['records']
+        assert failed['status'] == 'error'
+        assert failed['error'].startswith('郵便番号から住所を埋められません')
+        assert ok['status'] == 'ok'
+
+
+class TestEntryFilename:
+    """entry_filenameのテスト"""
+
+    def test_unsafe_characters(self):
+        """パス区切りなどの文字は置き換える"""
+        data = FormData(**{**RECORD, "lastNameKanji": "山/田", "firstNameKanji": "太..郎"})
+        assert entry_filename(9, data) == "010_山_田_太..郎.pdf"
@@ -0,0 +1,105 @@
+"""一括生成コマンドのテスト"""
+
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.cli import main, read_records, run
+
+
+RECORD = {
+    "applicantType": "individual",
+    "lastNameKanji": "山田",
+    "firstNameKanji": "太郎",
+    "lastNameKana": "ヤマダ",
+    "firstNameKana": "タロウ",
+    "birthEra": "heisei",
+    "birthYear": "5",
+    "birthMonth": "3",
+    "birthDay": "15",
+    "prefecture": "東京都",
+    "city": "渋谷区",
+    "street": "1-2-3",
+    "phone": "03-1234-5678",
+    "officeNameKana": "ヤマダショウテン",
+    "officeNameKanji": "山田商店",
+    "submissionPrefecture": "東京都",
+}
+
+
+@pytest.fixture
+def mock_render():
+    """フォント・テンプレートの読み込みとPDF生成をモック"""
+    def write(path):
+        path.write_bytes(b"%PDF-1.4 test pdf content")
+
+    with patch("app.cli.init_worker"), \
+            patch("app.cli.build_full_application_pdf") as mock_build:
+        mock_build.return_value.write.side_effect = write
+        yield mock_build
+
+
+class TestReadRecords:
+    """入力ファイルの読み込みのテスト"""
+
+    def test_jsonl(self, tmp_path):
+        """1行1件で読み、読めない行は行番号付きのエラーにする"""
+        path = tmp_path / "records.jsonl"
+        path.write_text(json.dumps(RECORD) + "\n\nnot json\n[1]\n", encoding="utf-8")
+
+        records = read_records(path)
+        assert records[0] == RECORD
+        assert records[1][0] == 3
+        assert records[2] == (4, "JSONのオブジェクトではありません")
+
+    def test_csv(self, tmp_path):
+        """空欄は未入力とし、職歴の列はJSONとして読む"""
+        path = tmp_path / "records.csv"
+        path.write_text(
+            "lastNameKanji,officeSameAsAddress,postalCode,careerHistory\n"
+            '山田,false,,"[{""year"": ""2020"", ""month"": ""4"", ""content"": ""入社""}]"\n',
+            encoding="utf-8",
+        )
+
+        [record] = read_records(path)
+        assert record == {
+            "lastNameKanji": "山田",
+            "officeSameAsAddress": "false",
+            "careerHistory": [{"year": "2020", "month": "4", "content": "入社"}],
+        }
+
+
+class TestRun:
+    """runのテスト"""
+
+    def test_writes_bundles_and_manifest(self, tmp_path, mock_render):
+        """レコードごとのPDFと manifest.json を書き、失敗は記録して続ける"""
+        records = [RECORD, {"applicantType": "individual"}, (3, "JSONとして読めません")]
+        manifest = run(records, tmp_path, jobs=1, progress=io.StringIO())
+
+        assert (tmp_path / "001_山田_太郎.pdf").read_bytes() == b"%PDF-1.4 test pdf content"
+        assert manifest["succeeded"] == 1
+        assert manifest["failed"] == 2
+        assert manifest["records"][0]["bytes"] == len(b"%PDF-1.4 test pdf content")
+        assert json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8")) == manifest
+        assert manifest["records"][2]["error"] == "3行目: JSONとして読めません"
+
+    def test_fill_address_from_postal_code(self, tmp_path, mock_render):
+        """CSV で住所の欄が空欄でも、郵便番号があれば埋めて生成する"""
+        record = {key: value for key, value in RECORD.items() if key not in ("prefecture", "city")}
+        manifest = run([{**record, "postalCode": "1500002"}], tmp_path, jobs=1, progress=io.StringIO())
+
+        assert manifest["succeeded"] == 1
+        data = mock_render.call_args.args[0]
+        assert (data.prefecture, data.city, data.street) == ("東京都", "渋谷区", "1-2-3")
+
+    def test_main_exit_code(self, tmp_path, mock_render):
+        """失敗があれば終了コード1"""
+        path = tmp_path / "records.jsonl"
+        path.write_text(json.dumps(RECORD) + "\n", encoding="utf-8")
+        assert main([str(path), "--out", str(tmp_path / "out"), "--jobs", "1"]) == 0
+
+        path.write_text(json.dumps(RECORD) + "\nbroken\n", encoding="utf-8")
+        assert main([str(path), "--out", str(tmp_path / "out"), "--jobs", "1"]) == 1
@@ -0,0 +1,281 @@
+"""オーバーレイの直接書き出しのテスト"""
+
+import io
+import re
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream
+
+from app import config, layout
+from app.direct_overlay import PageCache, add_overlay_forms, page_cache
+from app.pdf_generator import FONT_PATHS, generate_full_application_pdf, register_font
+from app.schemas import FormData
+
+
+TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
+
+
+def overlay_forms(pdf: bytes) -> list:
+    """各ページに最後に重ねたオーバーレイの Form XObject（申請書は固定マークの後に重ねる）"""
+    forms = []
+    for page in PdfReader(io.BytesIO(pdf)).pages:
+        xobjects = page["/Resources"]["/XObject"]
+        names = sorted(name for name in xobjects if name.startswith("/KobutsuOverlay"))
+        forms.append(xobjects[names[-1]].get_object())
+    return forms
+
+
+def font_tables(form) -> dict:
+    """フォントのリソース名 -> (文字コードのバイト数, 文字コード -> 文字, 文字コード -> 幅)"""
+    tables = {}
+    for name, font in form["/Resources"]["/Font"].items():
+        font = font.get_object()
+        if "/ToUnicode" not in font:
+            continue
+        cmap = font["/ToUnicode"].get_object().get_data().decode("latin-1")
+        if font["/Subtype"] == "/Type0":
+            # Identity-H（2バイト）。幅は CIDFont の /W（[先頭 [幅 ...]] の並び）
+            size = 2
+            cid_font = font["/DescendantFonts"][0].get_object()
+            widths = {}
+            w = list(cid_font["/W"])
+            for first, run in zip(w[::2], w[1::2]):
+                widths.update((first + i, float(v)) for i, v in enumerate(run))
+        else:
+            size = 1
+            widths = {font["/FirstChar"] + i: float(w) for i, w in enumerate(font["/Widths"])}
+        pattern = r"<([0-9A-Fa-f]{%d})> <([0-9A-Fa-f]{4})>" % (size * 2)
+        chars = {int(code, 16): chr(int(uni, 16)) for code, uni in re.findall(pattern, cmap)}
+        tables[name] = (size, chars, widths)
+    return tables
+
+
+def drawn(form) -> tuple[list, list]:
+    """Form XObject が描く文字（文字, x, y, サイズ）と線（線幅, パス）を描画順に依らない形で返す"""
+    tables = font_tables(form)
+    glyphs, paths = [], []
+    line_width = 1.0
+    path = []
+    font = size = None
+    tx = ty = lx = ly = 0.0
+    for operands, operator in ContentStream(form, None).operations:
+        op = operator.decode()
+        if op == "BT":
+            tx = ty = lx = ly = 0.0
+        elif op == "Tm":
+            tx = lx = float(operands[4])
+            ty = ly = float(operands[5])
+        elif op == "Td":
+            lx += float(operands[0])
+            ly += float(operands[1])
+            tx, ty = lx, ly
+        elif op == "Tf":
+            font, size = tables.get(operands[0]), float(operands[1])
+        elif op == "Tj":
+            data = operands[0]
+            data = data.original_bytes if hasattr(data, "original_bytes") else bytes(data)
+            size_bytes, chars, widths = font
+            for i in range(0, len(data), size_bytes):
+                code = int.from_bytes(data[i:i + size_bytes], "big")
+                glyphs.append((chars.get(code), round(tx, 3), round(ty, 3), size))
+                tx += widths[code] * size / 1000
+        elif op == "w":
+            line_width = float(operands[0])
+        elif op in ("m", "l", "c"):
+            path.append((op, *(round(float(v), 3) for v in operands)))
+        elif op == "S":
+            paths.append((line_width, tuple(path)))
+            path = []
+    return sorted(glyphs, key=repr), sorted(paths)
+
+
+@pytest.fixture
+def template_paths():
+    """全書類PDFのテンプレートのパス（テンプレート・フォントがない場合はスキップ）"""
+    if not (TEMPLATE_DIR / "template.pdf").exists():
+        pytest.skip("テンプレートPDFが見つかりません")
+    if not any(Path(p).exists() for p in FONT_PATHS):
+        pytest.skip("日本語フォントが見つかりません")
+    return [
+        str(TEMPLATE_DIR / "template.pdf"),
+        str(TEMPLATE_DIR / "r07_01_kobutsu_seiyakusho_kojin.pdf"),
+        str(TEMPLATE_DIR / "r07_03_kobutsu_seiyakusho_kanrisha.pdf"),
+        str(TEMPLATE_DIR / "r02_ryakurekisyo.pdf"),
+    ]
+
+
+@pytest.fixture
+def form_data():
+    return FormData(
+        applicantType="individual",
+        lastNameKanji="山田",
+        firstNameKanji="太郎",
+        lastNameKana="ヤマダ",
+        firstNameKana="タロウ",
+        birthEra="heisei",
+        birthYear="5",
+        birthMonth="3",
+        birthDay="15",
+        prefecture="東京都",
+        city="渋谷区",
+        street="1-2-3",
+        phone="03-1234-5678",
+        officeSameAsAddress=True,
+        officeNameKana="ヤマダショウテン",
+        officeNameKanji="山田商店",
+        managerSameAsApplicant=False,
+        managerLastNameKanji="鈴木",
+        managerFirstNameKanji="花子",
+        managerLastNameKana="スズキ",
+        managerFirstNameKana="ハナコ",
+        managerBirthEra="showa",
+        managerBirthYear="60",
+        managerBirthMonth="7",
+        managerBirthDay="25",
+        hasWebsite=True,
+        websiteUrl="https://example.jp/shop_01",
+        submissionPrefecture="東京都",
+    )
+
+
+class TestDirectBackend:
+    """reportlab を使わないオーバーレイの書き出しのテスト"""
+
+    def test_same_drawing_as_reportlab(self, form_data, template_paths):
+        """全ページで reportlab と同じ位置・サイズに同じ文字と線を描く"""
+        expected = generate_full_application_pdf(form_data, *template_paths, overlay_backend="reportlab")
+        result = generate_full_application_pdf(form_data, *template_paths, overlay_backend="direct")
+
+        expected_forms = overlay_forms(expected)
+        result_forms = overlay_forms(result)
+        assert len(result_forms) == len(expected_forms) == 8
+        glyph_count = 0
+        for expected_form, result_form in zip(expected_forms, result_forms):
+            glyphs, paths = drawn(result_form)
+            assert (glyphs, paths) == drawn(expected_form)
+            glyph_count += len(glyphs)
+        assert glyph_count > 0
+
+    def test_text_extractable(self, form_data, template_paths):
+        """ToUnicode から文字列を取り出せる"""
+        result = generate_full_application_pdf(form_data, *template_paths, overlay_backend="direct")
+        assert "1-2-3" in PdfReader(io.BytesIO(result)).pages[0].extract_text()
+
+    def test_deterministic(self, form_data, template_paths):
+        """再現モードでは同じ入力から同じバイト列を生成する"""
+        first = generate_full_application_pdf(
+            form_data, *template_paths, deterministic=True, overlay_backend="direct")
+        second = generate_full_application_pdf(
+            form_data, *template_paths, deterministic=True, overlay_backend="direct")
+        assert first == second
+
+    def test_unknown_backend(self, form_data, template_paths):
+        """不明な書き出し方はエラー"""
+        with pytest.raises(ValueError):
+            generate_full_application_pdf(form_data, *template_paths, overlay_backend="unknown")
+
+
+class TestAddOverlayForms:
+    """add_overlay_formsのテスト"""
+
+    def test_one_text_object_per_font_size(self, form_data, template_paths):
+        """文字列はページごと・フォントサイズごとに1つのテキストオブジェクトにまとめる"""
+        register_font()
+        plan = layout.plan_bundle(form_data)
+        forms = add_overlay_forms(PdfWriter(), plan)
+
+        for planned, form in zip(plan, forms):
+            sizes = {op.font_size for op in planned.ops
+                     if op.kind in ("text", "right_text") and op.text}
+            assert form.get_object().get_data().count(b"BT") == len(sizes)
+
+    def test_fonts_shared(self, form_data, template_paths):
+        """フォントのリソースは全ページで共有する"""
+        register_font()
+        forms = add_overlay_forms(PdfWriter(), layout.plan_bundle(form_data))
+        resources = {form.get_object().raw_get("/Resources").idnum for form in forms}
+        assert len(resources) == 1
+
+
+class TestPageCache:
+    """ページ単位のキャッシュのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def clear_page_cache(self):
+        page_cache.clear()
+        yield
+        page_cache.clear()
+
+    def test_only_changed_page_rendered(self, form_data, template_paths):
+        """ホームページのURLだけを変えると、描き直すのは申請書その4だけ"""
+        generate_full_application_pdf(form_data, *template_paths, overlay_backend="direct")
+        assert page_cache.stats()["misses"] == 8
+
+        changed = form_data.model_copy(update={"websiteUrl": "https://example.jp/shop_02"})
+        generate_full_application_pdf(changed, *template_paths, overlay_backend="direct")
+        stats = page_cache.stats()
+        assert stats["misses"] == 9
+        assert stats["hits"] == 7
+
+        changed_keys = {layout.page_key(p) for p in layout.plan_bundle(changed)}
+        original_keys = {layout.page_key(p) for p in layout.plan_bundle(form_data)}
+        assert len(changed_keys - original_keys) == 1
+
+    def test_cached_pages_same_output(self, form_data, template_paths):
+        """キャッシュしたページから組み立てても、全て描いた場合と同じバイト列になる"""
+        other = form_data.model_copy(update={"websiteUrl": "https://example.jp/other"})
+        generate_full_application_pdf(other, *template_paths, overlay_backend="direct")
+        cached = generate_full_application_pdf(
+            form_data, *template_paths, deterministic=True, overlay_backend="direct")
+        assert page_cache.stats()["hits"] == 7
+
+        page_cache.clear()
+        fresh = generate_full_application_pdf(
+            form_data, *template_paths, deterministic=True, overlay_backend="direct")
+        assert page_cache.stats()["hits"] == 0
+        assert cached == fresh
+
+    def test_font_covers_all_pages(self, form_data, template_paths):
+        """キャッシュしたページの文字もフォントのサブセットに含める"""
+        generate_full_application_pdf(form_data, *template_paths, overlay_backend="direct")
+        changed = form_data.model_copy(update={"websiteUrl": "https://example.jp/xyz"})
+        result = generate_full_application_pdf(changed, *template_paths, overlay_backend="direct")
+
+        forms = overlay_forms(result)
+        for form in forms:
+            glyphs, _ = drawn(form)
+            assert all(char is not None for char, *_ in glyphs)
+        assert {"x", "y", "z"} <= {char for char, *_ in drawn(forms[3])[0]}
+
+    def test_hits_with_default_backend(self, form_data, template_paths):
+        """既定の設定（書き出し方を指定しない）でもページのキャッシュを使い、URLだけの変更は1ページだけ描き直す"""
+        assert config.OVERLAY_BACKEND == "direct"
+        generate_full_application_pdf(form_data, *template_paths)
+        changed = form_data.model_copy(update={"websiteUrl": "https://example.jp/shop_02"})
+        generate_full_application_pdf(changed, *template_paths)
+        assert page_cache.stats()["hits"] == 7
+        assert page_cache.stats()["misses"] == 9
+
+    def test_lru_eviction(self, form_data, template_paths):
+        """上限を超えたら古いページから捨てる"""
+        register_font()
+        cache = PageCache(max_entries=2)
+        plan = layout.plan_bundle(form_data)
+        for planned in plan[:3]:
+            cache.get(planned)
+        assert cache.stats()["entries"] == 2
+
+        cache.get(plan[0])
+        assert cache.stats()["hits"] == 0
+        cache.get(plan[2])
+        assert cache.stats()["hits"] == 1
+
+    def test_disabled(self, form_data, template_paths):
+        """上限0ではキャッシュしない"""
+        register_font()
+        cache = PageCache(max_entries=0)
+        planned = layout.plan_bundle(form_data)[0]
+        assert cache.get(planned) == cache.get(planned)
+        assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0}
@@ -0,0 +1,166 @@
+"""実行バックエンドのテスト"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from app.executor import RenderExecutor
+
+
+def add(a, b):
+    return a + b
+
+
+def wait_until_idle(executor, timeout=5):
+    """完了コールバックの反映を待つ"""
+    deadline = time.monotonic() + timeout
+    while executor.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestRenderExecutor:
+    """RenderExecutorのテスト"""
+
+    def test_run_returns_result(self):
+        """プールで実行した結果を await で受け取れる"""
+        executor = RenderExecutor('thread', max_workers=2)
+        try:
+            result = asyncio.run(executor.run(add, 1, b=2))
+            assert result == 3
+            wait_until_idle(executor)
+            assert executor.stats()['in_flight'] == 0
+            assert executor.stats()['queue_depth'] == 0
+        finally:
+            executor.shutdown()
+
+    def test_process_backend(self):
+        """プロセスプールでも実行できる"""
+        executor = RenderExecutor('process', max_workers=1)
+        try:
+            assert asyncio.run(executor.run(add, 2, 3)) == 5
+        finally:
+            executor.shutdown()
+
+    def test_unknown_backend(self):
+        """不明なバックエンドはエラー"""
+        with pytest.raises(ValueError):
+            RenderExecutor('gpu')
+
+    def test_queue_depth_and_in_flight(self):
+        """上限を超えた処理は順番待ちとして数えられる"""
+        executor = RenderExecutor('thread', max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        try:
+            first = executor.submit(blocking)
+            second = executor.submit(add, 1, 1)
+            assert started.wait(5)
+            assert executor.in_flight == 1
+            assert executor.queue_depth == 1
+
+            release.set()
+            assert first.result(5) == 'done'
+            assert second.result(5) == 2
+            wait_until_idle(executor)
+            assert executor.in_flight == 0
+            assert executor.queue_depth == 0
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+def record_pid(path):
+    with open(path, 'a') as f:
+        f.write(f'{os.getpid()}\n')
+
+
+def fail_to_initialize():
+    raise RuntimeError('フォントなし')
+
+
+class TestStartWorkers:
+    """start_workersのテスト"""
+
+    def test_every_process_initialized(self, tmp_path):
+        """全てのワーカープロセスが初期化処理を1回ずつ実行してから戻る"""
+        path = tmp_path / 'pids'
+        executor = RenderExecutor('process', max_workers=3)
+        executor.set_initializer(record_pid, str(path))
+        try:
+            asyncio.run(executor.start_workers(timeout=30))
+            pids = path.read_text().split()
+            assert len(pids) == 3
+            assert len(set(pids)) == 3
+        finally:
+            executor.shutdown()
+
+    def test_idle_worker_not_reused(self, tmp_path, monkeypatch):
+        """先に投入した処理が終わってワーカーが空いても、全てのワーカープロセスを起動する
+
+        spawn ではプロセスを必要になった時に1つずつ起動し、空いたワーカーがあれば使い回す。
+        """
+        path = tmp_path / 'pids'
+        executor = RenderExecutor('process', max_workers=3, mp_context=multiprocessing.get_context('spawn'))
+        executor.set_initializer(record_pid, str(path))
+        submit = executor.submit
+
+        def slow_submit(*args, **kwargs):
+            future = submit(*args, **kwargs)
+            concurrent.futures.wait([future], timeout=2)  # 投入した処理がすぐ終わるならワーカーが空く
+            return future
+
+        monkeypatch.setattr(executor, 'submit', slow_submit)
+        try:
+            asyncio.run(executor.start_workers(timeout=10))
+            assert len(set(path.read_text().split())) == 3
+        finally:
+            executor.shutdown()
+
+    def test_initializer_failure(self):
+        """初期化に失敗したら例外になるが、プールは使える"""
+        executor = RenderExecutor('process', max_workers=1)
+        executor.set_initializer(fail_to_initialize)
+        try:
+            with pytest.raises(RuntimeError, match='フォントなし'):
+                asyncio.run(executor.start_workers(timeout=30))
+            assert asyncio.run(executor.run(add, 1, 2)) == 3
+        finally:
+            executor.shutdown()
+
+    def test_set_initializer_after_pool_created(self, tmp_path):
+        """プロセスプールの作成後は設定できず、shutdown した後に設定すれば次のプールで初期化する"""
+        path = tmp_path / 'pids'
+        executor = RenderExecutor('process', max_workers=1)
+        try:
+            assert asyncio.run(executor.run(add, 1, 2)) == 3
+            with pytest.raises(RuntimeError):
+                executor.set_initializer(record_pid, str(path))
+
+            executor.shutdown()
+            executor.set_initializer(record_pid, str(path))
+            asyncio.run(executor.start_workers(timeout=30))
+            assert len(path.read_text().split()) == 1
+        finally:
+            executor.shutdown()
+
+    def test_thread_backend_runs_once(self):
+        """スレッドプールでは初期化処理を1回だけ実行する"""
+        calls = []
+        executor = RenderExecutor('thread', max_workers=4)
+        executor.set_initializer(calls.append, 'warm')
+        try:
+            asyncio.run(executor.start_workers())
+            assert calls == ['warm']
+        finally:
+            executor.shutdown()
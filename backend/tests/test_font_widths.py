@@ -0,0 +1,97 @@
+"""文字幅の表のテスト"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import reportlab
+
+from app import config, text_shaping
+from app.font_widths import build, compress, expand, load, main
+
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# reportlab に同梱のプロポーショナルなフォント（作成元の記録・等幅でないフォントの拒否の確認に使う）
+VERA_PATH = Path(reportlab.__file__).parent / "fonts" / "Vera.ttf"
+
+# IPAゴシックの既知の幅（等幅: 半角500・全角1000）
+IPAGOTHIC_WIDTHS = {"A": 500, "1": 500, " ": 500, "ｱ": 500, "ﾞ": 500, "あ": 1000, "ア": 1000, "東": 1000, "１": 1000}
+
+
+class TestFontWidths:
+    """font_widthsのテスト"""
+
+    def test_compress(self):
+        """同じ幅が続く文字コードを1つの範囲にまとめ、expand で元に戻る"""
+        widths = {0x41: 500.0, 0x42: 500.0, 0x43: 600.0, 0x45: 600.0}
+        ranges = compress(widths)
+        assert ranges == [[0x41, 0x42, 500.0], [0x43, 0x43, 600.0], [0x45, 0x45, 600.0]]
+        assert expand(ranges) == widths
+
+    def test_invalid_table(self, tmp_path):
+        """形式が不正な表は ValueError"""
+        path = tmp_path / "widths.json"
+        path.write_text('{"IPAGothic": {"ranges": []}}', encoding="utf-8")
+        with pytest.raises(ValueError):
+            load(path)
+
+    def test_build_records_source(self):
+        """作成元のフォントのファイル名・名前・ハッシュを記録する"""
+        import hashlib
+
+        source = build(str(VERA_PATH))["source"]
+        assert source == {
+            "file": "Vera.ttf",
+            "face": "BitstreamVeraSans-Roman",
+            "sha256": hashlib.sha256(VERA_PATH.read_bytes()).hexdigest(),
+        }
+
+    def test_rejects_proportional_font(self, tmp_path, capsys):
+        """等幅でないフォント（IPAexゴシックなど）からは表を作らない"""
+        out = tmp_path / "font_widths.json"
+        assert main([str(VERA_PATH), "--out", str(out)]) == 1
+        assert not out.exists()
+        assert "等幅のフォントではありません" in capsys.readouterr().err
+
+    def test_known_widths(self, monkeypatch):
+        """フォントを登録していないプロセスの幅は IPAゴシックの幅（同梱の表があれば表、なければ規則）"""
+        monkeypatch.setattr(text_shaping, "registered_widths", lambda font_name: None)
+        text_shaping.clear_width_cache()
+        try:
+            for char, width in IPAGOTHIC_WIDTHS.items():
+                assert text_shaping.text_width(char) == width, char
+        finally:
+            text_shaping.clear_width_cache()
+
+    def test_shipped_table_from_ipagothic(self):
+        """同梱の表は IPAゴシック（等幅）から作ったもの"""
+        if not config.FONT_WIDTHS_PATH.exists():
+            pytest.skip("文字幅の表がありません（IPAゴシックの幅の規則で代用）")
+        table = json.loads(config.FONT_WIDTHS_PATH.read_text(encoding="utf-8"))[text_shaping.FONT_NAME]
+        assert table["source"]["face"] == "IPAGothic"
+        assert len(table["source"]["sha256"]) == 64
+
+    def test_layout_without_reportlab_fonts(self):
+        """レイアウト・入力チェックの文字幅は reportlab のフォント（TTF の解析・登録）を読み込まない"""
+        code = (
+            "import sys\n"
+            "from app import text_shaping, validation\n"
+            "text_shaping.string_width('東京都渋谷区1-2-3', 10)\n"
+            "assert 'reportlab.pdfbase.pdfmetrics' not in sys.modules\n"
+            "assert 'reportlab.pdfbase.ttfonts' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, check=True)
+
+    def test_missing_table_fallback(self, tmp_path, monkeypatch):
+        """フォントが未登録で表もなければ IPAゴシックの幅の規則で代用する"""
+        monkeypatch.setattr(config, "FONT_WIDTHS_PATH", tmp_path / "missing.json")
+        monkeypatch.setattr(text_shaping, "registered_widths", lambda font_name: None)
+        text_shaping.width_table.cache_clear()
+        try:
+            assert text_shaping.width_table() == (
+                text_shaping.FALLBACK_WIDTHS, text_shaping.FALLBACK_DEFAULT_WIDTH)
+        finally:
+            text_shaping.width_table.cache_clear()
@@ -0,0 +1,274 @@
+"""レイアウトプランのテスト"""
+
+from datetime import date
+
+import pytest
+
+from app import coordinates as coord
+from app.layout import (
+    MIN_FONT_SIZE,
+    Circle,
+    Ellipse,
+    Line,
+    RightText,
+    Text,
+    calculate_age,
+    find_overflows,
+    fitted_text,
+    overflow_fields,
+    page_key,
+    plan_bundle,
+    plan_ryakurekisyo_page,
+    plan_shinsei_pages,
+    plan_shinsei_static_marks,
+)
+from app.schemas import CareerEntry, FormData
+from app.text_shaping import string_width
+
+
+@pytest.fixture
+def form_data():
+    """有効なフォームデータを返すフィクスチャ"""
+    return FormData(
+        applicantType="individual",
+        lastNameKanji="山田",
+        firstNameKanji="太郎",
+        lastNameKana="ヤマダ",
+        firstNameKana="タロウ",
+        birthEra="heisei",
+        birthYear="5",
+        birthMonth="3",
+        birthDay="15",
+        prefecture="東京都",
+        city="渋谷区",
+        street="1-2-3",
+        phone="03-1234-5678",
+        officeSameAsAddress=True,
+        officeNameKana="ヤマダショウテン",
+        officeNameKanji="山田商店",
+        managerSameAsApplicant=True,
+        hasWebsite=False,
+        submissionPrefecture="東京都",
+    )
+
+
+def texts(ops, field):
+    """field の文字列だけを取り出す"""
+    return [op.text for op in ops if isinstance(op, (Text, RightText)) and op.field == field]
+
+
+class TestPlanBundle:
+    """全書類のプランのテスト"""
+
+    def test_page_order_same_manager(self, form_data):
+        """管理者が同一の場合は7ページ（管理者用略歴書なし）"""
+        pages = plan_bundle(form_data)
+        assert [(p.document, p.index) for p in pages] == [
+            ('shinsei', 0), ('shinsei', 1), ('shinsei', 2), ('shinsei', 3),
+            ('seiyaku_kojin', 0), ('ryakureki', 0), ('seiyaku_kanrisha', 0),
+        ]
+
+    def test_page_order_different_manager(self, form_data):
+        """管理者が異なる場合は管理者用略歴書が8ページ目に付く"""
+        data = form_data.model_copy(update={
+            'managerSameAsApplicant': False,
+            'managerLastNameKanji': '鈴木',
+            'managerFirstNameKanji': '花子',
+        })
+        pages = plan_bundle(data)
+        assert len(pages) == 8
+        assert pages[-1].document == 'ryakureki_kanrisha'
+        assert texts(pages[-1].ops, 'managerNameKanji') == ['鈴木 花子']
+
+    def test_same_input_same_plan(self, form_data):
+        """同じ入力・同じ基準日なら同じプラン"""
+        today = date(2026, 1, 1)
+        assert plan_bundle(form_data, today) == plan_bundle(form_data, today)
+
+    def test_page_keys(self, form_data):
+        """変更した項目を描くページだけキーが変わる"""
+        today = date(2026, 1, 1)
+        before = [page_key(page) for page in plan_bundle(form_data, today)]
+        data = form_data.model_copy(update={'hasWebsite': True, 'websiteUrl': 'https://example.jp'})
+        after = [page_key(page) for page in plan_bundle(data, today)]
+        changed = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+        assert changed == [3]
+
+    def test_no_static_marks(self, form_data):
+        """固定マークはテンプレートに焼き込むのでプランに含まない"""
+        for ops in plan_shinsei_pages(form_data):
+            assert all(op.field != 'static' for op in ops)
+
+
+class TestPlanShinsei:
+    """許可申請書のプランのテスト"""
+
+    def test_kana_in_grid(self, form_data):
+        """フリガナは半角にして1マスずつ、空白は1マス空ける"""
+        page1 = plan_shinsei_pages(form_data)[0]
+        kana = [op for op in page1 if op.field == 'nameKana']
+        assert [op.text for op in kana] == ['ﾔ', 'ﾏ', 'ﾀ', 'ﾞ', 'ﾀ', 'ﾛ', 'ｳ']
+        assert kana[4].x == coord.NAME_KANA_X + 5 * 13.5
+        assert all(op.font_size == 9 for op in kana)
+
+    def test_phone_parts(self, form_data):
+        """電話番号は3つに分けて配置"""
+        page1 = plan_shinsei_pages(form_data)[0]
+        assert texts(page1, 'phone.area') == ['03']
+        assert texts(page1, 'phone.local') == ['1234']
+        assert texts(page1, 'phone.number') == ['5678']
+
+    def test_birth_zero_padded(self, form_data):
+        """生年月日の月・日は2桁0埋め"""
+        page1 = plan_shinsei_pages(form_data)[0]
+        assert texts(page1, 'birthMonth') == ['0', '3']
+        assert texts(page1, 'birthDay') == ['1', '5']
+
+    def test_applicant_info_right_aligned(self, form_data):
+        """申請者の氏名及び住所は右揃え"""
+        page1 = plan_shinsei_pages(form_data)[0]
+        info = [op for op in page1 if op.field == 'applicantInfo']
+        assert info == [RightText(coord.APPLICANT_INFO_X, coord.APPLICANT_INFO_Y,
+                                  '東京都渋谷区1-2-3 山田 太郎', 10, 'applicantInfo',
+                                  coord.APPLICANT_INFO_MAX_WIDTH)]
+
+    def test_website_url(self, form_data):
+        """URLの数字は丸で囲み、フリガナを付ける"""
+        data = form_data.model_copy(update={'hasWebsite': True, 'websiteUrl': 'a1'})
+        page4 = plan_shinsei_pages(data)[3]
+        circles = [op for op in page4 if isinstance(op, Circle)]
+        assert len(circles) == 1
+        assert texts(page4, 'websiteUrl') == ['a', '1']
+        assert texts(page4, 'websiteUrl.furigana') == ['ｴｰ', 'ｲﾁ']
+
+    def test_no_website(self, form_data):
+        """ホームページなしは「用いない」を○で囲むだけ"""
+        page4 = plan_shinsei_pages(form_data)[3]
+        assert page4 == [Ellipse(*coord.WEBSITE_NOT_USE_CIRCLE, 1, 'hasWebsite')]
+
+    def test_static_marks(self):
+        """固定マークは2ページ分（二重線は2本の直線）"""
+        page1, page2 = plan_shinsei_static_marks()
+        assert sum(isinstance(op, Line) for op in page1) == 2
+        assert all(isinstance(op, Ellipse) for op in page2)
+
+
+class TestPlanRyakureki:
+    """略歴書のプランのテスト"""
+
+    def test_age_uses_today(self, form_data):
+        """年齢は基準日で決まる（平成5年3月15日生まれ）"""
+        before = plan_ryakurekisyo_page(form_data, today=date(2026, 3, 14))
+        after = plan_ryakurekisyo_page(form_data, today=date(2026, 3, 15))
+        assert texts(before, 'age') == ['32']
+        assert texts(after, 'age') == ['33']
+
+    def test_career_history_max_six(self, form_data):
+        """職歴は最大6行で、最後に「現在に至る」"""
+        data = form_data.model_copy(update={'careerHistory': [
+            CareerEntry(year=str(2000 + i), month='4', content=f'職歴{i}') for i in range(8)
+        ]})
+        ops = plan_ryakurekisyo_page(data, today=date(2026, 1, 1))
+        contents = [op.text for op in ops if op.field.endswith('.content')]
+        assert contents == [f'職歴{i}' for i in range(6)]
+        assert texts(ops, 'careerHistory.end') == ['現在に至る']
+
+    def test_kana_hiragana(self, form_data):
+        """略歴書のふりがなはひらがな"""
+        ops = plan_ryakurekisyo_page(form_data, today=date(2026, 1, 1))
+        assert texts(ops, 'nameKana') == ['やまだ たろう']
+        assert all(isinstance(op, (Text, RightText)) for op in ops)
+
+
+class TestFittedText:
+    """欄に収める配置のテスト"""
+
+    def test_fits(self):
+        """収まる文字列はそのまま"""
+        ops = []
+        fitted_text(ops, 10, 100, '渋谷区', 10, 'city', 160)
+        assert ops == [Text(10, 100, '渋谷区', 10, 'city', 160)]
+
+    def test_shrink(self):
+        """収まらない文字列はフォントを縮小する"""
+        text = '1-2-3 ABCDEFGHIJKLMN'
+        max_width = string_width(text, 10) * 0.7
+        ops = []
+        fitted_text(ops, 10, 100, text, 10, 'street', max_width)
+
+        [op] = ops
+        assert op.text == text
+        assert MIN_FONT_SIZE <= op.font_size < 10
+        assert string_width(text, op.font_size) <= max_width
+
+    def test_right_aligned(self):
+        """右揃えのまま縮小する"""
+        ops = []
+        fitted_text(ops, 560, 100, 'ABCDEFGHIJ', 10, 'applicantInfo', 30, right=True)
+        assert isinstance(ops[0], RightText) and ops[0].font_size < 10
+
+    def test_wrap(self):
+        """折り返せる欄では縮小しすぎずに折り返し、y を中心に並べる"""
+        text = '株式会社マルマル商事 東京本社営業部第一課 配属'
+        max_width = string_width(text, 10) * 0.6
+        ops = []
+        fitted_text(ops, 10, 100, text, 10, 'content', max_width, max_lines=2)
+
+        assert len(ops) == 2
+        assert ''.join(op.text for op in ops).replace(' ', '') == text.replace(' ', '')
+        assert ops[0].y > 100 > ops[1].y
+        assert ops[0].y - 100 == pytest.approx(100 - ops[1].y)
+        assert all(string_width(op.text, op.font_size) <= max_width for op in ops)
+
+    def test_overflow(self):
+        """最小サイズでも収まらない場合は最小サイズで描く"""
+        ops = []
+        fitted_text(ops, 10, 100, '1' * 100, 10, 'street', 50)
+        assert [op.font_size for op in ops] == [MIN_FONT_SIZE]
+
+
+class TestFindOverflows:
+    """find_overflowsのテスト"""
+
+    def test_no_overflow(self, form_data):
+        """通常の入力では収まらない項目はない"""
+        assert find_overflows(plan_bundle(form_data)) == []
+
+    def test_long_fields(self, form_data):
+        """縮小・折り返しをしても収まらない項目を報告する"""
+        data = form_data.model_copy(update={
+            'street': '1-2-3' * 40,
+            'careerHistory': [CareerEntry(year='2020', month='4', content='長い職歴 ' * 40)],
+        })
+        overflows = find_overflows(plan_bundle(data))
+
+        street = [o for o in overflows if o['field'] == 'street']
+        assert street[0]['page'] == 1 and street[0]['document'] == 'shinsei'
+        assert street[0]['width'] > street[0]['max_width'] == coord.ADDRESS_STREET_MAX_WIDTH
+        # 住所を含む申請者欄・営業所・管理者（申請者と同じ）・誓約書・略歴書の住所にも及ぶ
+        assert overflow_fields(plan_bundle(data)) == [
+            'applicantInfo', 'street', 'officeStreet', 'managerStreet', 'address',
+            'careerHistory[0].content']
+
+    def test_long_field_fitted(self, form_data):
+        """縮小すれば収まる項目は報告しない"""
+        name = '山田商店'
+        while string_width(name, 11) <= coord.OFFICE_NAME_KANJI_MAX_WIDTH:
+            name += '山田商店'
+        data = form_data.model_copy(update={'officeNameKanji': name})
+        page2 = plan_bundle(data)[1].ops
+        [op] = [op for op in page2 if op.field == 'officeNameKanji']
+        assert op.font_size < 11
+        assert find_overflows(plan_bundle(data)) == []
+
+
+class TestCalculateAge:
+    """年齢計算のテスト"""
+
+    def test_seireki(self):
+        """西暦の生年もそのまま計算できる"""
+        assert calculate_age('seireki', '1980', '1', '1', today=date(2026, 1, 1)) == 46
+
+    def test_invalid(self):
+        """数値でない場合は0"""
+        assert calculate_age('heisei', '', '', '', today=date(2026, 1, 1)) == 0
@@ -0,0 +1,205 @@
+"""メトリクスのテスト"""
+
+import asyncio
+
+import pytest
+
+from app.metrics import (
+    CANCELLED,
+    ERRORS,
+    REQUEST_SECONDS,
+    REQUESTS,
+    Counter,
+    Histogram,
+    Registry,
+    STAGE_SECONDS,
+    collect_stages,
+    set_worker,
+    stage,
+    track_request,
+    track_stream,
+)
+
+
+class TestCounter:
+    """Counterのテスト"""
+
+    def test_inc_and_render(self):
+        """ラベルごとに加算され、テキスト形式で出力される"""
+        counter = Counter('test_total', 'テスト', ('endpoint',))
+        counter.inc(endpoint='a')
+        counter.inc(2, endpoint='a')
+        counter.inc(endpoint='b')
+
+        assert counter.value(endpoint='a') == 3
+        lines = counter.render()
+        assert '# TYPE test_total counter' in lines
+        assert 'test_total{endpoint="a"} 3' in lines
+        assert 'test_total{endpoint="b"} 1' in lines
+
+    def test_wrong_labels(self):
+        """宣言と異なるラベルはエラー"""
+        counter = Counter('test_total', 'テスト', ('endpoint',))
+        with pytest.raises(ValueError):
+            counter.inc(stage='x')
+
+
+class TestHistogram:
+    """Histogramのテスト"""
+
+    def test_buckets_are_cumulative(self):
+        """バケットは累積件数で、境界値はそのバケットに入る"""
+        histogram = Histogram('test_seconds', 'テスト', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(3.0)
+
+        lines = histogram.render()
+        assert 'test_seconds_bucket{le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{le="1"} 3' in lines
+        assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+        assert 'test_seconds_count 4' in lines
+        assert 'test_seconds_sum 3.65' in lines
+        assert histogram.count() == 4
+
+
+class TestRegistry:
+    """Registryのテスト"""
+
+    def test_render_all(self):
+        """登録した全メトリクスを出力し、clear で計測値を破棄する"""
+        registry = Registry()
+        counter = registry.register(Counter('a_total', 'A'))
+        counter.inc()
+        text = registry.render()
+        assert text.endswith('\n')
+        assert 'a_total 1' in text
+
+        registry.clear()
+        assert 'a_total 1' not in registry.render()
+
+    def test_worker_label(self):
+        """set_worker でプロセスの全ての系列に worker ラベルを付ける"""
+        registry = Registry()
+        counter = registry.register(Counter('a_total', 'A', ('endpoint',)))
+        histogram = registry.register(Histogram('b_seconds', 'B', buckets=(1.0,)))
+        counter.inc(endpoint='x')
+        histogram.observe(0.5)
+        try:
+            set_worker('3')
+            text = registry.render()
+        finally:
+            set_worker(None)
+        assert 'a_total{endpoint="x",worker="3"} 1' in text
+        assert 'b_seconds_bucket{worker="3",le="1"} 1' in text
+        assert 'b_seconds_count{worker="3"} 1' in text
+        assert 'a_total{endpoint="x"} 1' in registry.render()
+
+
+class TestStage:
+    """段階ごとの計測のテスト"""
+
+    def test_stage_observes_directly(self):
+        """collect_stages の外では直接ヒストグラムに記録する"""
+        before = STAGE_SECONDS.count(stage='test_direct')
+        with stage('test_direct'):
+            pass
+        assert STAGE_SECONDS.count(stage='test_direct') == before + 1
+
+    def test_collect_stages(self):
+        """collect_stages の中の計測値は戻り値として返す"""
+        def work(value):
+            with stage('first'):
+                pass
+            with stage('second'):
+                pass
+            return value * 2
+
+        before = STAGE_SECONDS.count(stage='first')
+        result, stages = collect_stages(work, 21)
+
+        assert result == 42
+        assert [name for name, _ in stages] == ['first', 'second']
+        assert all(elapsed >= 0 for _, elapsed in stages)
+        assert STAGE_SECONDS.count(stage='first') == before
+
+
+class TestTrackStream:
+    """ストリーミングのレスポンスの計測のテスト"""
+
+    @staticmethod
+    async def collect(stream):
+        return [chunk async for chunk in stream]
+
+    def test_counts_whole_stream(self):
+        """処理時間は最後のチャンクまで計測する"""
+        async def chunks():
+            yield b'a'
+            await asyncio.sleep(0.02)
+            yield b'b'
+
+        requests = REQUESTS.value(endpoint='test-stream')
+        observed = REQUEST_SECONDS.count(endpoint='test-stream')
+        assert asyncio.run(self.collect(track_stream('test-stream', chunks()))) == [b'a', b'b']
+        assert REQUESTS.value(endpoint='test-stream') == requests + 1
+        assert REQUEST_SECONDS.count(endpoint='test-stream') == observed + 1
+        assert ERRORS.value(endpoint='test-stream', kind='error') == 0
+
+    def test_error_in_stream(self):
+        """途中の例外は失敗に数える"""
+        async def chunks():
+            yield b'a'
+            raise RuntimeError('生成に失敗')
+
+        errors = ERRORS.value(endpoint='test-stream-error', kind='error')
+        with pytest.raises(RuntimeError):
+            asyncio.run(self.collect(track_stream('test-stream-error', chunks())))
+        assert ERRORS.value(endpoint='test-stream-error', kind='error') == errors + 1
+
+    def test_disconnect_not_counted_as_error(self):
+        """クライアントの切断（ストリームを閉じる）は失敗ではなく打ち切りに数える"""
+        async def chunks():
+            yield b'a'
+            yield b'b'
+
+        async def disconnect():
+            stream = track_stream('test-stream-disconnect', chunks())
+            assert await stream.__anext__() == b'a'
+            await stream.aclose()
+
+        cancelled = CANCELLED.value(endpoint='test-stream-disconnect')
+        asyncio.run(disconnect())
+        assert CANCELLED.value(endpoint='test-stream-disconnect') == cancelled + 1
+        assert ERRORS.value(endpoint='test-stream-disconnect', kind='error') == 0
+
+
+class TestTrackRequest:
+    """リクエストの計測のテスト"""
+
+    def test_cancelled_not_counted_as_error(self):
+        """キャンセルされたリクエストは失敗ではなく打ち切りに数える"""
+        async def handler():
+            with track_request('test-cancel'):
+                await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.create_task(handler())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        cancelled = CANCELLED.value(endpoint='test-cancel')
+        asyncio.run(run())
+        assert CANCELLED.value(endpoint='test-cancel') == cancelled + 1
+        assert ERRORS.value(endpoint='test-cancel', kind='error') == 0
+        assert REQUEST_SECONDS.count(endpoint='test-cancel') == 1
+
+    def test_exception_counted_as_error(self):
+        """例外は失敗に数える"""
+        with pytest.raises(RuntimeError):
+            with track_request('test-exception'):
+                raise RuntimeError('生成に失敗')
+        assert ERRORS.value(endpoint='test-exception', kind='error') == 1
+        assert CANCELLED.value(endpoint='test-exception') == 0
@@ -1,5 +1,7 @@
 """PDF生成ロジックのテスト"""
 
+import io
+
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -8,6 +10,7 @@ from app.pdf_generator import (
     to_halfwidth_kana,
     parse_phone,
     generate_kobutsu_pdf,
+    generate_full_application_pdf,
 )
 from app.schemas import FormData
 
@@ -174,3 +177,158 @@ class TestGeneratePdf:
 
         # PDFの基本的な形式チェック
         assert result.startswith(b"%PDF")
+
+    def test_test_pdf_stamps_form_xobjects(self, template_paths):
+        """位置確認用テストPDFも他の生成と同じく Form XObject としてオーバーレイを重ねる"""
+        from pypdf import PdfReader
+        from app.pdf_generator import generate_test_pdf
+
+        reader = PdfReader(io.BytesIO(generate_test_pdf(template_paths[0])))
+        for page in reader.pages:
+            assert any(name.startswith("/KobutsuOverlay") for name in page["/Resources"]["/XObject"])
+
+    @pytest.fixture
+    def template_paths(self):
+        """全書類PDFのテンプレートのパス（テンプレート・フォントがない場合はスキップ）"""
+        from pathlib import Path
+
+        template_dir = Path(__file__).parent.parent / "templates"
+        if not (template_dir / "template.pdf").exists():
+            pytest.skip("テンプレートPDFが見つかりません")
+
+        from app.pdf_generator import FONT_PATHS
+        if not any(Path(p).exists() for p in FONT_PATHS):
+            pytest.skip("日本語フォントが見つかりません")
+
+        return [
+            str(template_dir / "template.pdf"),
+            str(template_dir / "r07_01_kobutsu_seiyakusho_kojin.pdf"),
+            str(template_dir / "r07_03_kobutsu_seiyakusho_kanrisha.pdf"),
+            str(template_dir / "r02_ryakurekisyo.pdf"),
+        ]
+
+    def test_full_application_page_count(self, valid_form_data, template_paths):
+        """全書類PDFのページ数（管理者同一: 7ページ、管理者別: 8ページ）"""
+        from pypdf import PdfReader
+
+        same = generate_full_application_pdf(valid_form_data, *template_paths)
+        assert len(PdfReader(io.BytesIO(same)).pages) == 7
+
+        different = valid_form_data.model_copy(update={
+            "managerSameAsApplicant": False,
+            "managerLastNameKanji": "鈴木",
+            "managerFirstNameKanji": "花子",
+        })
+        result = generate_full_application_pdf(different, *template_paths)
+        assert len(PdfReader(io.BytesIO(result)).pages) == 8
+
+    def test_static_marks_survive_repeated_renders(self, valid_form_data):
+        """固定マークを焼き込んだテンプレートは、繰り返し生成しても壊れない"""
+        from pathlib import Path
+        from pypdf import PdfReader
+
+        template_path = Path(__file__).parent.parent / "templates" / "template.pdf"
+        if not template_path.exists():
+            pytest.skip("テンプレートPDFが見つかりません")
+
+        from app.pdf_generator import FONT_PATHS
+        if not any(Path(p).exists() for p in FONT_PATHS):
+            pytest.skip("日本語フォントが見つかりません")
+
+        for _ in range(2):
+            result = generate_kobutsu_pdf(valid_form_data, str(template_path))
+            for page in PdfReader(io.BytesIO(result)).pages:
+                operations = page.get_contents().operations
+                assert all(len(operands) == 4 for operands, operator in operations if operator == b're')
+
+    def test_full_application_deterministic(self, valid_form_data, template_paths):
+        """再現モードでは同じ入力から同じバイト列を生成する"""
+        first = generate_full_application_pdf(valid_form_data, *template_paths, deterministic=True)
+        second = generate_full_application_pdf(valid_form_data, *template_paths, deterministic=True)
+        assert first == second
+        assert b"/ID" in first
+
+        changed = valid_form_data.model_copy(update={"city": "港区"})
+        assert generate_full_application_pdf(changed, *template_paths, deterministic=True) != first
+
+        # 印字されない項目だけが違う場合は同じバイト列（結果キャッシュを共有できる）
+        unprinted = valid_form_data.model_copy(update={"postalCode": "150-0001"})
+        assert generate_full_application_pdf(unprinted, *template_paths, deterministic=True) == first
+
+    def test_warm_up(self, valid_form_data, template_paths):
+        """ウォームアップでフォント・テンプレート（加工済みを含む）が読み込まれる"""
+        from app import pdf_generator
+        from app.template_cache import template_cache
+
+        pdf_generator.warm_up(valid_form_data, *template_paths)
+
+        assert pdf_generator.FONT_REGISTERED
+        for path in template_paths:
+            assert template_cache.is_loaded(path)
+        assert template_cache.is_loaded(template_paths[0], prepare=pdf_generator.bake_shinsei_static_marks)
+
+    def test_build_full_application_pdf(self, valid_form_data, template_paths):
+        """組み立てた writer を書き出した結果は generate_full_application_pdf と同じ"""
+        from app.pdf_generator import build_full_application_pdf, writer_to_bytes
+
+        writer = build_full_application_pdf(valid_form_data, *template_paths, deterministic=True)
+        expected = generate_full_application_pdf(valid_form_data, *template_paths, deterministic=True)
+        assert writer_to_bytes(writer) == expected
+
+    def test_full_application_uses_given_plan(self, valid_form_data, template_paths):
+        """作成済みのプランを渡すとプランを作り直さない"""
+        from app import layout
+
+        plan = layout.plan_bundle(valid_form_data)
+        expected = generate_full_application_pdf(valid_form_data, *template_paths, deterministic=True)
+        with patch.object(layout, "plan_bundle") as plan_bundle:
+            result = generate_full_application_pdf(
+                valid_form_data, *template_paths, deterministic=True, plan=plan)
+        plan_bundle.assert_not_called()
+        assert result == expected
+
+    def test_full_application_grid_shared(self, valid_form_data, template_paths):
+        """ドットグリッドは1つの Form XObject を全ページで共有する"""
+        from pypdf import PdfReader
+        from app.pdf_generator import get_grid_page
+
+        assert get_grid_page() is get_grid_page()
+
+        result = generate_full_application_pdf(valid_form_data, *template_paths, with_grid=True)
+        reader = PdfReader(io.BytesIO(result))
+        last_overlays = {
+            max(page["/Resources"]["/XObject"].items(), key=lambda item: item[0])[1].idnum
+            for page in reader.pages
+        }
+        assert len(last_overlays) == 1
+
+    def test_grid_shared_across_threads(self, valid_form_data, template_paths):
+        """共有のドットグリッドを複数のスレッドから同時に重ねても同じ結果になる"""
+        from concurrent.futures import ThreadPoolExecutor
+        from pypdf import PdfWriter
+        from app.pdf_generator import get_grid_page
+
+        # リーダーのストリームを読みに行かない（PdfWriter に複製済み）
+        assert isinstance(get_grid_page().indirect_reference.pdf, PdfWriter)
+
+        def render(_):
+            return generate_full_application_pdf(
+                valid_form_data, *template_paths, with_grid=True, deterministic=True)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(render, range(16)))
+        assert len(set(results)) == 1
+
+
+class TestCoordinatesFingerprint:
+    """座標定義のハッシュのテスト"""
+
+    def test_changes_with_coordinates(self):
+        """座標の値が変わるとハッシュが変わる"""
+        from app import coordinates as coord
+        from app.pdf_generator import coordinates_fingerprint
+
+        original = coordinates_fingerprint()
+        assert coordinates_fingerprint() == original
+        with patch.object(coord, "NAME_KANJI_X", coord.NAME_KANJI_X + 1):
+            assert coordinates_fingerprint() != original
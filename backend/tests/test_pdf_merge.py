@@ -0,0 +1,108 @@
+"""オーバーレイ結合のテスト"""
+
+import io
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, IndirectObject
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.pdf_merge import add_object, merge_overlay, set_file_identifier
+
+
+TEMPLATE_PATH = Path(__file__).parent.parent / "templates" / "r02_ryakurekisyo.pdf"
+
+
+def make_overlay(text: str):
+    """テキストを1つ描いたオーバーレイのページを返す"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    c.setFont('Helvetica', 10)
+    c.drawString(100, 100, text)
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer).pages[0]
+
+
+def template_page(writer: PdfWriter):
+    return writer.add_page(PdfReader(TEMPLATE_PATH).pages[0])
+
+
+class TestMergeOverlay:
+    """merge_overlayのテスト"""
+
+    def test_xobject_keeps_template_contents(self):
+        """xobject方式はテンプレートのコンテンツストリームをそのまま残す"""
+        writer = PdfWriter()
+        page = template_page(writer)
+        original = list(page["/Contents"])
+
+        merge_overlay(writer, page, make_overlay("OVERLAY-TEXT"), mode="xobject")
+
+        contents = list(page["/Contents"])
+        assert contents[1:-1] == original
+        assert "/KobutsuOverlay0" in page["/Resources"]["/XObject"]
+
+        output = io.BytesIO()
+        writer.write(output)
+        output.seek(0)
+        assert "OVERLAY-TEXT" in PdfReader(output).pages[0].extract_text()
+
+    def test_xobject_multiple_overlays(self):
+        """同じページに複数重ねると別名で追加される"""
+        writer = PdfWriter()
+        page = template_page(writer)
+
+        merge_overlay(writer, page, make_overlay("FIRST"), mode="xobject")
+        merge_overlay(writer, page, make_overlay("SECOND"), mode="xobject")
+
+        xobjects = page["/Resources"]["/XObject"]
+        assert "/KobutsuOverlay0" in xobjects
+        assert "/KobutsuOverlay1" in xobjects
+
+    def test_merge_page_mode(self):
+        """merge_page方式でもオーバーレイが重なる"""
+        writer = PdfWriter()
+        page = template_page(writer)
+
+        merge_overlay(writer, page, make_overlay("MERGED"), mode="merge_page")
+
+        assert "MERGED" in page.extract_text()
+
+    def test_unknown_mode(self):
+        """不明な方式はエラー"""
+        writer = PdfWriter()
+        page = template_page(writer)
+        with pytest.raises(ValueError):
+            merge_overlay(writer, page, make_overlay("X"), mode="unknown")
+
+
+class TestPypdfPrivateApi:
+    """pdf_merge が使う pypdf の非公開の属性（pypdf を更新して失われたらここで失敗する）"""
+
+    def test_private_attributes_exist(self):
+        assert hasattr(PdfWriter, "_add_object"), "PdfWriter._add_object がありません（pdf_merge.add_object を直す）"
+        assert hasattr(PdfWriter(), "_ID"), "PdfWriter._ID がありません（pdf_merge.set_file_identifier を直す）"
+
+    def test_add_object(self):
+        """追加したオブジェクトを間接参照で引ける"""
+        writer = PdfWriter()
+        stream = DecodedStreamObject()
+        stream.set_data(b"q Q")
+        reference = add_object(writer, stream)
+        assert isinstance(reference, IndirectObject)
+        assert reference.get_object().get_data() == b"q Q"
+
+    def test_set_file_identifier(self):
+        """書き出したPDFのトレーラの /ID が指定した値になる"""
+        writer = PdfWriter()
+        writer.add_blank_page(100, 100)
+        set_file_identifier(writer, bytes(range(16)))
+        output = io.BytesIO()
+        writer.write(output)
+        output.seek(0)
+        identifier = PdfReader(output).trailer["/ID"]
+        assert [value.original_bytes for value in identifier] == [bytes(range(16))] * 2
@@ -0,0 +1,287 @@
+"""郵便番号の索引のテスト"""
+
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from app import config
+from app.postal import (
+    HEADER,
+    RECORD,
+    PostalIndex,
+    build_index,
+    fill_addresses,
+    lookup_address,
+    main,
+    normalize_postal_code,
+    read_csv,
+    write_index,
+)
+from app.schemas import FormData
+
+
+KEN_ALL_ROW = '13113,"150  ","1500002","ﾄｳｷｮｳﾄ","ｼﾌﾞﾔｸ","ｼﾌﾞﾔ","東京都","渋谷区","渋谷",0,0,0,0,0,0\n'
+
+ROWS = [
+    ("1500002", "東京都", "渋谷区", "渋谷"),
+    ("0600001", "北海道", "札幌市中央区", "北一条西"),
+    ("4520961", "愛知県", "清須市", "春日"),
+    ("4520961", "愛知県", "清須市", "春日中沼"),
+    ("1500002", "東京都", "渋谷区", "渋谷"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    """ROWS から作った索引"""
+    path = tmp_path / "postal.idx"
+    path.write_bytes(build_index(ROWS))
+    postal_index = PostalIndex(path)
+    yield postal_index
+    postal_index.close()
+
+
+@pytest.fixture
+def form_data():
+    return FormData(
+        applicantType="individual",
+        lastNameKanji="山田",
+        firstNameKanji="太郎",
+        lastNameKana="ヤマダ",
+        firstNameKana="タロウ",
+        birthEra="heisei",
+        birthYear="5",
+        birthMonth="3",
+        birthDay="15",
+        postalCode="150-0002",
+        prefecture="",
+        city="",
+        street="",
+        phone="03-1234-5678",
+        officeNameKana="ヤマダショウテン",
+        officeNameKanji="山田商店",
+        submissionPrefecture="東京都",
+    )
+
+
+class TestNormalize:
+    """normalize_postal_codeのテスト"""
+
+    @pytest.mark.parametrize("code", ["1500002", "150-0002", "〒150-0002", "１５０－０００２", " 150 0002 "])
+    def test_valid(self, code):
+        assert normalize_postal_code(code) == "1500002"
+
+    @pytest.mark.parametrize("code", ["", "150-000", "15000021", "150-000a", "١٥٠٠٠٠٢"])
+    def test_invalid(self, code):
+        assert normalize_postal_code(code) is None
+
+
+class TestBuildIndex:
+    """build_indexのテスト"""
+
+    def test_sorted_and_deduplicated(self):
+        """郵便番号順に並べ、全く同じ行は1つにまとめる"""
+        data = build_index(ROWS)
+        count = HEADER.unpack_from(data)[3]
+        codes = [RECORD.unpack_from(data, HEADER.size + i * RECORD.size)[0] for i in range(count)]
+        assert codes == [600001, 1500002, 4520961, 4520961]
+
+    def test_strings_shared(self):
+        """同じ文字列は1つにまとめる"""
+        assert build_index(ROWS).count("清須市".encode("utf-8")) == 1
+
+    def test_invalid_code(self):
+        with pytest.raises(ValueError):
+            build_index([("150-000", "東京都", "渋谷区", "")])
+
+    def test_ken_all_format(self, tmp_path):
+        """日本郵便の形式（町域の注記・「以下に掲載がない場合」・複数行の括弧書き）"""
+        path = tmp_path / "ken_all.csv"
+        path.write_text(
+            '13113,"150  ","1500000","ﾄｳｷｮｳﾄ","ｼﾌﾞﾔｸ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","東京都","渋谷区","以下に掲載がない場合",0,0,0,0,0,0\n'
+            '13113,"150  ","1506090","ﾄｳｷｮｳﾄ","ｼﾌﾞﾔｸ","ｴﾋﾞｽ","東京都","渋谷区","恵比寿（次のビルを除く",0,0,0,0,0,0\n'
+            '13113,"150  ","1506090","ﾄｳｷｮｳﾄ","ｼﾌﾞﾔｸ","ｴﾋﾞｽ","東京都","渋谷区","恵比寿ガーデンプレイス（地階・階層不明））",0,0,0,0,0,0\n'
+            '13113,"150  ","1500013","ﾄｳｷｮｳﾄ","ｼﾌﾞﾔｸ","ｴﾋﾞｽ","東京都","渋谷区","恵比寿（次のビルを除く）",0,0,0,0,0,0\n',
+            encoding="utf-8",
+        )
+        assert list(read_csv(path)) == [
+            ("1500000", "東京都", "渋谷区", ""),
+            ("1506090", "東京都", "渋谷区", "恵比寿"),
+            ("1500013", "東京都", "渋谷区", "恵比寿"),
+        ]
+
+    def test_ken_all_zip(self, tmp_path):
+        """日本郵便の配布形式（ZIP）のまま読む"""
+        path = tmp_path / "utf_ken_all.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("utf_ken_all.csv", KEN_ALL_ROW)
+        assert list(read_csv(path)) == [("1500002", "東京都", "渋谷区", "渋谷")]
+
+    def test_zip_without_csv(self, tmp_path):
+        path = tmp_path / "empty.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("readme.txt", "")
+        with pytest.raises(ValueError):
+            list(read_csv(path))
+
+
+class TestWriteIndex:
+    """write_indexのテスト"""
+
+    def test_min_records(self, tmp_path):
+        """レコード数が足りなければ既存の索引を置き換えない"""
+        out = tmp_path / "postal.idx"
+        out.write_bytes(b"previous")
+        with pytest.raises(ValueError):
+            write_index(config.POSTAL_CSV_PATH, out, min_records=100000)
+        assert out.read_bytes() == b"previous"
+
+    def test_download(self, tmp_path, capsys):
+        """--download で取得した ZIP から索引を作る（一時ファイルは残さない）"""
+        source = tmp_path / "src" / "utf_ken_all.zip"
+        source.parent.mkdir()
+        with zipfile.ZipFile(source, "w") as archive:
+            archive.writestr("utf_ken_all.csv", KEN_ALL_ROW)
+        out = tmp_path / "postal.idx"
+        assert main(["--download", "--url", source.as_uri(), "--out", str(out)]) == 0
+        assert PostalIndex(out).lookup("1500002")[0]["town"] == "渋谷"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["postal.idx", "src"]
+
+        assert main(["--download", "--url", source.as_uri(), "--out", str(out),
+                     "--min-records", "2"]) == 1
+        assert "レコード数が 1 件しかありません" in capsys.readouterr().err
+
+
+class TestPostalIndex:
+    """PostalIndexのテスト"""
+
+    def test_lookup(self, index):
+        assert index.lookup("150-0002") == [{"prefecture": "東京都", "city": "渋谷区", "town": "渋谷"}]
+        assert index.lookup("0600001")[0]["prefecture"] == "北海道"
+
+    def test_multiple_towns(self, index):
+        """同じ郵便番号の町域が複数あれば全て（入力順）"""
+        assert [a["town"] for a in index.lookup("4520961")] == ["春日", "春日中沼"]
+
+    def test_not_found(self, index):
+        """見つからなければ空（先頭・末尾・間）"""
+        assert index.lookup("0000001") == []
+        assert index.lookup("9999999") == []
+        assert index.lookup("1500003") == []
+
+    def test_invalid_code(self, index):
+        with pytest.raises(ValueError):
+            index.lookup("abc")
+
+    def test_missing_index(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            PostalIndex(tmp_path / "missing.idx").lookup("1500002")
+
+    def test_invalid_index(self, tmp_path):
+        path = tmp_path / "broken.idx"
+        path.write_bytes(b"not an index file")
+        with pytest.raises(ValueError):
+            PostalIndex(path).lookup("1500002")
+
+
+# 全件の索引のテストのレコード数（索引の文字列領域が u16 の範囲を超え、二分探索が15回になる件数。
+# 日本郵便の全件 約12万件と同じ処理を、テストの時間を抑えた件数で確かめる）
+FULL_RECORDS = 20000
+
+
+@pytest.fixture(scope="module")
+def full_index(tmp_path_factory):
+    """日本郵便の形式の ZIP から render.yaml のビルドと同じ --download --min-records で作った索引"""
+    tmp_path = tmp_path_factory.mktemp("ken_all")
+    source = tmp_path / "utf_ken_all.zip"
+    lines = [
+        f'{10000 + i % 1900},"{i % 1000:03d}  ","{i * 80:07d}","ﾄｳｷｮｳﾄ","ｼｸ","ﾁｮｳ",'
+        f'"東京都","市{i % 1900}","町{i}",0,0,0,0,0,0\n'
+        for i in range(FULL_RECORDS)
+    ]
+    # 同じ郵便番号の町域が複数ある行と、複数行に分かれた町域の括弧書き
+    lines.append('13113,"150  ","0000080","ﾄｳｷｮｳﾄ","ｼｸ","ﾁｮｳ","東京都","市1","別町（１～３丁目",0,0,0,0,0,0\n')
+    lines.append('13113,"150  ","0000080","ﾄｳｷｮｳﾄ","ｼｸ","ﾁｮｳ","東京都","市1","、５丁目）",0,0,0,0,0,0\n')
+    with zipfile.ZipFile(source, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("utf_ken_all.csv", "".join(lines))
+    out = tmp_path / "postal.idx"
+    assert main(["--download", "--url", source.as_uri(), "--out", str(out),
+                 "--min-records", str(FULL_RECORDS)]) == 0
+    postal_index = PostalIndex(out)
+    yield postal_index
+    postal_index.close()
+
+
+class TestFullSizeIndex:
+    """日本郵便の全件の形式から作った索引のテスト"""
+
+    def test_record_count(self, full_index):
+        assert len(full_index) == FULL_RECORDS + 1
+
+    def test_lookup(self, full_index):
+        """先頭・末尾・途中の郵便番号を引ける"""
+        last = FULL_RECORDS - 1
+        assert full_index.lookup("0000000") == [{"prefecture": "東京都", "city": "市0", "town": "町0"}]
+        assert full_index.lookup(f"{last * 80:07d}")[0]["town"] == f"町{last}"
+        assert full_index.lookup(f"{12345 * 80:07d}")[0]["city"] == f"市{12345 % 1900}"
+        assert full_index.lookup(f"{12345 * 80 + 1:07d}") == []
+
+    def test_multiple_towns(self, full_index):
+        """同じ郵便番号の町域は全て返し、括弧書きは除く"""
+        assert [a["town"] for a in full_index.lookup("0000080")] == ["町1", "別町"]
+
+    def test_metrics_ready(self, full_index, monkeypatch):
+        """下限以上の件数の索引なら kobutsu_postal_index_ready は真"""
+        from app import main as app_main
+
+        monkeypatch.setattr(app_main.postal, "postal_index", full_index)
+        monkeypatch.setattr(config, "POSTAL_MIN_RECORDS", FULL_RECORDS)
+        assert app_main.postal_index_status() == {"records": FULL_RECORDS + 1, "ready": True}
+
+
+class TestBundledIndex:
+    """同梱の索引のテスト"""
+
+    def test_up_to_date(self):
+        """同梱の索引は同梱の CSV から作り直したものと同じ（CSV を変えたら python -m app.postal）"""
+        assert config.POSTAL_INDEX_PATH.read_bytes() == build_index(read_csv(config.POSTAL_CSV_PATH))
+
+    def test_lookup_address(self):
+        assert lookup_address("530-0001") == [{"prefecture": "大阪府", "city": "大阪市北区", "town": "梅田"}]
+        assert lookup_address("1000000") == [{"prefecture": "東京都", "city": "千代田区", "town": ""}]
+
+    def test_main(self, tmp_path, capsys):
+        """コマンドラインで索引を作る"""
+        out = tmp_path / "postal.idx"
+        assert main([str(config.POSTAL_CSV_PATH), "--out", str(out)]) == 0
+        assert out.read_bytes() == config.POSTAL_INDEX_PATH.read_bytes()
+        assert "件の索引を作成しました" in capsys.readouterr().out
+
+
+class TestFillAddresses:
+    """fill_addressesのテスト"""
+
+    def test_fill_empty_fields(self, form_data):
+        """空の都道府県・市区町村を埋める（番地は埋めない）"""
+        filled = fill_addresses(form_data)
+        assert (filled.prefecture, filled.city, filled.street) == ("東京都", "渋谷区", "")
+
+    def test_keep_entered_fields(self, form_data):
+        """入力済みの項目は変えない"""
+        data = form_data.model_copy(update={"street": "渋谷1-2-3", "officePostalCode": "0600001"})
+        filled = fill_addresses(data)
+        assert (filled.prefecture, filled.city, filled.street) == ("東京都", "渋谷区", "渋谷1-2-3")
+        assert (filled.officePrefecture, filled.officeCity, filled.officeStreet) == (
+            "北海道", "札幌市中央区", None)
+
+    def test_no_lookup_when_filled(self, form_data, tmp_path):
+        """埋める欄がなければ索引を引かない（索引がなくてもエラーにしない）"""
+        data = form_data.model_copy(update={"prefecture": "東京都", "city": "渋谷区"})
+        with patch("app.postal.postal_index", PostalIndex(tmp_path / "missing.idx")):
+            assert fill_addresses(data) is data
+
+    def test_unknown_code(self, form_data):
+        """見つからない・不正な郵便番号は何もしない"""
+        assert fill_addresses(form_data.model_copy(update={"postalCode": "9999999"})).prefecture == ""
+        assert fill_addresses(form_data.model_copy(update={"postalCode": "abc"})).prefecture == ""
@@ -0,0 +1,171 @@
+"""生成結果キャッシュのテスト"""
+
+import asyncio
+import threading
+from datetime import date
+
+from app.result_cache import ResultCache, bundle_cache_key
+from app.schemas import FormData
+
+
+def make_form_data(**overrides) -> FormData:
+    values = dict(
+        applicantType="individual",
+        lastNameKanji="山田",
+        firstNameKanji="太郎",
+        lastNameKana="ヤマダ",
+        firstNameKana="タロウ",
+        birthEra="heisei",
+        birthYear="5",
+        birthMonth="3",
+        birthDay="15",
+        prefecture="東京都",
+        city="渋谷区",
+        street="1-2-3",
+        phone="03-1234-5678",
+        officeNameKana="ヤマダショウテン",
+        officeNameKanji="山田商店",
+        submissionPrefecture="東京都",
+    )
+    values.update(overrides)
+    return FormData(**values)
+
+
+class TestBundleCacheKey:
+    """キャッシュキーのテスト"""
+
+    def test_same_input_same_key(self):
+        """同じ入力・テンプレートなら同じキー"""
+        assert bundle_cache_key(make_form_data(), ["a", "b"]) == bundle_cache_key(make_form_data(), ["a", "b"])
+
+    def test_key_changes(self):
+        """入力・テンプレート・オプションのどれが変わってもキーが変わる"""
+        base = bundle_cache_key(make_form_data(), ["a", "b"])
+        assert bundle_cache_key(make_form_data(city="港区"), ["a", "b"]) != base
+        assert bundle_cache_key(make_form_data(), ["a", "c"]) != base
+        assert bundle_cache_key(make_form_data(), ["a", "b"], with_grid=True) != base
+
+    def test_key_changes_with_settings_and_renderer(self):
+        """出力が変わる設定・生成処理のバージョンが変わるとキーが変わる（ディスクキャッシュを使い回さない）"""
+        def key(**options):
+            values = dict(overlay_backend="reportlab", deterministic=False, renderer="v1")
+            values.update(options)
+            return bundle_cache_key(make_form_data(), ["a", "b"], **values)
+
+        base = key()
+        assert key(overlay_backend="direct") != base
+        assert key(deterministic=True) != base
+        assert key(renderer="v2") != base
+
+    def test_unprinted_fields_same_key(self):
+        """PDFに印字されない項目だけの違いではキーは変わらない"""
+        base = bundle_cache_key(make_form_data(), ["a", "b"])
+        assert bundle_cache_key(make_form_data(postalCode="150-0001"), ["a", "b"]) == base
+        # 営業所が住所と同じ場合、営業所の所在地は使われない
+        assert bundle_cache_key(make_form_data(officeCity="港区"), ["a", "b"]) == base
+        # ホームページなしの場合、URLは使われない
+        assert bundle_cache_key(make_form_data(websiteUrl="https://example.jp"), ["a", "b"]) == base
+
+    def test_key_changes_with_age(self):
+        """略歴書の年齢が変わる日にはキーが変わる（平成5年3月15日生まれ）"""
+        data = make_form_data()
+        before = bundle_cache_key(data, ["a"], today=date(2026, 3, 14))
+        assert bundle_cache_key(data, ["a"], today=date(2026, 3, 13)) == before
+        assert bundle_cache_key(data, ["a"], today=date(2026, 3, 15)) != before
+
+
+class TestResultCache:
+    """ResultCacheのテスト"""
+
+    def test_hit_and_miss(self):
+        """ヒット・ミスを数える"""
+        cache = ResultCache(max_bytes=100)
+        assert cache.get("k") is None
+        cache.put("k", b"pdf")
+        assert cache.get("k") == b"pdf"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_memory_budget_evicts_lru(self):
+        """上限を超えたら最も使われていないものから追い出す"""
+        cache = ResultCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+
+        assert cache.get("a") == b"12345"
+        assert cache.get("b") is None
+        assert cache.get("c") == b"12345"
+        assert cache.stats()["memory_bytes"] == 10
+
+    def test_oversized_value_not_cached_in_memory(self):
+        """上限より大きいものはメモリに保持しない"""
+        cache = ResultCache(max_bytes=3)
+        cache.put("a", b"12345")
+        assert cache.get("a") is None
+
+    def test_disk_tier(self, tmp_path):
+        """メモリから消えてもディスクから取得できる"""
+        cache = ResultCache(max_bytes=100, disk_dir=str(tmp_path), disk_max_bytes=100)
+        cache.put("a", b"pdf-a")
+        cache.clear()
+
+        assert cache.get("a") == b"pdf-a"
+        assert cache.stats()["disk_hits"] == 1
+
+    def test_async_disk_tier(self, tmp_path):
+        """get_async・put_async はディスクの読み書きをスレッドで行い、get・put と同じ結果になる"""
+        cache = ResultCache(max_bytes=100, disk_dir=str(tmp_path), disk_max_bytes=100)
+
+        async def run():
+            assert await cache.get_async("a") is None
+            await cache.put_async("a", b"pdf-a")
+            assert (tmp_path / "a.pdf").read_bytes() == b"pdf-a"
+            cache.clear()
+            return await cache.get_async("a"), await cache.get_async("a")
+
+        assert asyncio.run(run()) == (b"pdf-a", b"pdf-a")
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["disk_hits"] == 1
+
+    def test_disk_eviction(self, tmp_path):
+        """ディスクの上限を超えたら古いファイルから削除する"""
+        import os
+        cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10)
+        cache.put("a", b"12345")
+        os.utime(tmp_path / "a.pdf", (1, 1))
+        cache.put("b", b"12345")
+        cache.put("c", b"12345")
+
+        remaining = sorted(p.name for p in tmp_path.glob("*.pdf"))
+        assert remaining == ["b.pdf", "c.pdf"]
+        assert cache.stats()["disk_bytes"] == 10
+
+    def test_memory_lookup_during_disk_eviction(self, tmp_path):
+        """ディスクの追い出し（ファイルの列挙・削除）の間もメモリのキャッシュを引ける"""
+        cache = ResultCache(max_bytes=100, disk_dir=str(tmp_path), disk_max_bytes=5)
+        cache.put("a", b"12345")
+        evicting = threading.Event()
+        release = threading.Event()
+        disk_files = cache._disk_files
+
+        def slow_disk_files():
+            evicting.set()
+            release.wait(5)
+            return disk_files()
+
+        cache._disk_files = slow_disk_files
+        writer = threading.Thread(target=cache.put, args=("b", b"12345"))
+        writer.start()
+        try:
+            assert evicting.wait(5)
+            looked_up = []
+            reader = threading.Thread(target=lambda: looked_up.append(cache.get("a")))
+            reader.start()
+            reader.join(1)
+            assert looked_up == [b"12345"]
+        finally:
+            release.set()
+            writer.join(5)
+        assert sorted(p.name for p in tmp_path.glob("*.pdf")) == ["b.pdf"]
@@ -0,0 +1,146 @@
+"""プリフォーク型サーバーのテスト"""
+
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from app.server import create_socket, worker_max_requests
+
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(url: str) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def children(pid: int) -> set[int]:
+    """子プロセスのPID（Linuxのみ）"""
+    result = set()
+    for task in Path(f'/proc/{pid}/task').iterdir():
+        result.update(int(p) for p in (task / 'children').read_text().split())
+    return result
+
+
+class TestWorkerMaxRequests:
+    """ワーカーの入れ替え件数のテスト"""
+
+    def test_disabled(self):
+        """0以下は上限なし"""
+        assert worker_max_requests(0, 10) is None
+
+    def test_jitter(self):
+        """乱数の幅の範囲で増える"""
+        for _ in range(20):
+            assert 100 <= worker_max_requests(100, 5) <= 105
+        assert worker_max_requests(100, 0) == 100
+
+
+class TestCreateSocket:
+    """リスニングソケットのテスト"""
+
+    def test_listening(self):
+        """ワーカーに引き継げるソケットを作る"""
+        sock = create_socket('127.0.0.1', 0)
+        try:
+            assert sock.get_inheritable()
+            with socket.create_connection(sock.getsockname(), timeout=1):
+                pass
+        finally:
+            sock.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="fork と /proc が必要")
+class TestServer:
+    """サーバーを起動して確認する"""
+
+    @pytest.fixture
+    def server(self):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'app.server', '--host', '127.0.0.1', '--port', str(port),
+             '--workers', '2', '--max-requests', '3', '--max-requests-jitter', '0',
+             '--log-level', 'warning'],
+            cwd=BACKEND_DIR,
+            env={**os.environ, 'KOBUTSU_RENDER_MAX_WORKERS': '1'},
+        )
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                get(f'{url}/api/health')
+                break
+            except OSError:
+                time.sleep(0.2)
+        try:
+            yield process, url
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=10)
+
+    def test_ready_without_warm_up(self, server):
+        """fork 前に読み込み済みなので、ワーカーは起動直後から ready"""
+        _, url = server
+        status, body = get(f'{url}/api/ready')
+        assert status == 200
+        assert json.loads(body) == {'status': 'ready'}
+
+    def test_metrics_labeled_by_worker(self, server):
+        """/api/metrics は応答したワーカーの番号を worker ラベルに付ける"""
+        _, url = server
+        workers = set()
+        for _ in range(2):
+            status, body = get(f'{url}/api/metrics')
+            assert status == 200
+            workers.update(re.findall(r'^kobutsu_render_max_workers\{worker="(\d+)"\} ',
+                                      body.decode('utf-8'), re.MULTILINE))
+        assert workers and workers <= {'0', '1'}
+
+    def test_workers_recycled(self, server):
+        """max_requests 件を処理したワーカーは入れ替わり、応答は続く"""
+        process, url = server
+        before = children(process.pid)
+        assert len(before) == 2
+
+        for _ in range(10):
+            status, _ = get(f'{url}/api/health')
+            assert status == 200
+
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            after = children(process.pid)
+            if len(after) == 2 and after != before:
+                break
+            time.sleep(0.1)
+        assert len(after) == 2
+        assert after != before
+
+    def test_stops_on_sigterm(self, server):
+        """SIGTERM でワーカーごと終了する"""
+        process, _ = server
+        workers = children(process.pid)
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+        for pid in workers:
+            assert not Path(f'/proc/{pid}').exists() or \
+                'Z' in Path(f'/proc/{pid}/stat').read_text().split()[2]
@@ -0,0 +1,91 @@
+"""シングルフライトのテスト"""
+
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """SingleFlightのテスト"""
+
+    def test_coalesces_same_key(self):
+        """同じキーの同時実行は1回だけ実行し、全員に同じ結果を返す"""
+        flight = SingleFlight()
+        calls = []
+
+        async def render():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return b'pdf'
+
+        async def main():
+            return await asyncio.gather(*(flight.run('a', render) for _ in range(5)))
+
+        assert asyncio.run(main()) == [b'pdf'] * 5
+        assert len(calls) == 1
+        assert flight.started == 1
+        assert flight.coalesced == 4
+        assert flight.in_flight == 0
+
+    def test_different_keys_run_separately(self):
+        """キーが違えば別々に実行する"""
+        flight = SingleFlight()
+
+        async def main():
+            return await asyncio.gather(
+                flight.run('a', lambda: asyncio.sleep(0.01, 'a')),
+                flight.run('b', lambda: asyncio.sleep(0.01, 'b')),
+            )
+
+        assert asyncio.run(main()) == ['a', 'b']
+        assert flight.started == 2
+        assert flight.coalesced == 0
+
+    def test_runs_again_after_completion(self):
+        """完了後の同じキーは新たに実行する"""
+        flight = SingleFlight()
+
+        async def main():
+            await flight.run('a', lambda: asyncio.sleep(0, 1))
+            await flight.run('a', lambda: asyncio.sleep(0, 2))
+
+        asyncio.run(main())
+        assert flight.started == 2
+
+    def test_exception_shared(self):
+        """例外は待っている全員に送られ、次の呼び出しでは再実行される"""
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('失敗')
+
+        async def main():
+            return await asyncio.gather(*(flight.run('a', fail) for _ in range(3)),
+                                        return_exceptions=True)
+
+        results = asyncio.run(main())
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.in_flight == 0
+
+    def test_leader_cancel_does_not_cancel_waiters(self):
+        """最初の呼び出し元がキャンセルされても、待っている呼び出し元には結果が返る"""
+        flight = SingleFlight()
+
+        async def render():
+            await asyncio.sleep(0.05)
+            return b'pdf'
+
+        async def main():
+            leader = asyncio.ensure_future(flight.run('a', render))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.run('a', render))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(main()) == b'pdf'
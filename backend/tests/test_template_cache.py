@@ -0,0 +1,65 @@
+"""テンプレートキャッシュのテスト"""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pypdf import PdfWriter
+
+from app.template_cache import TemplateCache
+
+
+TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
+TEMPLATE_PATH = TEMPLATE_DIR / "template.pdf"
+RYAKUREKI_PATH = TEMPLATE_DIR / "r02_ryakurekisyo.pdf"
+
+
+class TestTemplateCache:
+    """TemplateCacheのテスト"""
+
+    def test_load_parses_once(self):
+        """同じテンプレートは一度だけ読み込む"""
+        cache = TemplateCache()
+        with patch("app.template_cache.PdfReader", wraps=__import__("pypdf").PdfReader) as reader:
+            cache.load(TEMPLATE_PATH)
+            cache.load(str(TEMPLATE_PATH))
+            assert reader.call_count == 1
+        assert cache.is_loaded(TEMPLATE_PATH)
+        assert cache.page_count(TEMPLATE_PATH) == 4
+
+    def test_load_missing(self, tmp_path):
+        """存在しないテンプレートはFileNotFoundError"""
+        cache = TemplateCache()
+        with pytest.raises(FileNotFoundError):
+            cache.load(tmp_path / "missing.pdf")
+        assert not cache.is_loaded(tmp_path / "missing.pdf")
+
+    def test_add_page_returns_independent_copy(self):
+        """追加したページへのマージはキャッシュに影響しない"""
+        cache = TemplateCache()
+        original_contents = cache.load(TEMPLATE_PATH)[0]["/Contents"]
+
+        writer = PdfWriter()
+        page = cache.add_page(writer, TEMPLATE_PATH, 0)
+        page.merge_page(cache.load(RYAKUREKI_PATH)[0])
+
+        assert len(writer.pages) == 1
+        assert cache.load(TEMPLATE_PATH)[0]["/Contents"] == original_contents
+
+    def test_prepare_applied_once(self):
+        """加工済みテンプレートは一度だけ作られ、元のテンプレートとは別に保持される"""
+        cache = TemplateCache()
+        calls = []
+
+        def prepare(template):
+            calls.append(template)
+            template.pages[0].merge_page(cache.load(RYAKUREKI_PATH)[0])
+
+        raw_contents = cache.load(TEMPLATE_PATH)[0]["/Contents"]
+        cache.add_page(PdfWriter(), TEMPLATE_PATH, 0, prepare=prepare)
+        cache.add_page(PdfWriter(), TEMPLATE_PATH, 1, prepare=prepare)
+
+        assert len(calls) == 1
+        assert cache.is_loaded(TEMPLATE_PATH, prepare)
+        assert cache.load(TEMPLATE_PATH)[0]["/Contents"] == raw_contents
+        assert cache.load(TEMPLATE_PATH, prepare)[0]["/Contents"] != raw_contents
@@ -0,0 +1,98 @@
+"""文字列の整形のテスト"""
+
+from pathlib import Path
+
+import pytest
+
+from app import text_shaping
+from app.text_shaping import (
+    katakana_to_hiragana,
+    shape_kana_grid,
+    shape_url,
+    string_width,
+    to_halfwidth_kana,
+    wrap_text,
+)
+
+
+class TestConversion:
+    """文字列全体の変換のテスト"""
+
+    def test_halfwidth_whole_string(self):
+        """文字列全体を1回で半角にする"""
+        assert to_halfwidth_kana("ヤマナカ タロウー") == "ﾔﾏﾅｶ ﾀﾛｳｰ"
+        assert to_halfwidth_kana("ハ\u309A") == "ﾊﾟ"
+        assert to_halfwidth_kana("山田") == "山田"
+
+    def test_hiragana(self):
+        """カタカナだけをひらがなにする"""
+        assert katakana_to_hiragana("ヤマダ タロウ・ｱ") == "やまだ たろう・ｱ"
+        assert katakana_to_hiragana("ァン") == "ぁん"
+
+
+class TestShapeKanaGrid:
+    """shape_kana_gridのテスト"""
+
+    def test_dakuten_in_own_cell(self):
+        """濁点・半濁点は次のマスに入る"""
+        assert shape_kana_grid("ガパ") == ((0, "ｶ"), (1, "ﾞ"), (2, "ﾊ"), (3, "ﾟ"))
+
+    def test_spaces_skip_cells(self):
+        """半角・全角の空白はマスを空ける"""
+        assert shape_kana_grid("ア イ　ウ") == ((0, "ｱ"), (2, "ｲ"), (4, "ｳ"))
+
+    def test_memoized(self):
+        """同じ文字列は整形し直さない"""
+        shape_kana_grid("スズキ ハナコ")
+        hits = shape_kana_grid.cache_info().hits
+        assert shape_kana_grid("スズキ ハナコ") is shape_kana_grid("スズキ ハナコ")
+        assert shape_kana_grid.cache_info().hits == hits + 2
+
+
+class TestShapeUrl:
+    """shape_urlのテスト"""
+
+    def test_furigana(self):
+        """1文字ずつのフリガナ（大文字は小文字と同じ、ないものは空）"""
+        assert shape_url("A1!") == (("A", "ｴｰ"), ("1", "ｲﾁ"), ("!", ""))
+
+
+class TestStringWidth:
+    """string_widthのテスト"""
+
+    @pytest.fixture(autouse=True)
+    def font(self):
+        from app.pdf_generator import FONT_PATHS, register_font
+        if not any(Path(p).exists() for p in FONT_PATHS):
+            pytest.skip("日本語フォントが見つかりません")
+        register_font()
+
+    @pytest.mark.parametrize("text", ["", "1-2-3", "東京都渋谷区1-2-3 山田 太郎", "ﾔﾏﾀﾞ", "ヤマダ タロウ"])
+    def test_same_as_reportlab(self, text):
+        """reportlab の stringWidth と同じ値"""
+        from reportlab.pdfbase import pdfmetrics
+
+        for size in (6, 10, 11):
+            assert string_width(text, size) == pdfmetrics.stringWidth(text, text_shaping.FONT_NAME, size)
+
+
+class TestWrapText:
+    """wrap_textのテスト"""
+
+    def test_fits_one_line(self):
+        """収まれば1行"""
+        assert wrap_text("同社 退職", 10, 1000, 2) == ["同社 退職"]
+
+    def test_break_at_space(self):
+        """空白があれば最後の空白で折り返し、次の行の先頭の空白は詰める"""
+        text = "株式会社マルマル商事 東京本社営業部第一課  配属"
+        max_width = string_width("株式会社マルマル商事 東京本社営業部第一課 配", 10)
+        assert wrap_text(text, 10, max_width, 2) == ["株式会社マルマル商事 東京本社営業部第一課", "配属"]
+
+    def test_break_by_char(self):
+        """空白がなければ文字単位で折り返す"""
+        assert wrap_text("ABCDEF", 10, string_width("ABC", 10), 3) == ["ABC", "DEF"]
+
+    def test_too_many_lines(self):
+        """max_lines 行に収まらなければ None"""
+        assert wrap_text("ABCDEFG", 10, string_width("ABC", 10), 2) is None
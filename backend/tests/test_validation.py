@@ -0,0 +1,185 @@
+"""入力内容の検証のテスト"""
+
+from datetime import date
+
+import pytest
+
+from app import coordinates as coord
+from app.schemas import CareerEntry, FormData
+from app.validation import format_errors, validate_form
+
+
+TODAY = date(2026, 10, 17)
+
+
+@pytest.fixture
+def form_data():
+    """有効なフォームデータを返すフィクスチャ"""
+    return FormData(
+        applicantType="individual",
+        lastNameKanji="山田",
+        firstNameKanji="太郎",
+        lastNameKana="ヤマダ",
+        firstNameKana="タロウ",
+        birthEra="heisei",
+        birthYear="5",
+        birthMonth="3",
+        birthDay="15",
+        prefecture="東京都",
+        city="渋谷区",
+        street="1-2-3",
+        phone="03-1234-5678",
+        officeSameAsAddress=True,
+        officeNameKana="ヤマダショウテン",
+        officeNameKanji="山田商店",
+        managerSameAsApplicant=True,
+        hasWebsite=False,
+        submissionPrefecture="東京都",
+    )
+
+
+def fields(errors):
+    """エラーの field だけを取り出す"""
+    return [error['field'] for error in errors]
+
+
+class TestValidateForm:
+    """validate_formのテスト"""
+
+    def test_valid(self, form_data):
+        """有効な入力はエラーなし"""
+        assert validate_form(form_data, TODAY) == []
+
+    def test_all_errors_at_once(self, form_data):
+        """全てのエラーを1回で返す"""
+        data = form_data.model_copy(update={
+            'birthEra': 'edo', 'phone': '12-34', 'representativeType': '9', 'lastNameKana': 'やまだ',
+        })
+        assert fields(validate_form(data, TODAY)) == [
+            'lastNameKana', 'birthEra', 'phone', 'representativeType']
+
+    def test_format_errors(self, form_data):
+        """一括生成の manifest.json 用に1行にまとめる"""
+        data = form_data.model_copy(update={'birthMonth': 'x'})
+        assert format_errors(validate_form(data, TODAY)) == 'birthMonth: 数字で入力してください: x'
+
+
+class TestBirthDate:
+    """生年月日の検証のテスト"""
+
+    @pytest.mark.parametrize("era, year", [
+        ("seireki", "1980"), ("showa", "64"), ("heisei", "31"), ("reiwa", "8"), ("Heisei", "5"),
+    ])
+    def test_valid(self, form_data, era, year):
+        """元号（西暦を含む）と年の範囲内"""
+        data = form_data.model_copy(update={'birthEra': era, 'birthYear': year, 'birthMonth': '1',
+                                            'birthDay': '7'})
+        assert validate_form(data, TODAY) == []
+
+    @pytest.mark.parametrize("update, field", [
+        ({'birthEra': 'edo'}, 'birthEra'),
+        ({'birthYear': '五'}, 'birthYear'),
+        ({'birthEra': 'showa', 'birthYear': '65'}, 'birthYear'),
+        ({'birthEra': 'reiwa', 'birthYear': '9'}, 'birthYear'),
+        ({'birthEra': 'seireki', 'birthYear': '5'}, 'birthYear'),
+        ({'birthMonth': '13'}, 'birthDay'),
+        ({'birthMonth': '2', 'birthDay': '30'}, 'birthDay'),
+        ({'birthEra': 'reiwa', 'birthYear': '8', 'birthMonth': '12', 'birthDay': '1'}, 'birthDay'),
+    ])
+    def test_invalid(self, form_data, update, field):
+        """不正な元号・数字でない年・範囲外の年・存在しない日付・未来の日付"""
+        assert fields(validate_form(form_data.model_copy(update=update), TODAY)) == [field]
+
+    def test_manager_era_positions(self, form_data):
+        """管理者欄に○のない元号は、管理者が申請者と同じ場合もエラー"""
+        data = form_data.model_copy(update={'birthEra': 'taisho', 'birthYear': '10'})
+        errors = validate_form(data, TODAY)
+        assert fields(errors) == ['birthEra']
+        assert '管理者欄' in errors[0]['message']
+        assert 'taisho' not in coord.MANAGER_ERA_POSITIONS
+
+
+class TestPhone:
+    """電話番号の検証のテスト"""
+
+    @pytest.mark.parametrize("phone", ["03-1234-5678", "0312345678", "090-1234-5678", "09012345678"])
+    def test_valid(self, form_data, phone):
+        assert validate_form(form_data.model_copy(update={'phone': phone}), TODAY) == []
+
+    @pytest.mark.parametrize("phone", ["03-1234", "031234567", "03-1234-567a", "0312-345678"])
+    def test_invalid(self, form_data, phone):
+        """桁数・数字以外・3つに分けられない"""
+        assert fields(validate_form(form_data.model_copy(update={'phone': phone}), TODAY)) == ['phone']
+
+
+class TestKana:
+    """フリガナの検証のテスト"""
+
+    def test_grid_cells(self, form_data):
+        """濁点・半濁点を1マスとして数え、マス目の数を超えるとエラー"""
+        fits = 'ア' * (coord.KANA_GRID_MAX_CELLS - 4)  # 空白 + ﾀﾛｳ の4マス
+        overflows = 'ガ' * (coord.KANA_GRID_MAX_CELLS // 2)
+        assert validate_form(form_data.model_copy(update={'lastNameKana': fits}), TODAY) == []
+        assert fields(validate_form(form_data.model_copy(update={'lastNameKana': overflows}), TODAY)) == [
+            'nameKana']
+
+    def test_hiragana(self, form_data):
+        """ひらがなはエラー（半角にできずマス目に入らない）"""
+        data = form_data.model_copy(update={'officeNameKana': 'やまだしょうてん'})
+        assert fields(validate_form(data, TODAY)) == ['officeNameKana']
+
+
+class TestConditionalFields:
+    """条件付きで描画する項目の検証のテスト"""
+
+    def test_address_required(self, form_data):
+        """住所（番地まで）は空にできない"""
+        data = form_data.model_copy(update={'street': ' '})
+        assert fields(validate_form(data, TODAY)) == ['street']
+
+    def test_different_manager_required(self, form_data):
+        """申請者と異なる管理者は記入項目が必須"""
+        data = form_data.model_copy(update={
+            'managerSameAsApplicant': False,
+            'managerLastNameKanji': '鈴木', 'managerFirstNameKanji': '花子',
+            'managerLastNameKana': 'スズキ', 'managerFirstNameKana': 'ハナコ',
+            'managerBirthEra': 'showa', 'managerBirthYear': '60', 'managerBirthMonth': '7',
+            'managerBirthDay': '25', 'managerPrefecture': '東京都', 'managerCity': '新宿区',
+            'managerStreet': '4-5-6', 'managerPhone': '03-9876-5432',
+        })
+        assert validate_form(data, TODAY) == []
+        missing = data.model_copy(update={'managerCity': None, 'managerPhone': None})
+        assert fields(validate_form(missing, TODAY)) == ['managerCity', 'managerPhone']
+
+    def test_representative(self, form_data):
+        """代表者等は種別と氏名がある場合に検証する"""
+        data = form_data.model_copy(update={
+            'applicantType': 'corporation', 'representativeType': '1',
+            'representativeLastNameKanji': '佐藤', 'representativeFirstNameKanji': '一郎',
+            'representativeLastNameKana': 'サトウ', 'representativeFirstNameKana': 'イチロウ',
+            'representativeBirthEra': 'showa', 'representativeBirthYear': '45',
+            'representativeBirthMonth': '1', 'representativeBirthDay': '1',
+            'representativePrefecture': '東京都', 'representativeCity': '港区',
+            'representativeStreet': '1-1-1', 'representativePhone': '03-1111-2222',
+        })
+        assert validate_form(data, TODAY) == []
+        assert fields(validate_form(data.model_copy(update={'representativeBirthEra': None}), TODAY)) == [
+            'representativeBirthEra']
+
+    def test_career(self, form_data):
+        """職歴は6件まで、年は数字、月は1〜12"""
+        entries = [CareerEntry(year='2020', month='4', content='入社')] * 7
+        entries[1] = CareerEntry(year='令和2', month='13', content='退職')
+        data = form_data.model_copy(update={'careerHistory': entries})
+        assert fields(validate_form(data, TODAY)) == [
+            'careerHistory', 'careerHistory[1].year', 'careerHistory[1].month']
+
+    def test_website(self, form_data):
+        """ホームページを用いる場合はURLが必須で、全ての文字にフリガナを振れること"""
+        data = form_data.model_copy(update={'hasWebsite': True})
+        assert fields(validate_form(data, TODAY)) == ['websiteUrl']
+        data = data.model_copy(update={'websiteUrl': 'https://Example.jp/a_b'})
+        assert validate_form(data, TODAY) == []
+        data = data.model_copy(update={'websiteUrl': 'https://例.jp/+'})
+        errors = validate_form(data, TODAY)
+        assert fields(errors) == ['websiteUrl'] and '+ 例' in errors[0]['message']
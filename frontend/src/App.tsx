@@ -114,7 +114,7 @@ export default function App() {
           <div className="min-h-[400px]">{renderStep()}</div>
 
           {error && (
-            <div className="mt-4 p-4 bg-red-50 border border-red-200 rounded-lg text-red-700 text-sm">
+            <div className="mt-4 p-4 bg-red-50 border border-red-200 rounded-lg text-red-700 text-sm whitespace-pre-line">
               {error}
             </div>
           )}
@@ -0,0 +1,45 @@
+/**
+ * API呼び出しのテスト
+ */
+import { describe, it, expect, vi, afterEach } from 'vitest';
+import { generatePdf } from '../lib/api';
+import type { FormData } from '../types/form';
+
+function mockResponse(status: number, body: unknown) {
+  vi.stubGlobal(
+    'fetch',
+    vi.fn().mockResolvedValue({
+      ok: false,
+      status,
+      json: () => Promise.resolve(body),
+    }),
+  );
+}
+
+describe('generatePdf', () => {
+  afterEach(() => {
+    vi.unstubAllGlobals();
+  });
+
+  it('422 の detail（エラーの配列）はメッセージを改行でつなぐ', async () => {
+    mockResponse(422, {
+      detail: [
+        { field: 'birthEra', message: '元号が不正です' },
+        { field: 'phone', message: '電話番号の形式が正しくありません' },
+      ],
+    });
+    await expect(generatePdf({} as FormData)).rejects.toThrow(
+      '元号が不正です\n電話番号の形式が正しくありません',
+    );
+  });
+
+  it('detail が文字列ならそのまま表示する', async () => {
+    mockResponse(500, { detail: 'テンプレートPDFが見つかりません' });
+    await expect(generatePdf({} as FormData)).rejects.toThrow('テンプレートPDFが見つかりません');
+  });
+
+  it('detail がなければ既定のメッセージ', async () => {
+    mockResponse(500, {});
+    await expect(generatePdf({} as FormData)).rejects.toThrow('PDF生成に失敗しました');
+  });
+});
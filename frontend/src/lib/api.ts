@@ -2,6 +2,22 @@ import type { FormData } from '../types/form';
 
 const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// 入力エラーの1件（/api/validate の errors と同じ形式。FastAPI の検証エラーは msg）
+interface ErrorDetail {
+  field?: string;
+  message?: string;
+  msg?: string;
+}
+
+// エラー応答の detail を表示用の文字列にする（422 の detail はエラーの配列）
+function errorMessage(detail: string | ErrorDetail[] | undefined, fallback: string): string {
+  if (Array.isArray(detail)) {
+    const messages = detail.map((item) => item.message || item.msg).filter(Boolean);
+    return messages.length > 0 ? messages.join('\n') : fallback;
+  }
+  return detail || fallback;
+}
+
 export async function generatePdf(data: FormData): Promise<Blob> {
   const response = await fetch(`${API_BASE}/api/generate-pdf`, {
     method: 'POST',
@@ -13,7 +29,7 @@ export async function generatePdf(data: FormData): Promise<Blob> {
 
   if (!response.ok) {
     const error = await response.json().catch(() => ({ detail: 'PDF生成に失敗しました' }));
-    throw new Error(error.detail || 'PDF生成に失敗しました');
+    throw new Error(errorMessage(error.detail, 'PDF生成に失敗しました'));
   }
 
   return response.blob();
@@ -27,3 +43,52 @@ export async function healthCheck(): Promise<boolean> {
     return false;
   }
 }
+
+export interface PreviewItem {
+  kind: 'text' | 'right_text' | 'ellipse' | 'circle' | 'line';
+  field: string;
+  // 文字列の欄の幅（幅の制限がない文字列は null、図形にはない）
+  max_width?: number | null;
+  [key: string]: string | number | null | undefined;
+}
+
+export interface PreviewPage {
+  page: number;
+  document: string;
+  index: number;
+  items: PreviewItem[];
+}
+
+// 縮小・折り返しをしても欄に収まらなかった文字列（page は1始まりの通し番号）
+export interface Overflow {
+  page: number;
+  document: string;
+  field: string;
+  width: number;
+  max_width: number;
+}
+
+export interface Preview {
+  page_width: number;
+  page_height: number;
+  font: string;
+  pages: PreviewPage[];
+  overflows: Overflow[];
+}
+
+export async function previewLayout(data: FormData): Promise<Preview> {
+  const response = await fetch(`${API_BASE}/api/preview`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(data),
+  });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ detail: 'プレビューの取得に失敗しました' }));
+    throw new Error(errorMessage(error.detail, 'プレビューの取得に失敗しました'));
+  }
+
+  return response.json();
+}